@@ -1,19 +1,28 @@
 from __future__ import annotations
+from sys import intern
+from array import array
+from bisect import bisect_left, insort
 from dataclasses import dataclass
 from datetime import datetime
 from typing import Callable, NamedTuple, Iterable, Generator
 
 _T = int | float | str
 
-@dataclass
+def is_lab(course_id: str) -> bool:
+    return len(course_id) > 1 and course_id[-1] == "L" and course_id[-2].isdigit()
+
+def theory_id(course_id: str) -> str:
+    return course_id[:-1] if is_lab(course_id) else course_id
+
+@dataclass(slots=True)
 class OfferedCourse:
     course_id: str
     course_name: str
-    section: _T
+    section: int
     time_slot: str
-    capacity: _T
-    enrolled: _T
-    vacancy: _T
+    capacity: int
+    enrolled: int
+    vacancy: int
     faculty: str
 
     def as_list(self) -> list[_T]:
@@ -24,19 +33,20 @@ class OfferedCourse:
 
     @staticmethod
     def NEW_INSTANCE(data: dict[str, _T], time_formatter: Callable[[str], str]) -> OfferedCourse:
+        # repeated strings are interned so thousands of sections share a single copy
         return OfferedCourse(
-            data["courseId"],
-            data["courseName"],
-            data["section"],
-            time_formatter(data["timeSlot"]),
-            data["capacity"],
-            data["enrolled"],
-            data["vacancy"],
-            data["facualtyName"].strip(),
+            intern(data["courseId"]),
+            intern(data["courseName"]),
+            int(data["section"]),
+            intern(time_formatter(data["timeSlot"])),
+            int(data["capacity"]),
+            int(data["enrolled"]),
+            int(data["vacancy"]),
+            intern(data["facualtyName"].strip()),
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class RegisteredCourse:
     course_id: str
     course_name: str
@@ -64,16 +74,16 @@ class RegisteredCourse:
                 sem = "Summer"
 
         return RegisteredCourse(
-            course_id,
-            data["courseName"],
-            data["regYear"],
+            intern(course_id),
+            intern(data["courseName"]),
+            intern(data["regYear"]),
             sem,
-            grade_code,
+            intern(grade_code),
             grade_parser(grade_code),
-            1 if course_id[-1] == "L" and course_id[-2].isdigit() else 3
+            1 if is_lab(course_id) else 3
         )
 
-@dataclass
+@dataclass(slots=True)
 class PreRequisiteCourse:
     course_id: str
     pre_requisite_course_id: str
@@ -89,89 +99,169 @@ class PreRequisiteCourse:
     @staticmethod
     def NEW_INSTANCE(data: dict[str, _T]) -> PreRequisiteCourse:
         return PreRequisiteCourse(
-            data["courseId"],
-            data["preReqCourseId"],
-            data["courseName"],
+            intern(data["courseId"]),
+            intern(data["preReqCourseId"]),
+            intern(data["courseName"]),
             "Completed" if int(data["gradePoint"]) else "Incomplete"
         )
 
+class StringTable:
+    """
+    Stores every distinct string once and hands out integer ids for them.
+    A single table can be shared by several catalogs.
+    """
+    def __init__(self) -> None:
+        self.__ids: dict[str, int] = dict()
+        self.strings: list[str] = list()
+
+    def id(self, string: str) -> int:
+        if (id := self.__ids.get(string)) is None:
+            id = self.__ids[string] = len(self.strings)
+            self.strings.append(intern(string))
+        return id
+
+    def __getitem__(self, id: int) -> str:
+        return self.strings[id]
+
+    def __len__(self) -> int:
+        return len(self.strings)
+
+class Columns:
+    """
+    Column oriented container for a whole table of records.
+    Every field is kept in a typed array, text fields as ids into a `StringTable`,
+    so a record costs a few bytes instead of a full object.
+    The columns can also be any other int sequence e.g memoryviews of a mapped snapshot.
+    """
+    RECORD_TYPE: type = None
+    STRING_FIELDS: tuple[str, ...] = ()
+    NUMBER_FIELDS: tuple[str, ...] = ()
+
+    def __init__(self, strings: StringTable = None, columns: dict[str, array] = None) -> None:
+        self.strings = strings if strings is not None else StringTable()
+        self.columns: dict[str, array] = columns if columns is not None else \
+            {field: array("I" if field in self.STRING_FIELDS else "i") for field in self.STRING_FIELDS + self.NUMBER_FIELDS}
+        # the columns in the order of the record's fields
+        self.__layout = [(self.columns[field], field in self.STRING_FIELDS) for field in self.RECORD_TYPE.__slots__]
+
+    def append(self, record: ND_Type) -> None:
+        for field in self.STRING_FIELDS:
+            self.columns[field].append(self.strings.id(getattr(record, field)))
+        for field in self.NUMBER_FIELDS:
+            self.columns[field].append(getattr(record, field))
+
+    def extend(self, it: Iterable[ND_Type]) -> None:
+        for record in it:
+            self.append(record)
+
+    def column(self, field: str) -> Generator[_T]:
+        if field in self.STRING_FIELDS:
+            return (self.strings[id] for id in self.columns[field])
+        return iter(self.columns[field])
+
+    def __getitem__(self, i: int) -> ND_Type:
+        strings = self.strings
+        return self.RECORD_TYPE(*[strings[column[i]] if is_string else column[i] for column, is_string in self.__layout])
+
+    def __iter__(self) -> Generator[ND_Type]:
+        return (self[i] for i in range(len(self)))
+
+    def __len__(self) -> int:
+        return len(self.columns[self.STRING_FIELDS[0]])
+
+    @classmethod
+    def NEW_INSTANCE(cls, it: Iterable[ND_Type], strings: StringTable = None) -> Columns:
+        table = cls(strings)
+        table.extend(it)
+        return table
+
+class OfferedCourseColumns(Columns):
+    RECORD_TYPE = OfferedCourse
+    STRING_FIELDS = ("course_id", "course_name", "time_slot", "faculty")
+    NUMBER_FIELDS = ("section", "capacity", "enrolled", "vacancy")
+
+class PreRequisiteColumns(Columns):
+    RECORD_TYPE = PreRequisiteCourse
+    STRING_FIELDS = ("course_id", "pre_requisite_course_id", "pre_requisite_course_name", "status")
+
 Semester = NamedTuple("Semester", [("semester_name", str), ("order", int), ("courses", list[RegisteredCourse])])
 
 AcademicYear = NamedTuple("AcademicYear", [("semesters", list[Semester])])
 
 AuthData = NamedTuple("AuthData", [("student_id", int), ("auth_token", str), ("expires", datetime)])
 
+CacheEntry = NamedTuple("CacheEntry", [("key", str), ("etag", str), ("last_modified", str), ("fetched_at", float), ("size", int)])
 
-ND_Type = OfferedCourse | RegisteredCourse | PreRequisiteCourse
-
-class TreeNode:
-    def __init__(self, id) -> None:
-        self.id = id
-        self.data_list: list[ND_Type] = list() 
-        self.left: TreeNode = None
-        self.right: TreeNode = None
 
-    def append_data(self, data: ND_Type) -> TreeNode:
-        self.data_list.append(data)
-        return self
+ND_Type = OfferedCourse | RegisteredCourse | PreRequisiteCourse
 
-class BTree:
+class CourseIndex:
+    """
+    Groups courses by their theory course id so every lab is paired with its theory course.
+    Exact lookups are hashed and the group ids are kept sorted for ordered iteration and prefix lookups.
+    """
     def __init__(self) -> None:
-        self.root: TreeNode = None
-        self.size = 0 
+        self.__courses: dict[str, list[ND_Type]] = dict()
+        self.__groups: dict[str, list[ND_Type]] = dict()
+        self.__ids: list[str] = list()
 
     def insert(self, data: ND_Type) -> None:
-        self.root = self.__insert_helper(self.root, data)
+        group_id = theory_id(data.course_id)
+        if group_id not in self.__groups:
+            insort(self.__ids, group_id)
+        self.__add(group_id, data)
 
     def insert_all(self, it: Iterable[ND_Type]) -> None:
         for data in it:
             self.insert(data)
 
     def get(self, id: str) -> list[ND_Type]:
-        result: list[ND_Type] = list()
-        self.__get_helper(self.root, id, result)
-        return result     
-
-    def __insert_helper(self, node: TreeNode, data: ND_Type) -> TreeNode:
-        if not node:
-            self.size += 1
-            return TreeNode(data.course_id).append_data(data)
-            
-        if data.course_id.find(node.id) != -1:
-            return node.append_data(data)
-        elif node.id > data.course_id:
-            node.left = self.__insert_helper(node.left, data)
-        else:
-            node.right = self.__insert_helper(node.right, data)
-        
-        return node
-
-    def __get_helper(self, node: TreeNode, id: str, res: list[ND_Type]) -> None:
-        if not node:
-            return
-        
-        partial_match = 0
-        if node.id == id or (partial_match := id.find(node.id) != -1):
-            return res.extend(node.data_list if not partial_match else [c for c in node.data_list if c.course_id == id])
-        elif node.id > id:
-            self.__get_helper(node.left, id, res)
-        else:
-            self.__get_helper(node.right, id, res)
+        """
+        Returns the sections of a course along with its lab sections, in the order they were inserted.
+        A lab id only returns the sections of the lab.
+        """
+        return list(self.__courses.get(id, []) if is_lab(id) else self.__groups.get(id, []))
+
+    def get_exact(self, id: str) -> list[ND_Type]:
+        return list(self.__courses.get(id, []))
+
+    def lab_of(self, id: str) -> list[ND_Type]:
+        return self.get_exact(f"{theory_id(id)}L")
+
+    def prefix(self, prefix: str) -> list[str]:
+        """
+        Returns the sorted course ids starting with `prefix`,
+        trailing wildcards are ignored e.g 'CSE2xx' matches every 200 level CSE course
+        """
+        prefix = prefix.upper().rstrip("X*")
+        lo = bisect_left(self.__ids, prefix)
+        hi = bisect_left(self.__ids, prefix + "\uffff", lo)
+        return self.__ids[lo:hi]
+
+    def department(self, department: str) -> list[str]:
+        return [id for id in self.prefix(department) if id[len(department):len(department) + 1].isdigit()]
+
+    def groups(self) -> Generator[tuple[str, list[ND_Type]]]:
+        for id in self.__ids:
+            yield id, self.__groups[id]
+
+    def __add(self, group_id: str, data: ND_Type) -> None:
+        self.__courses.setdefault(data.course_id, []).append(data)
+        self.__groups.setdefault(group_id, []).append(data)
+
+    def __iter__(self) -> Generator[str]:
+        return iter(self.__ids)
+
+    def __contains__(self, id: str) -> bool:
+        return id in self.__courses or id in self.__groups
 
-    def __iter__(self) -> Generator[ND_Type]:
-        return self.__in_oder_traversal(self.root)
-    
     def __len__(self) -> int:
-        return self.size
-    
-    def __in_oder_traversal(self, node: TreeNode) -> TreeNode:
-        if node:
-            yield from self.__in_oder_traversal(node.left)
-            yield node
-            yield from self.__in_oder_traversal(node.right)
-    
+        return len(self.__ids)
+
     @staticmethod
-    def NEW_INSTANCE(it: Iterable[ND_Type]) -> BTree:
-        btree = BTree()
-        btree.insert_all(it)
-        return btree
\ No newline at end of file
+    def NEW_INSTANCE(it: Iterable[ND_Type]) -> CourseIndex:
+        index = CourseIndex()
+        for data in it:
+            index.__add(theory_id(data.course_id), data)
+        index.__ids = sorted(index.__groups)
+        return index
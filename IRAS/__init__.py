@@ -1 +1,7 @@
-from IRAS.iras import IRAS
+def __getattr__(name: str):
+    # the client is imported on first use so importing the package, e.g for its constants, stays cheap
+    if name == "IRAS":
+        from IRAS.iras import IRAS
+        globals()["IRAS"] = IRAS
+        return IRAS
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,81 @@
+import os
+from typing import NamedTuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import IRAS.constants as CONST
+from IRAS.iras import IRAS
+from IRAS.cache import CatalogPool
+
+BatchResult = NamedTuple("BatchResult", [("student_id", str), ("ok", bool), ("error", str), ("output_dir", str)])
+
+def read_credentials(file_path: str) -> tuple[list[tuple[str, str]], list[BatchResult]]:
+    """
+    Expects one student per line as the id and password separated by the first space,
+    the password is taken as written. Empty lines and lines starting with # are ignored.
+    Returns the credentials and a failed result for every malformed line.
+    """
+    credentials, invalid = [], []
+    with open(file_path, "r") as credentials_file:
+        for line_no, line in enumerate(credentials_file, 1):
+            if not (line := line.rstrip("\r\n")).strip() or line.lstrip().startswith("#"):
+                continue
+            student_id, _, password = line.lstrip().partition(" ")
+            if not password:
+                invalid.append(BatchResult(student_id or f"line {line_no}", False, f"Invalid credentials at line {line_no} of {file_path}", ""))
+                continue
+            credentials.append((student_id, password))
+    return credentials, invalid
+
+def run_student(student_id: str, password: str, output_dir: str, query_course_ids: list[str], save_as: str, catalog_pool: CatalogPool, offline: bool = False,
+                base_url: str = CONST.BASE_URL) -> BatchResult:
+    student_dir = os.path.join(output_dir, student_id)
+    iras = None
+    try:
+        # a progress bar per concurrent student would only garble the terminal
+        iras = IRAS(offline=offline, catalog_pool=catalog_pool, show_progress=False, base_url=base_url)
+        if not iras.authenticate_user(student_id, password):
+            return BatchResult(student_id, False, "Invalid credentials or connection error", student_dir)
+        os.makedirs(student_dir, exist_ok=True)
+        iras.show_grades(file_path=os.path.join(student_dir, "grades.txt"))
+        iras.save_OfferedCourses(
+            query_course_ids=query_course_ids or [""],
+            save_as=save_as,
+            all=not query_course_ids,
+            txt_file_path=os.path.join(student_dir, "offered_courses.txt"),
+            xls_file_path=os.path.join(student_dir, "offered_courses.xlsx")
+        )
+        return BatchResult(student_id, True, "", student_dir)
+    except Exception as e:
+        return BatchResult(student_id, False, f"{type(e).__name__}: {e}", student_dir)
+    finally:
+        if iras is not None:
+            iras.close()
+
+def run_batch(credentials_path: str, output_dir: str = CONST.BATCH_OUTPUT_DIR_PATH, concurrency: int = CONST.BATCH_CONCURRENCY,
+              query_course_ids: list[str] = None, save_as: str = "both", offline: bool = False, base_url: str = CONST.BASE_URL) -> list[BatchResult]:
+    """
+    Saves the grade sheet and the offered courses of every student in `credentials_path`
+    under `output_dir`/<student id>/, processing at most `concurrency` students at a time.
+    Offered courses are saved in full unless `query_course_ids` is given.
+    A failing student or malformed line is reported in the results without stopping the batch.
+    """
+    credentials, results = read_credentials(credentials_path)
+    for result in results:
+        print(f"Failed for {result.student_id}: {result.error}")
+    catalog_pool = CatalogPool()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = [
+            executor.submit(run_student, student_id, password, output_dir, query_course_ids, save_as, catalog_pool, offline, base_url)
+            for student_id, password in credentials
+        ]
+        for future in as_completed(futures):
+            results.append(result := future.result())
+            if not result.ok:
+                print(f"Failed for {result.student_id}: {result.error}")
+
+    results.sort(key=lambda r: r.student_id)
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, "summary.txt"), "w") as summary_file:
+        for result in results:
+            summary_file.write(f"{result.student_id}\t{'OK' if result.ok else 'FAILED'}\t{result.error or result.output_dir}\n")
+    return results
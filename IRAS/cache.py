@@ -0,0 +1,150 @@
+import os
+import json
+import hashlib
+from time import time
+from threading import Lock
+from typing import Callable, Generator, Hashable, Iterable, Mapping, TypeVar
+from concurrent.futures import Future
+
+import IRAS.constants as CONST
+from IRAS.Types import CacheEntry
+
+_V = TypeVar("_V")
+
+class CatalogPool:
+    """
+    Shares parsed catalogs between students whose responses are byte for byte identical
+    """
+    def __init__(self) -> None:
+        self.__catalogs: dict[str, object] = dict()
+        self.__lock = Lock()
+
+    def share(self, digest: str, catalog: _V) -> _V:
+        with self.__lock:
+            return self.__catalogs.setdefault(digest, catalog)
+
+    def __len__(self) -> int:
+        return len(self.__catalogs)
+
+class SingleFlight:
+    """
+    Runs a call once for every caller asking for the same key while it is in flight,
+    the callers that join it wait for the result, or the error, of the first one
+    """
+    def __init__(self) -> None:
+        self.__calls: dict[Hashable, Future] = dict()
+        self.__lock = Lock()
+        self.calls = 0
+        self.shared = 0
+
+    def do(self, key: Hashable, call: Callable[[], _V]) -> _V:
+        with self.__lock:
+            if (future := self.__calls.get(key)) is not None:
+                self.shared += 1
+                leader = False
+            else:
+                future = self.__calls[key] = Future()
+                self.calls += 1
+                leader = True
+        if not leader:
+            return future.result()
+        try:
+            future.set_result(call())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self.__lock:
+                del self.__calls[key]
+        return future.result()
+
+    def __len__(self) -> int:
+        return len(self.__calls)
+
+def hash_chunks(chunks: Iterable[bytes], digest: "hashlib._Hash") -> Generator[bytes, None, None]:
+    for chunk in chunks:
+        digest.update(chunk)
+        yield chunk
+
+class CacheWriter:
+    """
+    Tees a streamed response body into a temporary file which only
+    replaces the cached copy once the whole body has been received
+    """
+    def __init__(self, cache: "ResponseCache", key: str, etag: str, last_modified: str) -> None:
+        self.__cache = cache
+        self.__key = key
+        self.__etag = etag
+        self.__last_modified = last_modified
+        self.__tmp_path = f"{cache.body_path(key)}.{os.getpid()}.tmp"
+        self.__file = open(self.__tmp_path, "wb")
+        self.__size = 0
+
+    def write(self, chunk: bytes) -> None:
+        self.__file.write(chunk)
+        self.__size += len(chunk)
+
+    def commit(self) -> None:
+        self.__file.close()
+        os.replace(self.__tmp_path, self.__cache.body_path(self.__key))
+        self.__cache.save_meta(CacheEntry(self.__key, self.__etag, self.__last_modified, time(), self.__size))
+
+    def abort(self) -> None:
+        self.__file.close()
+        try:
+            os.remove(self.__tmp_path)
+        except FileNotFoundError:
+            pass
+
+class ResponseCache:
+    def __init__(self, directory: str = CONST.CACHE_DIR_PATH) -> None:
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(api: str, student_id: int | str) -> str:
+        return hashlib.sha256(f"{student_id}:{api}".encode()).hexdigest()[:32]
+
+    def body_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def meta_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.meta")
+
+    def lookup(self, api: str, student_id: int | str) -> CacheEntry | None:
+        key = self.key(api, student_id)
+        try:
+            with open(self.meta_path(key), "r") as meta_file:
+                entry = CacheEntry(**json.load(meta_file))
+        except (FileNotFoundError, ValueError, TypeError):
+            return None
+        return entry if os.path.exists(self.body_path(key)) else None
+
+    def is_fresh(self, entry: CacheEntry, ttl: float) -> bool:
+        return time() - entry.fetched_at < ttl
+
+    def validators(self, entry: CacheEntry) -> dict[str, str]:
+        headers = dict()
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def touch(self, entry: CacheEntry) -> CacheEntry:
+        entry = entry._replace(fetched_at=time())
+        self.save_meta(entry)
+        return entry
+
+    def save_meta(self, entry: CacheEntry) -> None:
+        tmp_path = f"{self.meta_path(entry.key)}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as meta_file:
+            json.dump(entry._asdict(), meta_file)
+        os.replace(tmp_path, self.meta_path(entry.key))
+
+    def writer(self, api: str, student_id: int | str, headers: Mapping[str, str]) -> CacheWriter:
+        return CacheWriter(self, self.key(api, student_id), headers.get("ETag", ""), headers.get("Last-Modified", ""))
+
+    def iter_body(self, entry: CacheEntry) -> Generator[bytes, None, None]:
+        with open(self.body_path(entry.key), "rb") as body_file:
+            while chunk := body_file.read(CONST.HTTP_CHUNK_SIZE):
+                yield chunk
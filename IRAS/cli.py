@@ -0,0 +1,170 @@
+"""
+Non-interactive commands, several of them can be chained in a single run so the data is fetched only once e.g
+
+    python main.py --id 123 grades offered --codes CSE101 MAT212 --format xls routine --codes CSE101 MAT212
+"""
+from __future__ import annotations
+import argparse
+from time import time
+from datetime import datetime
+from typing import TYPE_CHECKING
+
+import IRAS.constants as CONST
+from IRAS.export import ExportPipeline
+
+if TYPE_CHECKING:
+    from IRAS.iras import IRAS
+
+FILE_FORMATS = ("txt", "xls", "both")
+ENDPOINTS = CONST.ENDPOINTS
+
+def _endpoint(name: str) -> str:
+    if name not in ENDPOINTS:
+        raise argparse.ArgumentTypeError(f"invalid endpoint {name}, choose from {', '.join(ENDPOINTS)}")
+    return name
+
+def _command_parsers() -> dict[str, argparse.ArgumentParser]:
+    grades = argparse.ArgumentParser(prog="grades", description="show the grade sheet")
+    grades.add_argument("--output", metavar="FILE", default="", help="write the grade sheet to FILE instead of printing it")
+
+    offered = argparse.ArgumentParser(prog="offered", description="save the offered courses with their pre-requisites")
+    query = offered.add_mutually_exclusive_group(required=True)
+    query.add_argument("--codes", nargs="+", type=str.upper, help="course codes, labs are included automatically")
+    query.add_argument("--all", action="store_true", help="save every offered course")
+    offered.add_argument("--format", choices=FILE_FORMATS, default="both")
+    offered.add_argument("--split-by", choices=("course", "department"), default="", help="one excel worksheet per course or department")
+    offered.add_argument("--split-files", action="store_true", help="save every course or department of --split-by as a file of its own")
+    offered.add_argument("--workers", type=int, default=CONST.EXPORT_WORKERS, help="files written in parallel")
+    executor = offered.add_mutually_exclusive_group()
+    executor.add_argument("--processes", action="store_const", const=True, help="always write the files in worker processes")
+    executor.add_argument("--threads", dest="processes", action="store_const", const=False, help="write the files in threads")
+    offered.add_argument("--txt", metavar="FILE", default=CONST.OFFERED_COURSE_TEXT_FILE_PATH)
+    offered.add_argument("--xls", metavar="FILE", default=CONST.OFFERED_COURSE_EXCEL_FILE_PATH)
+
+    find = argparse.ArgumentParser(prog="query", description="find the sections matching a query, see IRAS/query.py for the syntax",
+                                    epilog="e.g query 'CSE3xx; vacancy > 0; faculty Name; days ST; after 11:00AM'")
+    find.add_argument("query", nargs="+", help="clauses separated by ;")
+    find.add_argument("--format", choices=FILE_FORMATS, default="", help="save the matches instead of printing them")
+    find.add_argument("--split-by", choices=("course", "department"), default="")
+    find.add_argument("--split-files", action="store_true")
+    find.add_argument("--txt", metavar="FILE", default=CONST.OFFERED_COURSE_TEXT_FILE_PATH)
+    find.add_argument("--xls", metavar="FILE", default=CONST.OFFERED_COURSE_EXCEL_FILE_PATH)
+
+    routine = argparse.ArgumentParser(prog="routine", description="show the best conflict free routines")
+    routine.add_argument("--codes", nargs="+", type=str.upper, required=True, help="course codes, labs are paired automatically")
+    routine.add_argument("--limit", type=int, default=CONST.ROUTINE_LIMIT)
+    routine.add_argument("--after", default="", help="no class before this time e.g 9:30AM")
+    routine.add_argument("--before", default="", help="no class after this time e.g 5:00PM")
+    routine.add_argument("--off", default="", help="days to keep free e.g RA")
+    routine.add_argument("--faculty", nargs="+", default=(), help="preferred faculty names")
+    routine.add_argument("--full", action="store_true", help="allow sections without vacancy")
+    routine.add_argument("--output", metavar="FILE", default="")
+
+    watch = argparse.ArgumentParser(prog="watch", description="report vacancy changes of the offered courses")
+    watch.add_argument("--codes", nargs="+", type=str.upper, default=[], help="course codes, watches every course when omitted")
+    watch.add_argument("--interval", type=float, default=CONST.WATCH_INTERVAL, help="seconds between polls")
+    watch.add_argument("--jitter", type=float, help=f"seconds added to or taken from every interval at random, a tenth of it up to {CONST.WATCH_JITTER} by default")
+    watch.add_argument("--rounds", type=int, default=0, help="number of polls, runs until interrupted when 0")
+
+    snapshot = argparse.ArgumentParser(prog="snapshot", description="save the offered courses and pre-requisites as a binary snapshot")
+    snapshot.add_argument("--output", metavar="FILE", default="", help=f"defaults to {CONST.SNAPSHOT_DIR_PATH}/<student id>-<timestamp>.iras")
+
+    history = argparse.ArgumentParser(prog="history", description="query the recorded offered course history")
+    query = history.add_mutually_exclusive_group(required=True)
+    query.add_argument("--section", nargs=2, metavar=("CODE", "SECTION"), help="changes of a section's field over time")
+    query.add_argument("--filled-within", type=float, metavar="HOURS", help="sections that filled within HOURS of opening")
+    query.add_argument("--compact", action="store_true", help="merge the old deltas now")
+    history.add_argument("--field", choices=("vacancy", "enrolled", "capacity", "faculty", "time_slot"), default="vacancy")
+    history.add_argument("--since", type=float, metavar="HOURS", help="only the last HOURS of the history")
+
+    eligibility = argparse.ArgumentParser(prog="eligibility", description="show the offered courses whose pre-requisites are completed")
+    eligibility.add_argument("--output", metavar="FILE", default="")
+
+    refresh = argparse.ArgumentParser(prog="refresh", description="fetch the data again for the following commands")
+    refresh.add_argument("endpoints", nargs="*", type=_endpoint, metavar="ENDPOINT",
+                         help=f"any of {', '.join(ENDPOINTS)}, all of them when omitted")
+
+    return {"grades": grades, "offered": offered, "query": find, "routine": routine, "watch": watch, "snapshot": snapshot, "history": history,
+            "eligibility": eligibility, "refresh": refresh}
+
+COMMAND_PARSERS = _command_parsers()
+
+def split_commands(argv: list[str]) -> tuple[list[str], list[list[str]]]:
+    """
+    Splits the arguments into the global options and one argument list per command,
+    every command starts at its name
+    """
+    starts = [i for i, arg in enumerate(argv) if arg in COMMAND_PARSERS]
+    if not starts:
+        return argv, []
+    return argv[:starts[0]], [argv[start:end] for start, end in zip(starts, starts[1:] + [len(argv)])]
+
+def parse_commands(commands: list[list[str]]) -> list[tuple[str, argparse.Namespace]]:
+    """
+    Parses every command up front so a typo fails before anything is fetched
+    """
+    return [(command[0], COMMAND_PARSERS[command[0]].parse_args(command[1:])) for command in commands]
+
+def run_commands(iras: IRAS, commands: list[tuple[str, argparse.Namespace]]) -> None:
+    for name, args in commands:
+        match name:
+            case "grades":
+                iras.show_grades(file_path=args.output)
+            case "offered":
+                iras.save_OfferedCourses(
+                    query_course_ids=[""] if args.all else args.codes,
+                    save_as=args.format,
+                    all=args.all,
+                    txt_file_path=args.txt,
+                    xls_file_path=args.xls,
+                    split_by=args.split_by,
+                    split_files=args.split_files,
+                    export_pipeline=ExportPipeline(args.workers, args.processes)
+                )
+            case "query":
+                iras.query_OfferedCourses(
+                    " ".join(args.query),
+                    save_as=args.format,
+                    txt_file_path=args.txt,
+                    xls_file_path=args.xls,
+                    split_by=args.split_by,
+                    split_files=args.split_files
+                )
+            case "routine":
+                iras.build_routines(
+                    args.codes,
+                    limit=args.limit,
+                    min_vacancy=0 if args.full else 1,
+                    not_before=args.after,
+                    not_after=args.before,
+                    days_off=args.off,
+                    preferred_faculty=args.faculty,
+                    file_path=args.output
+                )
+            case "watch":
+                iras.watch_OfferedCourses(query_course_ids=args.codes, interval=args.interval, jitter=args.jitter, rounds=args.rounds)
+            case "snapshot":
+                iras.save_snapshot(file_path=args.output)
+            case "history":
+                run_history(iras, args)
+            case "eligibility":
+                iras.show_eligibility(file_path=args.output)
+            case "refresh":
+                iras.refresh(*args.endpoints)
+
+def _format_time(at: float) -> str:
+    return f"{datetime.fromtimestamp(at):%Y-%m-%d %H:%M}"
+
+def run_history(iras: IRAS, args: argparse.Namespace) -> None:
+    start = time() - args.since * 3600 if args.since else None
+    if args.compact:
+        iras.history.compact()
+        print(f"History is compacted at {iras.history.file_path}.")
+    elif args.section:
+        course_id, section = args.section
+        for at, value in iras.history.series(course_id, int(section), args.field, start):
+            print(f"{_format_time(at)}  {'-' if value is None else value}")
+    else:
+        for event in iras.history.filled_within(args.filled_within, start):
+            print(f"{event.course_id} SECTION {event.section}: opened {_format_time(event.opened_at)}, filled {_format_time(event.filled_at)} "
+                  f"({(event.filled_at - event.opened_at) / 3600:.1f} hours)")
@@ -1,8 +1,17 @@
 # APIs
-AUTH_TOKEN_API = "https://iras.iub.edu.bd:8079//v2/account/token"
-ALL_OFFERED_COURSES_API = lambda id: f"https://iras.iub.edu.bd:8079//api/v1/registration/{id}/all-offer-courses"
-ALL_REGISTERED_COURSE_API = lambda id: f"https://iras.iub.edu.bd:8079//api/v1/registration/student-registered-courses/{id}/all"
-PRE_REQUISITES_API = lambda id: f"https://iras.iub.edu.bd:8079//api/v1/registration/{id}/pre-requisite-courses"
+BASE_URL = "https://iras.iub.edu.bd:8079/"
+AUTH_TOKEN_API = lambda base_url=BASE_URL: f"{base_url}/v2/account/token"
+ALL_OFFERED_COURSES_API = lambda id, base_url=BASE_URL: f"{base_url}/api/v1/registration/{id}/all-offer-courses"
+ALL_REGISTERED_COURSE_API = lambda id, base_url=BASE_URL: f"{base_url}/api/v1/registration/student-registered-courses/{id}/all"
+PRE_REQUISITES_API = lambda id, base_url=BASE_URL: f"{base_url}/api/v1/registration/{id}/pre-requisite-courses"
+
+# HTTP client
+HTTP_POOL_SIZE = 4
+HTTP_TIMEOUT = (5, 30) # (connect, read) in seconds
+HTTP_MAX_RETRIES = 3
+HTTP_BACKOFF_FACTOR = 0.5
+HTTP_RETRY_STATUS_CODES = (500, 502, 503, 504)
+HTTP_CHUNK_SIZE = 16 * 1024 # 16KB
 
 OFFERED_COURSE_FIELDS = ["CODE", "NAME", "SECTION",
           "TIME SLOT", "CAPACITY", "ENROLLED", "VACANCY", "FACULTY"]
@@ -12,7 +21,54 @@ REGISTERED_COURSE_FIELDS = [
 ]
 
 PRE_REQUISITE_FIELDS = ["CODE", "PRE-REQUISITE CODE", "PRE-REQUISITE COURSE NAME", "PRE-REQUISITE STATUS"]
+BLOCKED_COURSE_FIELDS = ["CODE", "MISSING PRE-REQUISITES", "CHAIN TO COMPLETE"]
+
+ENDPOINTS = ("registered_courses", "offered_courses", "pre_requisites")
 
-AUTH_FILE_PATH = "files/auth_token_file"
+TOKEN_STORE_PATH = "files/auth_tokens.db"
 OFFERED_COURSE_TEXT_FILE_PATH = "files/offered_courses.txt"
-OFFERED_COURSE_EXCEL_FILE_PATH = "files/offered_courses.xlsx"
\ No newline at end of file
+OFFERED_COURSE_EXCEL_FILE_PATH = "files/offered_courses.xlsx"
+CACHE_DIR_PATH = "files/cache"
+BATCH_OUTPUT_DIR_PATH = "files/batch"
+METRICS_DIR_PATH = "files/metrics"
+SNAPSHOT_DIR_PATH = "files/snapshots"
+HISTORY_DIR_PATH = "files/history"
+DAEMON_EXPORT_DIR_PATH = "files/daemon"
+
+BATCH_CONCURRENCY = 8
+EXPORT_WORKERS = 4
+EXPORT_PROCESS_MIN_ROWS = 20_000 # rows of an export worth the start up and pickling of worker processes
+
+# Watch mode
+WATCH_INTERVAL = 60 # seconds between polls
+WATCH_JITTER = 10 # seconds at most, a tenth of the interval for shorter ones
+WATCH_MIN_SLEEP = 1 # seconds between two polls at least
+
+# Token store
+TOKEN_STORE_TIMEOUT = 30 # seconds to wait for a lock held by another process
+TOKEN_REFRESH_MARGIN = 5 * 60 # seconds before expiry to refresh a token in the background, at most half its lifetime
+TOKEN_REFRESH_MIN_DELAY = 5 # seconds between two background refreshes at least
+TOKEN_REFRESH_RETRY_DELAY = 30 # seconds before a failed background refresh is tried again
+PASSWORD_HASH_ITERATIONS = 100_000 # of the hashes the token store checks passwords against
+
+# Response cache time-to-live in seconds
+CACHE_TTL = {
+    "offered_courses": 15 * 60,
+    "pre_requisites": 60 * 60,
+    "registered_courses": 24 * 60 * 60,
+}
+
+# History store
+HISTORY_CHECKPOINT_EVERY = 200 # deltas between two full checkpoints
+HISTORY_COMPACT_AFTER = 7 * 24 * 60 * 60 # seconds before deltas are merged
+HISTORY_COMPACT_RESOLUTION = 60 * 60 # seconds covered by a merged delta
+
+# Routine builder
+ROUTINE_LIMIT = 5 # best routines shown
+
+# Daemon
+DAEMON_HOST = "127.0.0.1" # only local clients are served
+DAEMON_PORT = 8797
+DAEMON_REFRESH_INTERVAL = 5 * 60 # seconds between background revalidations of the warm sessions
+DAEMON_SESSION_TTL = 2 * 60 * 60 # seconds a session is kept without any request
+DAEMON_WORKERS = 4 # background warm up and refresh threads
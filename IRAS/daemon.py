@@ -0,0 +1,350 @@
+"""
+Local HTTP/JSON service that keeps the authenticated sessions and parsed catalogs warm between clients e.g
+
+    python main.py --daemon
+    curl -X POST 127.0.0.1:8797/login -d '{"id": "123", "password": "..."}'
+    curl -H "Authorization: Bearer <token>" "127.0.0.1:8797/courses?codes=CSE101,MAT212"
+
+    POST /login       {"id", "password"}                                  -> {"token"}
+    POST /logout
+    GET  /grades                                                          -> grade report
+    GET  /courses     ?codes=CSE101,MAT212 or ?prefix=CSE2, all otherwise -> sections and pre-requisites of every course
+    GET  /query       ?q=CSE3xx; vacancy > 0; days ST                    -> matching sections, see IRAS/query.py
+    GET  /eligibility                                                     -> eligible and blocked courses
+    POST /export      {"codes" or "all", "format", "split_by", "split_files"} -> written files
+    POST /refresh     {"endpoints"}                                       -> revalidated endpoints
+    GET  /status
+
+Identical upstream requests in flight are made once, whichever client asks for them.
+"""
+from __future__ import annotations
+import os
+import sys
+import hmac
+import json
+import secrets
+from time import time
+from dataclasses import asdict, dataclass, field
+from threading import Event, Lock, Thread
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlsplit
+from urllib.request import Request, urlopen
+from urllib.error import HTTPError
+from typing import Any, Callable
+
+import IRAS.constants as CONST
+from IRAS.iras import IRAS
+from IRAS.cache import CatalogPool, SingleFlight
+from IRAS.cli import ENDPOINTS, FILE_FORMATS
+from IRAS.prerequisites import PreRequisiteGraph
+
+@dataclass(slots=True)
+class Session:
+    student_id: str
+    iras: IRAS
+    digest: bytes # of the last verified password, a login with the same one is served without checking it again
+    last_used: float = field(default_factory=time)
+    export_lock: Lock = field(default_factory=Lock) # exports of a student share their files
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    iras_daemon: IRASDaemon
+
+class _Handler(BaseHTTPRequestHandler):
+    server: _Server
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        self.__handle("GET")
+
+    def do_POST(self) -> None:
+        self.__handle("POST")
+
+    def __handle(self, method: str) -> None:
+        url = urlsplit(self.path)
+        if (route := ROUTES.get((method, url.path))) is None:
+            return self.__reply(404, {"error": f"No route for {method} {url.path}"})
+        try:
+            params: dict[str, Any] = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            if length := int(self.headers.get("Content-Length") or 0):
+                params.update(json.loads(self.rfile.read(length)))
+            self.__reply(200, route(self.server.iras_daemon, self.headers.get("Authorization", ""), params))
+        except PermissionError as e:
+            self.__reply(401, {"error": str(e)})
+        except (ValueError, KeyError, TypeError) as e:
+            self.__reply(400, {"error": f"{type(e).__name__}: {e}"})
+        except Exception as e:
+            self.__reply(500, {"error": f"{type(e).__name__}: {e}"})
+
+    def __reply(self, status: int, body: dict) -> None:
+        data = json.dumps(body, separators=(",", ":")).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        if self.server.iras_daemon.verbose:
+            super().log_message(format, *args)
+
+class IRASDaemon:
+    """
+    Serves every logged in student from one long lived `IRAS` instance. The instances share their catalogs
+    through a `CatalogPool` and their fetches through a `SingleFlight`, so a burst of clients costs one upstream request.
+    The loaded data of every session is revalidated in the background every `refresh_interval` seconds
+    and sessions without a request for `session_ttl` seconds are closed.
+    """
+    def __init__(self, host: str = CONST.DAEMON_HOST, port: int = CONST.DAEMON_PORT,
+                 refresh_interval: float = CONST.DAEMON_REFRESH_INTERVAL, session_ttl: float = CONST.DAEMON_SESSION_TTL,
+                 export_dir: str = CONST.DAEMON_EXPORT_DIR_PATH, offline: bool = False, verbose: bool = False,
+                 base_url: str = CONST.BASE_URL) -> None:
+        self.refresh_interval = refresh_interval
+        self.session_ttl = session_ttl
+        self.export_dir = export_dir
+        self.offline = offline
+        self.base_url = base_url
+        self.verbose = verbose
+        self.catalog_pool = CatalogPool()
+        self.single_flight = SingleFlight()
+        self.started = time()
+        self.__sessions: dict[str, Session] = dict() # student id -> session
+        self.__tokens: dict[str, str] = dict() # client token -> student id
+        self.__lock = Lock()
+        self.__secret = secrets.token_bytes(32)
+        self.__stopped = Event()
+        self.__background = ThreadPoolExecutor(max_workers=CONST.DAEMON_WORKERS, thread_name_prefix="iras-daemon")
+        self.__refresher = Thread(target=self.__refresh_loop, name="iras-daemon-refresh", daemon=True)
+        self.server = _Server((host, port), _Handler)
+        self.server.iras_daemon = self
+
+    @property
+    def address(self) -> tuple[str, int]:
+        return self.server.server_address[:2]
+
+    def serve_forever(self) -> None:
+        self.__refresher.start()
+        try:
+            self.server.serve_forever()
+        finally:
+            self.close()
+
+    def shutdown(self) -> None:
+        """
+        Stops `serve_forever` from another thread
+        """
+        self.server.shutdown()
+
+    def close(self) -> None:
+        self.__stopped.set()
+        self.server.server_close()
+        self.__background.shutdown(wait=False, cancel_futures=True)
+        with self.__lock:
+            sessions, self.__sessions, self.__tokens = list(self.__sessions.values()), dict(), dict()
+        for session in sessions:
+            session.iras.close()
+
+    def login(self, student_id: str, password: str) -> str:
+        """
+        Returns a new client token of the student, the password is only checked by the server, or offline against
+        the last one it accepted, when the student has no session or it differs from the one of the session
+        """
+        digest = hmac.digest(self.__secret, f"{student_id}:{password}".encode(), "sha256")
+        with self.__lock:
+            session = self.__sessions.get(student_id)
+        if session is None or not hmac.compare_digest(session.digest, digest):
+            session = self.single_flight.do(("login", student_id, digest), lambda: self.__open_session(student_id, password, digest))
+        token = secrets.token_urlsafe(32)
+        with self.__lock:
+            self.__tokens[token] = student_id
+        return token
+
+    def __open_session(self, student_id: str, password: str, digest: bytes) -> Session:
+        # another login may have opened it after this one found none
+        with self.__lock:
+            if (session := self.__sessions.get(student_id)) is not None and hmac.compare_digest(session.digest, digest):
+                return session
+        iras = IRAS(offline=self.offline, catalog_pool=self.catalog_pool, show_progress=False, single_flight=self.single_flight,
+                    base_url=self.base_url)
+        # a stored token only proves that someone logged in before, so the password is always checked
+        if not iras.authenticate_user(student_id, password, verify=True):
+            iras.close()
+            raise PermissionError("Invalid credentials or connection error")
+        with self.__lock:
+            # the session of a changed password is kept, its clients may still be using it
+            if (previous := self.__sessions.get(student_id)) is not None:
+                previous.digest = digest
+            else:
+                session = self.__sessions[student_id] = Session(student_id, iras, digest)
+        if previous is not None:
+            iras.close()
+            # picks up the token just stored, so its background refresh goes on with the new password
+            previous.iras.authenticate_user(student_id, password)
+            return previous
+        # the data is loaded before the first query asks for it
+        for load in (iras.get_grades, iras.get_offered_courses, iras.get_pre_requisites):
+            self.__background.submit(self.__logged, load)
+        return session
+
+    def session(self, authorization: str) -> Session:
+        token = authorization.removeprefix("Bearer ").strip()
+        with self.__lock:
+            if (session := self.__sessions.get(self.__tokens.get(token, ""))) is None:
+                raise PermissionError("Login first")
+            session.last_used = time()
+        return session
+
+    def logout(self, authorization: str) -> None:
+        with self.__lock:
+            self.__tokens.pop(authorization.removeprefix("Bearer ").strip(), None)
+
+    def __refresh_loop(self) -> None:
+        while not self.__stopped.wait(self.refresh_interval):
+            now = time()
+            with self.__lock:
+                expired = [session for session in self.__sessions.values() if now - session.last_used > self.session_ttl]
+                for session in expired:
+                    del self.__sessions[session.student_id]
+                self.__tokens = {token: id for token, id in self.__tokens.items() if id in self.__sessions}
+                sessions = list(self.__sessions.values())
+            for session in expired:
+                session.iras.close()
+            for session in sessions:
+                self.__background.submit(self.__logged, session.iras.revalidate)
+
+    def __logged(self, call: Callable[[], Any]) -> None:
+        try:
+            call()
+        except Exception as e:
+            print(f"Background refresh failed: {type(e).__name__}: {e}", file=sys.stderr)
+
+    def status(self) -> dict:
+        with self.__lock:
+            sessions, clients = len(self.__sessions), len(self.__tokens)
+        return {
+            "uptime": round(time() - self.started, 3),
+            "sessions": sessions,
+            "clients": clients,
+            "catalogs": len(self.catalog_pool),
+            "upstream_fetches": self.single_flight.calls,
+            "shared_fetches": self.single_flight.shared
+        }
+
+def _codes(params: dict) -> list[str]:
+    codes = params.get("codes") or []
+    return [code.upper() for code in (codes.split(",") if isinstance(codes, str) else codes) if code]
+
+def _login(daemon: IRASDaemon, _: str, params: dict) -> dict:
+    return {"token": daemon.login(str(params["id"]), str(params["password"]))}
+
+def _logout(daemon: IRASDaemon, authorization: str, _: dict) -> dict:
+    daemon.logout(authorization)
+    return {}
+
+def _grades(daemon: IRASDaemon, authorization: str, _: dict) -> dict:
+    return daemon.session(authorization).iras.get_grades().as_dict()
+
+def _courses(daemon: IRASDaemon, authorization: str, params: dict) -> dict:
+    iras = daemon.session(authorization).iras
+    offered_course_index, pre_requisite_course_index = iras.get_offered_courses(), iras.get_pre_requisites()
+    if codes := _codes(params):
+        ids = codes
+    elif prefix := params.get("prefix"):
+        ids = offered_course_index.prefix(prefix)
+    else:
+        ids = list(offered_course_index)
+    return {"courses": {
+        id: {
+            "sections": [asdict(course) for course in offered_course_index.get(id)],
+            "pre_requisites": [asdict(course) for course in pre_requisite_course_index.get(id)]
+        } for id in ids
+    }}
+
+def _query(daemon: IRASDaemon, authorization: str, params: dict) -> dict:
+    matches = daemon.session(authorization).iras.find_OfferedCourses(params["q"])
+    return {"courses": {id: [asdict(course) for course in courses] for id, courses in matches}}
+
+def _eligibility(daemon: IRASDaemon, authorization: str, _: dict) -> dict:
+    iras = daemon.session(authorization).iras
+    graph = PreRequisiteGraph(course for _, group in iras.get_pre_requisites().groups() for course in group)
+    eligibility = graph.evaluate(iras.get_offered_courses())
+    return {
+        "eligible": eligibility.eligible,
+        "blocked": [blocked._asdict() for blocked in eligibility.blocked],
+        "best_unlock": eligibility.best_unlock and eligibility.best_unlock._asdict()
+    }
+
+def _export(daemon: IRASDaemon, authorization: str, params: dict) -> dict:
+    session = daemon.session(authorization)
+    if (save_as := params.get("format", "both")) not in FILE_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FILE_FORMATS)}")
+    codes, all = _codes(params), bool(params.get("all"))
+    if not codes and not all:
+        raise ValueError("Either codes or all is required")
+    student_dir = os.path.join(daemon.export_dir, session.student_id)
+    os.makedirs(student_dir, exist_ok=True)
+    with session.export_lock:
+        file_paths = session.iras.save_OfferedCourses(
+            query_course_ids=[""] if all else codes,
+            save_as=save_as,
+            all=all,
+            txt_file_path=os.path.join(student_dir, "offered_courses.txt"),
+            xls_file_path=os.path.join(student_dir, "offered_courses.xlsx"),
+            split_by=params.get("split_by", ""),
+            split_files=bool(params.get("split_files"))
+        )
+    return {"files": [os.path.abspath(file_path) for file_path in file_paths]}
+
+def _refresh(daemon: IRASDaemon, authorization: str, params: dict) -> dict:
+    if invalid := [endpoint for endpoint in params.get("endpoints", []) if endpoint not in ENDPOINTS]:
+        raise ValueError(f"Invalid endpoints {', '.join(invalid)}, choose from {', '.join(ENDPOINTS)}")
+    daemon.session(authorization).iras.revalidate(*params.get("endpoints", []))
+    return {"endpoints": params.get("endpoints") or list(ENDPOINTS)}
+
+def _status(daemon: IRASDaemon, _: str, __: dict) -> dict:
+    return daemon.status()
+
+ROUTES: dict[tuple[str, str], Callable[[IRASDaemon, str, dict], dict]] = {
+    ("POST", "/login"): _login,
+    ("POST", "/logout"): _logout,
+    ("GET", "/grades"): _grades,
+    ("GET", "/courses"): _courses,
+    ("GET", "/query"): _query,
+    ("GET", "/eligibility"): _eligibility,
+    ("POST", "/export"): _export,
+    ("POST", "/refresh"): _refresh,
+    ("GET", "/status"): _status
+}
+
+class DaemonClient:
+    """
+    Minimal client of a running daemon for scripts e.g
+
+        client = DaemonClient()
+        client.login("123", "password")
+        client.get("/courses", codes="CSE101,MAT212")
+    """
+    def __init__(self, host: str = CONST.DAEMON_HOST, port: int = CONST.DAEMON_PORT, timeout: float = CONST.HTTP_TIMEOUT[1]) -> None:
+        self.url = f"http://{host}:{port}"
+        self.timeout = timeout
+        self.token = ""
+
+    def login(self, student_id: str, password: str) -> None:
+        self.token = self.post("/login", id=student_id, password=password)["token"]
+
+    def get(self, path: str, **params: Any) -> dict:
+        return self.__request(Request(f"{self.url}{path}?{urlencode(params)}" if params else f"{self.url}{path}"))
+
+    def post(self, path: str, **body: Any) -> dict:
+        return self.__request(Request(f"{self.url}{path}", data=json.dumps(body).encode(), method="POST",
+                                      headers={"Content-Type": "application/json"}))
+
+    def __request(self, request: Request) -> dict:
+        if self.token:
+            request.add_header("Authorization", f"Bearer {self.token}")
+        try:
+            with urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except HTTPError as e:
+            raise RuntimeError(json.loads(e.read()).get("error", str(e))) from None
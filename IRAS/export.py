@@ -0,0 +1,140 @@
+from __future__ import annotations
+import os
+import multiprocessing
+from os import getcwd, path
+from typing import Iterable, NamedTuple
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+
+import IRAS.constants as CONST
+from IRAS.Types import OfferedCourse, PreRequisiteCourse
+from IRAS.utils import write_txt, write_xls, split_key
+from IRAS.metrics import METRICS, PhaseRecord
+
+ExportRows = NamedTuple("ExportRows", [
+    ("offered", list[list]),
+    ("sections_count", list[int]), # offered rows per course
+    ("pre_requisites", list[list]),
+    ("pre_requisites_count", list[int]) # pre-requisite rows per course, courses without any are left out
+])
+
+ExportJob = NamedTuple("ExportJob", [("save_as", str), ("file_path", str), ("rows", ExportRows), ("split_by", str)])
+
+def export_rows(queried_courses: Iterable[OfferedCourse], sections_count: list[int],
+                pre_requisite_courses: Iterable[PreRequisiteCourse], pre_requisite_courses_count: list[int]) -> ExportRows:
+    """
+    Converts every record to its row once for all of the writers
+    """
+    with METRICS.phase("render", exporter="rows") as render:
+        rows = ExportRows([course.as_list() for course in queried_courses], sections_count,
+                          [pre_course.as_list() for pre_course in pre_requisite_courses], pre_requisite_courses_count)
+        render.records = len(rows.offered) + len(rows.pre_requisites)
+    return rows
+
+def _split_groups(rows: list[list], counts: list[int], split_by: str) -> dict[str, tuple[list[list], list[int]]]:
+    groups: dict[str, tuple[list[list], list[int]]] = dict()
+    start = 0
+    for count in counts:
+        if count:
+            group_rows, group_counts = groups.setdefault(split_key(rows[start][0], split_by), ([], []))
+            group_rows.extend(rows[start:start + count])
+            group_counts.append(count)
+        start += count
+    return groups
+
+def split_rows(rows: ExportRows, split_by: str) -> dict[str, ExportRows]:
+    """
+    Returns the rows of every course or department when `split_by` is 'course' or 'department'
+    """
+    offered = _split_groups(rows.offered, rows.sections_count, split_by)
+    pre_requisites = _split_groups(rows.pre_requisites, rows.pre_requisites_count, split_by)
+    return {
+        key: ExportRows(offered_rows, sections_count, *pre_requisites.get(key, ([], [])))
+        for key, (offered_rows, sections_count) in offered.items()
+    }
+
+def _run_job(job: ExportJob, collect_metrics: bool = False) -> list[PhaseRecord]:
+    """
+    Runs in a worker, a worker process sends its metrics back to be committed by the parent
+    """
+    if collect_metrics:
+        METRICS.reset()
+        METRICS.keep_records = True
+    if job.save_as == "txt":
+        write_txt(job.rows.offered, job.rows.sections_count, job.rows.pre_requisites, job.rows.pre_requisites_count, job.file_path)
+    else:
+        write_xls(job.rows.offered, job.rows.pre_requisites, job.file_path, job.split_by)
+    return list(METRICS.records) if collect_metrics else []
+
+def _process_context() -> multiprocessing.context.BaseContext:
+    return multiprocessing.get_context("forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else None)
+
+class ExportPipeline:
+    """
+    Fans the rows out to the text and excel writers, and to a file per course or department, in parallel.
+    Both writers are pure Python and hold the GIL, so only worker processes write faster than a single thread,
+    at the cost of starting them and pickling the rows. `processes` left as None picks processes for large exports
+    on a multi-core machine and writes the rest one after another, True or False forces processes or threads.
+    """
+    def __init__(self, workers: int = CONST.EXPORT_WORKERS, processes: bool | None = None) -> None:
+        self.workers = workers
+        self.processes = processes
+
+    def executor(self, jobs: list[ExportJob]) -> str:
+        """
+        Returns how the jobs are run, 'sequential', 'threads' or 'processes'
+        """
+        if len(jobs) <= 1 or self.workers <= 1:
+            return "sequential"
+        if self.processes is not None:
+            return "processes" if self.processes else "threads"
+        rows = sum(len(job.rows.offered) + len(job.rows.pre_requisites) for job in jobs)
+        return "processes" if (os.cpu_count() or 1) > 1 and rows >= CONST.EXPORT_PROCESS_MIN_ROWS else "sequential"
+
+    def jobs(self, rows: ExportRows, save_as: str, txt_file_path: str, xls_file_path: str, split_by: str = "", split_files: bool = False) -> list[ExportJob]:
+        """
+        With `split_files` a file of every course or department is written into a directory named after the file,
+        otherwise `split_by` makes a worksheet of each in the excel file
+        """
+        formats = [(format, file_path) for format, file_path in (("txt", txt_file_path), ("xls", xls_file_path)) if save_as in (format, "both")]
+        if not split_files or not split_by:
+            return [ExportJob(format, file_path, rows, split_by) for format, file_path in formats]
+        jobs = []
+        for format, file_path in formats:
+            directory, extension = path.splitext(file_path)
+            os.makedirs(directory, exist_ok=True)
+            jobs.extend(
+                ExportJob(format, path.join(directory, f"{key}{extension}"), group_rows, "")
+                for key, group_rows in split_rows(rows, split_by).items()
+            )
+        return jobs
+
+    def run(self, jobs: list[ExportJob]) -> list[str]:
+        """
+        Runs the jobs and returns the paths of the written files
+        """
+        if (kind := self.executor(jobs)) == "sequential":
+            for job in jobs:
+                _run_job(job)
+            return [job.file_path for job in jobs]
+
+        processes = kind == "processes"
+        workers = min(self.workers, len(jobs))
+        # forking a process that runs threads e.g the daemon could copy a lock while it is held
+        executor: Executor = ProcessPoolExecutor(workers, mp_context=_process_context()) if processes else ThreadPoolExecutor(workers)
+        with executor:
+            futures = {executor.submit(_run_job, job, processes): job for job in jobs}
+            for future in as_completed(futures):
+                for record in future.result():
+                    METRICS.commit(record)
+        return [job.file_path for job in jobs]
+
+    def export(self, rows: ExportRows, save_as: str, txt_file_path: str, xls_file_path: str, split_by: str = "", split_files: bool = False) -> list[str]:
+        jobs = self.jobs(rows, save_as, txt_file_path, xls_file_path, split_by, split_files)
+        file_paths = self.run(jobs)
+        if not split_files or not split_by:
+            for job in jobs:
+                print(f"{'Text' if job.save_as == 'txt' else 'Excel'} file is saved at {path.join(getcwd(), job.file_path)}.")
+        else:
+            for directory in dict.fromkeys(path.dirname(file_path) for file_path in file_paths):
+                print(f"{sum(path.dirname(file_path) == directory for file_path in file_paths)} files are saved under {path.join(getcwd(), directory)}.")
+        return file_paths
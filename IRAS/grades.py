@@ -0,0 +1,128 @@
+from __future__ import annotations
+from typing import Iterable, NamedTuple
+
+from IRAS.Types import RegisteredCourse, is_lab
+from IRAS.utils import parse_grade, get_semester_order
+
+SemesterResult = NamedTuple("SemesterResult", [
+    ("year", str),
+    ("semester_name", str),
+    ("order", int),
+    ("courses", list[RegisteredCourse]),
+    ("gpa", float),
+    ("credits", int),
+    ("cgpa", float),
+    ("credits_earned", int)
+])
+
+def _ratio(points: float, credits: int) -> float:
+    return 0.0 if not credits else points / credits
+
+class GradeReport:
+    """
+    Groups registered courses by year and semester in a single pass and keeps per semester GPA,
+    running CGPA and earned credits as data.
+    A retaken course only counts with its latest passing grade, the same as the grade sheet.
+    """
+    BEST_GRADE = "A"
+    WORST_PASSING_GRADE = "D"
+
+    def __init__(self, courses: Iterable[RegisteredCourse]) -> None:
+        semesters: dict[tuple[str, int], list[RegisteredCourse]] = dict()
+        names: dict[tuple[str, int], str] = dict()
+        for course in courses:
+            key = (course.registered_year, get_semester_order(course.registered_semester))
+            if (semester := semesters.get(key)) is None:
+                semester = semesters[key] = []
+                names[key] = course.registered_semester
+            semester.append(course)
+
+        self.semesters: list[SemesterResult] = []
+        # course id -> (grade, credits) of the latest passing attempt
+        self.completed: dict[str, tuple[float, int]] = dict()
+        self.total_points: float = 0.0
+        self.credits_earned: int = 0
+        for key in sorted(semesters, key=lambda k: (k[0], k[1] or 0)):
+            graded = [(c.grade, c.credit_count) for c in semesters[key] if c.grade]
+            points = sum(grade * credit for grade, credit in graded)
+            credits = sum(credit for _, credit in graded)
+            for course in semesters[key]:
+                if course.grade:
+                    self.__complete(course.course_id, course.grade, course.credit_count)
+            self.semesters.append(SemesterResult(
+                key[0], names[key], key[1], semesters[key],
+                _ratio(points, credits), credits, self.cgpa, self.credits_earned
+            ))
+        # summed again in the order of completion so the final CGPA is free of retake rounding drift
+        self.total_points = sum(grade * credit for grade, credit in self.completed.values())
+
+    @property
+    def cgpa(self) -> float:
+        return _ratio(self.total_points, self.credits_earned)
+
+    def what_if(self, planned: dict[str, str | float]) -> float:
+        """
+        Returns the CGPA after the planned courses get the given grade codes or grade points.
+        Only the planned courses are applied on top of the current totals.
+        """
+        points, credits = self.total_points, self.credits_earned
+        for course_id, grade in planned.items():
+            if isinstance(grade, str):
+                grade = parse_grade(grade.strip().upper())
+            if not grade:
+                continue
+            if previous := self.completed.get(course_id):
+                points -= previous[0] * previous[1]
+                credits -= previous[1]
+            credit = 1 if is_lab(course_id) else 3
+            points += grade * credit
+            credits += credit
+        return _ratio(points, credits)
+
+    def cgpa_range(self, planned_course_ids: Iterable[str]) -> tuple[float, float]:
+        """
+        Returns the best and the worst case CGPA after passing the planned courses,
+        a failed course does not change the CGPA
+        """
+        planned_course_ids = list(planned_course_ids)
+        return (
+            self.what_if({course_id: self.BEST_GRADE for course_id in planned_course_ids}),
+            self.what_if({course_id: self.WORST_PASSING_GRADE for course_id in planned_course_ids}),
+        )
+
+    def as_dict(self) -> dict:
+        return {
+            "cgpa": round(self.cgpa, 2),
+            "credits_earned": self.credits_earned,
+            "semesters": [
+                {
+                    "year": s.year,
+                    "semester": s.semester_name,
+                    "gpa": round(s.gpa, 2),
+                    "credits": s.credits,
+                    "cgpa": round(s.cgpa, 2),
+                    "credits_earned": s.credits_earned,
+                    "courses": [
+                        {
+                            "course_id": c.course_id,
+                            "course_name": c.course_name,
+                            "grade_code": c.grade_code,
+                            "grade": c.grade,
+                            "credit_count": c.credit_count
+                        } for c in s.courses
+                    ]
+                } for s in self.semesters
+            ]
+        }
+
+    def __complete(self, course_id: str, grade: float, credit: int) -> None:
+        if previous := self.completed.get(course_id):
+            self.total_points -= previous[0] * previous[1]
+            self.credits_earned -= previous[1]
+        self.completed[course_id] = (grade, credit)
+        self.total_points += grade * credit
+        self.credits_earned += credit
+
+    @staticmethod
+    def NEW_INSTANCE(courses: Iterable[RegisteredCourse]) -> GradeReport:
+        return GradeReport(courses)
@@ -0,0 +1,325 @@
+"""
+Append-only history of a catalog, stored as one JSON line per poll that changed anything.
+
+    {"k":"c","t":<time>,"s":[<section>,...]}                         checkpoint with every section
+    {"k":"d","t":<time>,"a":[<section>,...],"r":[[id,section],...],
+                        "c":[[id,section,{field:new value}],...]}    delta against the previous state
+
+A checkpoint is written every `checkpoint_every` deltas so a query never replays more than that
+many lines before the time it starts at. Old deltas are merged into coarser ones by `compact`.
+Several processes may record to the same file e.g the daemon and the CLI, every write holds a lock on
+`<file>.lock` and first catches up with what the others wrote.
+"""
+from __future__ import annotations
+import os
+import json
+from time import time
+from threading import Lock
+from contextlib import contextmanager
+from dataclasses import replace
+from typing import Any, Generator, Iterable, NamedTuple
+
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+    import msvcrt
+
+import IRAS.constants as CONST
+from IRAS.Types import OfferedCourse
+from IRAS.watch import SectionKey, snapshot, diff_snapshots
+
+_CHECKPOINT_PREFIX = b'{"k":"c","t":'
+
+Checkpoint = NamedTuple("Checkpoint", [("time", float), ("offset", int)])
+
+FillEvent = NamedTuple("FillEvent", [
+    ("course_id", str),
+    ("section", int),
+    ("opened_at", float), # first time the section was seen with a vacancy
+    ("filled_at", float)
+])
+
+@contextmanager
+def _file_lock(file_path: str) -> Generator[None, None, None]:
+    """
+    Holds an exclusive lock on a sidecar of the file, shared with other processes
+    """
+    with open(f"{file_path}.lock", "a+b") as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+def _signature(file_path: str) -> tuple[int, int] | None:
+    """
+    Changes whenever the file is appended to or replaced
+    """
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_size
+
+def _dumps(record: dict) -> str:
+    return json.dumps(record, separators=(",", ":")) + "\n"
+
+def _checkpoint(at: float, state: dict[SectionKey, OfferedCourse]) -> dict:
+    return {"k": "c", "t": at, "s": [course.as_list() for course in state.values()]}
+
+def _state(sections: Iterable[list]) -> dict[SectionKey, OfferedCourse]:
+    return snapshot(OfferedCourse(*section) for section in sections)
+
+def _touched(record: dict) -> Generator[SectionKey, None, None]:
+    if record["k"] == "c":
+        yield from ((section[0], section[2]) for section in record["s"])
+        return
+    yield from ((section[0], section[2]) for section in record["a"])
+    yield from ((course_id, section) for course_id, section in record["r"])
+    yield from ((course_id, section) for course_id, section, _ in record["c"])
+
+def _delta(at: float, previous: dict[SectionKey, OfferedCourse], current: dict[SectionKey, OfferedCourse]) -> dict | None:
+    if not (changes := diff_snapshots(previous, current)):
+        return None
+    delta = {"k": "d", "t": at, "a": [], "r": [], "c": []}
+    for change in changes:
+        match change.kind:
+            case "added":
+                delta["a"].append(current[(change.course_id, change.section)].as_list())
+            case "removed":
+                delta["r"].append([change.course_id, change.section])
+            case _:
+                delta["c"].append([change.course_id, change.section, {field: new for field, (_, new) in change.changes.items()}])
+    return delta
+
+def _apply(state: dict[SectionKey, OfferedCourse], record: dict) -> None:
+    if record["k"] == "c":
+        state.clear()
+        state.update(_state(record["s"]))
+        return
+    for section in record["a"]:
+        state[(section[0], section[2])] = OfferedCourse(*section)
+    for course_id, section in record["r"]:
+        state.pop((course_id, section), None)
+    for course_id, section, fields in record["c"]:
+        if (key := (course_id, section)) in state:
+            state[key] = replace(state[key], **fields)
+
+class HistoryStore:
+    def __init__(self, file_path: str, checkpoint_every: int = CONST.HISTORY_CHECKPOINT_EVERY,
+                 compact_after: float = CONST.HISTORY_COMPACT_AFTER, compact_resolution: float = CONST.HISTORY_COMPACT_RESOLUTION) -> None:
+        """
+        Deltas older than `compact_after` seconds are merged into one per `compact_resolution` seconds
+        every time a checkpoint is written
+        """
+        self.file_path = file_path
+        self.checkpoint_every = checkpoint_every
+        self.compact_after = compact_after
+        self.compact_resolution = compact_resolution
+        self.__lock = Lock()
+        self.__checkpoints: list[Checkpoint] = []
+        self.__deltas = 0 # since the last checkpoint
+        self.__state: dict[SectionKey, OfferedCourse] = None
+        self.__scanned: tuple[int, int] = None # signature of the file the checkpoints were found in
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+        self.__scan()
+
+    def __scan(self) -> None:
+        """
+        Finds the checkpoints without decoding the deltas
+        """
+        self.__checkpoints, self.__deltas, self.__state = [], 0, None
+        if (scanned := _signature(self.file_path)) is None:
+            self.__scanned = None
+            return
+        with open(self.file_path, "rb") as history_file:
+            offset = 0
+            for line in history_file:
+                if line.startswith(_CHECKPOINT_PREFIX):
+                    self.__checkpoints.append(Checkpoint(json.loads(line)["t"], offset))
+                    self.__deltas = 0
+                elif line.strip():
+                    self.__deltas += 1
+                offset += len(line)
+        self.__scanned = scanned
+
+    def __sync(self) -> None:
+        """
+        Scans the file again when another process has written to it since
+        """
+        if self.__scanned is None or _signature(self.file_path) != self.__scanned:
+            self.__scan()
+
+    def __records(self, start: float = None) -> Generator[dict, None, None]:
+        """
+        Yields the records from the last checkpoint at or before `start`, from the first one otherwise
+        """
+        offset, scanned = 0, self.__scanned
+        for checkpoint in self.__checkpoints:
+            if start is None or checkpoint.time > start:
+                break
+            offset = checkpoint.offset
+        if not os.path.exists(self.file_path):
+            return
+        with open(self.file_path, "r") as history_file:
+            # the offsets belong to the scanned file, one compacted since is read from its first checkpoint
+            if scanned is None or os.fstat(history_file.fileno()).st_ino != scanned[0]:
+                offset = 0
+            history_file.seek(offset)
+            for line in history_file:
+                # a line without its end is still being written by another process
+                if line.strip() and line.endswith("\n"):
+                    yield json.loads(line)
+
+    def __current(self) -> dict[SectionKey, OfferedCourse]:
+        if self.__state is None:
+            self.__state = dict()
+            for record in self.__records(float("inf")):
+                _apply(self.__state, record)
+        return self.__state
+
+    def __append(self, record: dict) -> None:
+        with open(self.file_path, "ab") as history_file:
+            offset = history_file.tell()
+            history_file.write(_dumps(record).encode())
+        self.__scanned = _signature(self.file_path)
+        if record["k"] == "c":
+            self.__checkpoints.append(Checkpoint(record["t"], offset))
+            self.__deltas = 0
+        else:
+            self.__deltas += 1
+
+    def record(self, courses: Iterable[OfferedCourse], at: float = None) -> int:
+        """
+        Appends the catalog as a delta against the previous one, or as a checkpoint when due.
+        Returns the number of sections that changed, nothing is written when none did.
+        """
+        at = time() if at is None else at
+        current = snapshot(courses)
+        with self.__lock, _file_lock(self.file_path):
+            self.__sync()
+            previous = self.__current()
+            delta = _delta(at, previous, current)
+            if delta is None and self.__checkpoints:
+                return 0
+            if not self.__checkpoints or self.__deltas >= self.checkpoint_every:
+                self.__append(_checkpoint(at, current))
+                self.__compact(at - self.compact_after, self.compact_resolution)
+            else:
+                self.__append(delta)
+            self.__state = current
+        return 0 if delta is None else len(delta["a"]) + len(delta["r"]) + len(delta["c"])
+
+    def series(self, course_id: str, section: int, field: str = "vacancy", start: float = None, end: float = None) -> list[tuple[float, Any]]:
+        """
+        Returns the (time, value) of every change of a section's field between `start` and `end`,
+        beginning with the value it had at `start` when given. The value is None while the section is not offered.
+        """
+        with self.__lock, _file_lock(self.file_path):
+            self.__sync()
+        key = (course_id.upper(), int(section))
+        state: dict[SectionKey, OfferedCourse] = dict()
+        series: list[tuple[float, Any]] = []
+        value = None
+        for record in self.__records(start):
+            if end is not None and record["t"] > end:
+                break
+            if key not in _touched(record) and record["k"] != "c":
+                continue
+            _apply(state, record)
+            new = getattr(state[key], field) if key in state else None
+            if start is not None and record["t"] <= start:
+                value = new
+                continue
+            if start is not None and not series:
+                series.append((start, value))
+            if new != value:
+                series.append((record["t"], new))
+                value = new
+        if start is not None and not series:
+            series.append((start, value))
+        return series
+
+    def filled_within(self, hours: float, start: float = None, end: float = None) -> list[FillEvent]:
+        """
+        Returns the sections that ran out of vacancy within `hours` of first being seen with one, fastest first
+        """
+        with self.__lock, _file_lock(self.file_path):
+            self.__sync()
+        opened: dict[SectionKey, float] = dict()
+        events: dict[SectionKey, FillEvent] = dict()
+        state: dict[SectionKey, OfferedCourse] = dict()
+        for record in self.__records(start):
+            if end is not None and record["t"] > end:
+                break
+            _apply(state, record)
+            for key in _touched(record):
+                if (course := state.get(key)) is None or key in events:
+                    continue
+                if course.vacancy > 0:
+                    opened.setdefault(key, record["t"])
+                elif key in opened and record["t"] - opened[key] <= hours * 3600:
+                    events[key] = FillEvent(*key, opened[key], record["t"])
+        return sorted(events.values(), key=lambda e: (e.filled_at - e.opened_at, e.course_id, e.section))
+
+    def compact(self, before: float = None, resolution: float = None) -> None:
+        with self.__lock, _file_lock(self.file_path):
+            self.__sync()
+            self.__compact(time() - self.compact_after if before is None else before, resolution or self.compact_resolution)
+
+    def __compact(self, before: float, resolution: float) -> None:
+        """
+        Rewrites the records older than `before` as one delta per `resolution` seconds after a single checkpoint,
+        the newer records are kept as they are
+        """
+        # the compacted part starts with a single checkpoint, an older second one means there is new work
+        if sum(1 for checkpoint in self.__checkpoints if checkpoint.time < before) < 2:
+            return
+        tmp_path = f"{self.file_path}.{os.getpid()}.tmp"
+        state: dict[SectionKey, OfferedCourse] = dict()
+        written: dict[SectionKey, OfferedCourse] = None
+        bucket_end, last_time = None, None
+        with open(self.file_path, "r") as history_file, open(tmp_path, "w") as compacted_file:
+            def flush() -> None:
+                nonlocal written
+                if written is None:
+                    record = _checkpoint(last_time, state)
+                elif (record := _delta(last_time, written, state)) is None:
+                    return
+                compacted_file.write(_dumps(record))
+                written = dict(state)
+
+            lines = iter(history_file)
+            for line in lines:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if record["t"] >= before:
+                    if last_time is not None:
+                        flush()
+                    # the newer records start from a checkpoint of their own
+                    _apply(state, record)
+                    compacted_file.write(_dumps(_checkpoint(record["t"], state)) if record["k"] != "c" else line)
+                    for line in lines:
+                        compacted_file.write(line)
+                    break
+                if bucket_end is not None and record["t"] >= bucket_end:
+                    flush()
+                if bucket_end is None or record["t"] >= bucket_end:
+                    bucket_end = record["t"] + resolution
+                _apply(state, record)
+                last_time = record["t"]
+            else:
+                if last_time is not None:
+                    flush()
+        os.replace(tmp_path, self.file_path)
+        self.__scan()
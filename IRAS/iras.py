@@ -1,144 +1,426 @@
+from __future__ import annotations
+import sys
 import json
-import pickle
-from time import sleep
-from os import listdir, mkdir
+import hashlib
+from os import listdir, mkdir, makedirs, path
+from time import sleep, perf_counter
+from random import uniform
+from threading import Lock, Timer
 from datetime import datetime
-
-import requests
-from tqdm import tqdm
-from prettytable.prettytable import PrettyTable
+from typing import TYPE_CHECKING, Any, Callable, Generator, Iterable, TypeVar
+from concurrent.futures import ThreadPoolExecutor
 
 import IRAS.constants as CONST
-from IRAS.Types import OfferedCourse, RegisteredCourse, PreRequisiteCourse, AcademicYear, Semester, AuthData, BTree
-from IRAS.utils import save_as_txt, save_as_xls, get_formatted_time, parse_grade, get_semester_order
+from IRAS.Types import OfferedCourse, RegisteredCourse, PreRequisiteCourse, AuthData, CourseIndex
+from IRAS.utils import get_formatted_time, parse_grade, new_http_session, iter_json_array
+from IRAS.grades import GradeReport
+from IRAS.table import column_widths, write_table
+from IRAS.watch import SectionChange, SectionKey, snapshot, diff_snapshots, format_change
+from IRAS.cache import ResponseCache, CacheWriter, CatalogPool, SingleFlight, hash_chunks
+from IRAS.token_store import TokenStore
+from IRAS.metrics import METRICS, PhaseRecord
+from IRAS.routine import Routine, RoutineBuilder, parse_clock, format_days
+from IRAS.snapshot import save_snapshot
+from IRAS.history import HistoryStore
+from IRAS.export import ExportPipeline, export_rows
+from IRAS.prerequisites import Eligibility, PreRequisiteGraph
+from IRAS.query import CourseQuery, CourseQueryIndex, parse_query
+
+if TYPE_CHECKING:
+    import requests
+    from tqdm import tqdm
+
+_R = TypeVar("_R")
 
 class IRAS:
-    def __init__(self) -> None:
+    def __init__(self,
+                 pool_size: int = CONST.HTTP_POOL_SIZE,
+                 timeout: tuple[float, float] = CONST.HTTP_TIMEOUT,
+                 max_retries: int = CONST.HTTP_MAX_RETRIES,
+                 backoff_factor: float = CONST.HTTP_BACKOFF_FACTOR,
+                 use_cache: bool = True,
+                 offline: bool = False,
+                 catalog_pool: CatalogPool = None,
+                 show_progress: bool = True,
+                 record_history: bool = True,
+                 single_flight: SingleFlight = None,
+                 base_url: str = CONST.BASE_URL) -> None:
+        """
+        With `offline` set every request is served from the response cache
+        and no connection to the server is ever made.
+        A `catalog_pool` lets several instances share identical offered-course catalogs.
+        Progress bars can be turned off with `show_progress` for non-interactive use.
+        The parsed grades, catalog and pre-requisites are kept for the whole session, see `refresh`.
+        Every saved or watched catalog is appended to the student's `history` unless `record_history` is off.
+        Concurrent queries of the same endpoint share one fetch, through `single_flight` when it is shared by several instances.
+        Every request goes to `base_url`, e.g a local test server, tokens of other servers are kept apart.
+        """
         self.__verify_files()
         self.__student_id: int = -1
         self.__auth_token: str = ""
+        self.__offline = offline
+        self.__cache = ResponseCache() if use_cache or offline else None
+        self.__catalog_pool = catalog_pool
+        self.__base_url = base_url
+        self.__token_store = TokenStore(CONST.TOKEN_STORE_PATH if base_url == CONST.BASE_URL else
+                                        f"{path.splitext(CONST.TOKEN_STORE_PATH)[0]}-{hashlib.sha1(base_url.encode()).hexdigest()[:8]}.db")
+        self.__refresh_timer: Timer = None
+        self.__timeout = timeout
+        self.__pbar_lock = Lock()
+        self.__show_progress = show_progress
+        # requests is only imported and the connection pool only built when the first request is made
+        self.__http: requests.Session = None
+        self.__http_options = (pool_size, max_retries, backoff_factor)
+        self.__http_lock = Lock()
+        self.__snapshot: dict[str, Any] = dict() # endpoint -> parsed data of the current session
+        self.__stale: set[str] = set() # refreshed endpoints that must be revalidated with the server
+        self.__record_history = record_history
+        self.__history: HistoryStore = None
+        self.__snapshot_lock = Lock()
+        self.__single_flight = single_flight or SingleFlight()
+        self.__query_index: CourseQueryIndex = None # of the catalog it was built for
 
-    def authenticate_user(self, student_id: int, password: str) -> bool:
+    def authenticate_user(self, student_id: int, password: str, verify: bool = False) -> bool:
+        """
+        With `verify` set the password is always checked, by the server instead of reusing a stored token,
+        or offline against the last password the server accepted
+        """
+        if student_id != self.__student_id:
+            # the data of the previous student is dropped, the new one's is still good in the response cache
+            with self.__snapshot_lock:
+                self.__snapshot.clear()
+            self.__history = None
         self.__student_id = student_id
-        self.__auth_token = self.__get_auth_token(student_id, password)
+        if self.__offline:
+            return not verify or self.__token_store.check_password(student_id, password)
+        self.__cancel_token_refresh()
+        auth_data = self.__get_auth_token(student_id, password, use_store=not verify)
+        self.__auth_token = auth_data.auth_token if auth_data else ""
+        if auth_data:
+            self.__schedule_token_refresh(auth_data, password)
         return self.__auth_token != ""
 
-    def show_grades(self) -> None:
-        registered_courses: dict[str, AcademicYear] = dict()
-        registered_courses_map = list(map(lambda c: RegisteredCourse.NEW_INSTANCE(c, parse_grade),
-                                    self.__fetch_json_data(
-                                        api=CONST.ALL_REGISTERED_COURSE_API(self.__student_id)
-                                    )["data"]
-                                ))
-        
-        pbar = tqdm(total=len(registered_courses_map), desc="Processing data: ")
-        
-        # parse data
-        for course in registered_courses_map:
-            if course.registered_year not in registered_courses.keys():
-                registered_courses.update({
-                    course.registered_year:
-                    AcademicYear(
-                        [
-                            Semester(
-                                course.registered_semester,
-                                get_semester_order(course.registered_semester),
-                                [course]
-                            )
-                        ]
-                    )
-                })
-                pbar.update(1)
-                continue
-
-            semesters = registered_courses.get(course.registered_year).semesters
-            for semester in semesters:
-                if semester.semester_name == course.registered_semester:
-                    semester.courses.append(course)
-                    break
+    def close(self) -> None:
+        self.__cancel_token_refresh()
+        self.__token_store.close()
+        if self.__http is not None:
+            self.__http.close()
+
+    @property
+    def student_id(self) -> int:
+        return self.__student_id
+
+    @property
+    def history(self) -> HistoryStore:
+        """
+        The catalog history of the logged in student
+        """
+        if self.__history is None:
+            self.__history = HistoryStore(path.join(CONST.HISTORY_DIR_PATH, f"{self.__student_id}.jsonl"))
+        return self.__history
+
+    @property
+    def __session(self) -> requests.Session:
+        if self.__http is None:
+            with self.__http_lock:
+                if self.__http is None:
+                    self.__http = new_http_session(*self.__http_options)
+        return self.__http
+
+    def refresh(self, *endpoints: str) -> None:
+        """
+        Drops the session data of the given endpoints, 'registered_courses', 'offered_courses' or 'pre_requisites',
+        or of all of them, so the next query fetches them again bypassing the response cache's time-to-live
+        """
+        with self.__snapshot_lock:
+            # endpoints not queried yet are marked too, so their next query skips the cached copy
+            for endpoint in endpoints or CONST.ENDPOINTS:
+                self.__snapshot.pop(endpoint, None)
+                self.__stale.add(endpoint)
+
+    def revalidate(self, *endpoints: str) -> None:
+        """
+        Fetches the session data of the given endpoints, or of all of them, again bypassing the response cache's time-to-live.
+        Unlike `refresh` the current data is served until the new one is in.
+        """
+        with self.__snapshot_lock:
+            endpoints = endpoints or tuple(self.__snapshot)
+        fetched = {endpoint: self.__fetch(endpoint, ttl=0) for endpoint in endpoints}
+        with self.__snapshot_lock:
+            self.__snapshot.update(fetched)
+            self.__stale.difference_update(fetched)
+        if "offered_courses" in fetched:
+            self.__record(fetched["offered_courses"])
+
+    def get_grades(self, refresh: bool = False) -> GradeReport:
+        return self.__session_data(("registered_courses",), refresh)["registered_courses"]
+
+    def get_offered_courses(self, refresh: bool = False) -> CourseIndex:
+        return self.__session_data(("offered_courses",), refresh)["offered_courses"]
+
+    def get_pre_requisites(self, refresh: bool = False) -> CourseIndex:
+        return self.__session_data(("pre_requisites",), refresh)["pre_requisites"]
+
+    def show_grades(self, file_path: str = "", refresh: bool = False) -> GradeReport:
+        """
+        Prints the grade sheet or writes it to `file_path` when given
+        """
+        report = self.get_grades(refresh)
+        with METRICS.phase("render", exporter="grades") as render:
+            widths = column_widths(CONST.REGISTERED_COURSE_FIELDS, self.__grade_rows(report))
+            if not file_path:
+                write_table(sys.stdout, CONST.REGISTERED_COURSE_FIELDS, self.__grade_rows(report), widths)
+                print()
             else:
-                semesters.append(
-                    Semester(
-                        course.registered_semester,
-                        get_semester_order(course.registered_semester),
-                        [course]
-                    )
-                )
-            pbar.update(1)
-        pbar.close()
+                with open(file_path, "w") as grades_file:
+                    write_table(grades_file, CONST.REGISTERED_COURSE_FIELDS, self.__grade_rows(report), widths)
+            render.records = sum(len(semester.courses) for semester in report.semesters)
+        return report
+
+    @staticmethod
+    def __grade_rows(report: GradeReport) -> Generator[list[str], None, None]:
+        for semester in report.semesters:
+            for course in semester.courses:
+                yield course.as_list()
+            yield [""] * 5
+            yield ["-----", "-----", "-----", "-----", f"GPA: {round(semester.gpa, 2)}"]
+            yield [""] * 5
+            yield ["*"] * 5
+            yield ["*"] * 5
+            yield [""] * 5
+
+        yield ["", "", "", "", f"CGPA: {round(report.cgpa, 2)}"]
+        yield ["", "", "", "", f"Credit earned: {report.credits_earned}"]
 
-        # order semesters by year 
-        registered_courses =  {year: registered_courses[year] for year in sorted(registered_courses)}
-
-        # calculate grades
-        completed_course_map = dict() # to avoid counting same course more than once
-        total_grade: float = 0.0
-        total_credit_count: int = 0
-        table = PrettyTable(field_names=CONST.REGISTERED_COURSE_FIELDS)
-        for a_year in registered_courses.values():
-            # organize semesters (spring -> summer -> autumn)
-            sorted_semesters = sorted(a_year.semesters, key=lambda s: s.order)
-
-            for semester in sorted_semesters:
-                s_cgpa: float = 0.0
-                s_credit_count: int = 0
-                for course in semester.courses:
-                    table.add_row(course.as_list())
-                    if course.grade:
-                        s_cgpa += course.grade * course.credit_count
-                        s_credit_count += course.credit_count
-                        completed_course_map.update({course.course_id: (course.grade, course.credit_count)})
-                table.add_row([""] * 5)
-                table.add_row(["-----", "-----", "-----", "-----", f"GPA: {0.0 if not s_credit_count else round(s_cgpa / s_credit_count, 2)}"])
-                table.add_row([""] * 5)
-                table.add_row(["*"] * 5)
-                table.add_row(["*"] * 5)
-                table.add_row([""] * 5)
-
-        for grade, credit in completed_course_map.values():
-            total_grade += grade * credit
-            total_credit_count += credit
-
-        table.add_row(["", "", "", "", f"CGPA: {0.0 if not total_credit_count else round(total_grade / total_credit_count, 2)}"])
-        table.add_row(["", "", "", "", f"Credit earned: {total_credit_count}"])
-        print(table)
-
-    def save_OfferedCourses(self, query_course_ids: list[str], save_as: str = "both", all: bool = False) -> None:
+    def save_OfferedCourses(self, query_course_ids: list[str], save_as: str = "both", all: bool = False,
+                            txt_file_path: str = CONST.OFFERED_COURSE_TEXT_FILE_PATH,
+                            xls_file_path: str = CONST.OFFERED_COURSE_EXCEL_FILE_PATH,
+                            split_by: str = "", refresh: bool = False, split_files: bool = False,
+                            export_pipeline: ExportPipeline = None) -> list[str]:
         """
         Expects a list of course ids and a saving format
-        which can be one of 'both', 'txt' or 'xls'
+        which can be one of 'both', 'txt' or 'xls'.
+        The excel file gets a worksheet per course or department when `split_by` is 'course' or 'department',
+        with `split_files` every course or department is saved as a file of its own instead.
+        The files are written in parallel by `export_pipeline`. Returns the paths of the written files.
         """
         if not query_course_ids:
-            return print("No query found!")
+            print("No query found!")
+            return []
         
-        offered_course_tree: BTree = BTree.NEW_INSTANCE(
-            map(lambda c: OfferedCourse.NEW_INSTANCE(c, get_formatted_time),
-                    self.__fetch_json_data(
-                        api=CONST.ALL_OFFERED_COURSES_API(self.__student_id),
-                        interval=0
-                        )["data"]["eligibleOfferCourses"]
-                )
-        )
-        pre_requisite_course_tree: BTree = BTree.NEW_INSTANCE(
-            map(lambda c: PreRequisiteCourse.NEW_INSTANCE(c),
-                    self.__fetch_json_data(
-                        api=CONST.PRE_REQUISITES_API(self.__student_id),
-                        interval=0,
-                        progress_message="Fetching pre-requisites"
-                    )["data"] 
-                )
+        indexes = self.__session_data(("offered_courses", "pre_requisites"), refresh,
+                                      progress_message="Fetching offered courses and pre-requisites: ")
+        self.__record(indexes["offered_courses"])
+        return self.__save_queried_courses(indexes["offered_courses"], indexes["pre_requisites"], query_course_ids, save_as, all, txt_file_path, xls_file_path,
+                                    split_by, split_files, export_pipeline)
+
+    def query_OfferedCourses(self, query: CourseQuery | str, save_as: str = "",
+                             txt_file_path: str = CONST.OFFERED_COURSE_TEXT_FILE_PATH,
+                             xls_file_path: str = CONST.OFFERED_COURSE_EXCEL_FILE_PATH,
+                             split_by: str = "", split_files: bool = False, export_pipeline: ExportPipeline = None,
+                             refresh: bool = False) -> list[tuple[str, list[OfferedCourse]]]:
+        """
+        Finds the sections matching a query e.g 'CSE3xx; vacancy > 0; faculty Name; days ST; after 11:00AM',
+        see `IRAS.query` for the syntax. The matches are printed unless `save_as` is 'both', 'txt' or 'xls',
+        in which case they are saved along with their pre-requisites the same as `save_OfferedCourses`.
+        Returns the matching sections grouped by course.
+        """
+        indexes = self.__session_data(("offered_courses", "pre_requisites") if save_as else ("offered_courses",), refresh,
+                                      progress_message="Fetching offered courses and pre-requisites: ")
+        matches = self.find_OfferedCourses(query)
+
+        if save_as:
+            self.__save_queried_courses(indexes["offered_courses"], indexes["pre_requisites"], [], save_as, False, txt_file_path,
+                                        xls_file_path, split_by, split_files, export_pipeline, matches)
+        elif not matches:
+            print("No match found!")
+        else:
+            with METRICS.phase("render", exporter="query") as render:
+                rows = [course.as_list() for _, courses in matches for course in courses]
+                write_table(sys.stdout, CONST.OFFERED_COURSE_FIELDS, rows, column_widths(CONST.OFFERED_COURSE_FIELDS, rows))
+                print(f"\n{len(rows)} sections of {len(matches)} courses matched.")
+                render.records = len(rows)
+        return matches
+
+    def find_OfferedCourses(self, query: CourseQuery | str, refresh: bool = False) -> list[tuple[str, list[OfferedCourse]]]:
+        """
+        Returns the sections matching a query grouped by course, the indexes are built once per catalog
+        """
+        offered_course_index = self.get_offered_courses(refresh)
+        query_index = self.__query_index
+        if query_index is None or query_index.offered_course_index is not offered_course_index:
+            with METRICS.phase("index_build", endpoint="offered_courses", kind="query") as index_build:
+                query_index = self.__query_index = CourseQueryIndex(offered_course_index)
+                index_build.records = len(query_index.rows)
+        return query_index.select(parse_query(query) if isinstance(query, str) else query)
+
+    def watch_OfferedCourses(self, query_course_ids: list[str] = None, interval: float = CONST.WATCH_INTERVAL, jitter: float = None,
+                             on_change: Callable[[list[SectionChange]], None] = None, save_as: str = "", rounds: int = 0,
+                             txt_file_path: str = CONST.OFFERED_COURSE_TEXT_FILE_PATH,
+                             xls_file_path: str = CONST.OFFERED_COURSE_EXCEL_FILE_PATH) -> None:
+        """
+        Polls the offered courses every `interval` (+/- `jitter`, a tenth of it up to `WATCH_JITTER` by default) seconds and reports only the sections
+        whose vacancy, enrollment, capacity, faculty or time slot changed since the previous poll.
+        Watches every course unless `query_course_ids` is given, changes are printed unless `on_change` is given.
+        The export files are only rewritten, in the `save_as` format, when something changed.
+        Runs for `rounds` polls or until interrupted when `rounds` is 0.
+        """
+        query_course_ids = [id.upper() for id in query_course_ids or []]
+        if jitter is None:
+            jitter = min(CONST.WATCH_JITTER, interval / 10)
+        pre_requisite_course_index = self.__session_data(("pre_requisites",))["pre_requisites"]
+        previous: dict[SectionKey, OfferedCourse] = None
+        poll = 0
+        while True:
+            # always revalidate, an unchanged catalog costs a 304 at most
+            offered_course_index = self.__load_offered_courses(ttl=0)
+            with self.__snapshot_lock:
+                self.__snapshot["offered_courses"] = offered_course_index
+            self.__record(offered_course_index)
+            current = snapshot(
+                course for id in (query_course_ids or offered_course_index) for course in offered_course_index.get(id)
+            )
+            changes = diff_snapshots(previous, current) if previous is not None else []
+            if previous is None:
+                print(f"Watching {len(current)} sections...")
+            elif on_change and changes:
+                on_change(changes)
+            else:
+                for change in changes:
+                    print(format_change(change))
+
+            if save_as and (previous is None or changes):
+                self.__save_queried_courses(offered_course_index, pre_requisite_course_index, query_course_ids or [""], save_as,
+                                            not query_course_ids, txt_file_path, xls_file_path)
+            previous = current
+
+            if rounds and (poll := poll + 1) >= rounds:
+                break
+            sleep(max(CONST.WATCH_MIN_SLEEP, interval + uniform(-jitter, jitter)))
+
+    def save_snapshot(self, file_path: str = "", refresh: bool = False) -> str:
+        """
+        Saves the offered courses and pre-requisites as a binary snapshot that can be reopened instantly
+        with `IRAS.snapshot.load_snapshot`, to `SNAPSHOT_DIR_PATH`/<student id>-<timestamp>.iras unless `file_path` is given
+        """
+        indexes = self.__session_data(("offered_courses", "pre_requisites"), refresh,
+                                      progress_message="Fetching offered courses and pre-requisites: ")
+        if not file_path:
+            makedirs(CONST.SNAPSHOT_DIR_PATH, exist_ok=True)
+            file_path = path.join(CONST.SNAPSHOT_DIR_PATH, f"{self.__student_id}-{datetime.now():%Y%m%d-%H%M%S}.iras")
+        with METRICS.phase("file_write", exporter="snapshot") as file_write:
+            save_snapshot(
+                file_path,
+                (course for _, group in indexes["offered_courses"].groups() for course in group),
+                (course for _, group in indexes["pre_requisites"].groups() for course in group)
+            )
+            file_write.bytes = path.getsize(file_path)
+        print(f"Snapshot is saved at {file_path}.")
+        return file_path
+
+    def build_routines(self, query_course_ids: list[str], limit: int = CONST.ROUTINE_LIMIT, min_vacancy: int = 1,
+                       not_before: str = "", not_after: str = "", days_off: str = "", preferred_faculty: Iterable[str] = (),
+                       file_path: str = "", refresh: bool = False) -> list[Routine]:
+        """
+        Prints, or writes to `file_path`, the `limit` best conflict free routines of the queried courses,
+        their labs are paired automatically.
+        Sections need at least `min_vacancy` seats and must fit between `not_before` and `not_after` e.g '9:30AM',
+        days in `days_off` e.g 'RA' are avoided and sections of the `preferred_faculty` are ranked first.
+        """
+        if not query_course_ids:
+            print("No query found!")
+            return []
+
+        builder = RoutineBuilder(
+            self.__session_data(("offered_courses",), refresh)["offered_courses"],
+            query_course_ids,
+            min_vacancy=min_vacancy,
+            not_before=parse_clock(not_before) if not_before else None,
+            not_after=parse_clock(not_after) if not_after else None,
+            days_off=days_off,
+            preferred_faculty=preferred_faculty
         )
+        if unavailable := builder.unavailable:
+            print(f"No suitable section found for {', '.join(unavailable)}!")
+            return []
+        if not (routines := builder.best(limit)):
+            print("No conflict free routine found!")
+            return []
+
+        with METRICS.phase("render", exporter="routine") as render:
+            out = open(file_path, "w") if file_path else sys.stdout
+            try:
+                for i, routine in enumerate(routines, 1):
+                    rows = [section.as_list() for section in routine.sections]
+                    out.write(f"Routine {i} - DAYS: {format_days(routine.days)}, IDLE: {routine.idle_minutes} minutes\n")
+                    write_table(out, CONST.OFFERED_COURSE_FIELDS, rows, column_widths(CONST.OFFERED_COURSE_FIELDS, rows))
+                    out.write("\n\n")
+                    render.records += len(rows)
+            finally:
+                if file_path:
+                    out.close()
+        if file_path:
+            print(f"Routines are saved at {file_path}.")
+        return routines
+
+    def show_eligibility(self, file_path: str = "", refresh: bool = False) -> Eligibility:
+        """
+        Prints, or writes to `file_path`, the offered courses the student is eligible for, the blocked ones
+        with their missing pre-requisite chain and the course that would unlock the most offered sections
+        """
+        indexes = self.__session_data(("offered_courses", "pre_requisites"), refresh,
+                                      progress_message="Fetching offered courses and pre-requisites: ")
+        with METRICS.phase("index_build", endpoint="pre_requisites", kind="graph") as index_build:
+            graph = PreRequisiteGraph(course for _, group in indexes["pre_requisites"].groups() for course in group)
+            index_build.records = len(graph.ids)
+        eligibility = graph.evaluate(indexes["offered_courses"])
+
+        with METRICS.phase("render", exporter="eligibility") as render:
+            out = open(file_path, "w") if file_path else sys.stdout
+            try:
+                out.write(f"Eligible courses ({len(eligibility.eligible)}): {', '.join(eligibility.eligible)}\n\n")
+                rows = [[blocked.course_id, ", ".join(blocked.missing), " -> ".join(blocked.chain)] for blocked in eligibility.blocked]
+                out.write(f"Blocked courses ({len(rows)}):\n")
+                write_table(out, CONST.BLOCKED_COURSE_FIELDS, rows, column_widths(CONST.BLOCKED_COURSE_FIELDS, rows))
+                out.write("\n")
+                if unlock := eligibility.best_unlock:
+                    out.write(f"Completing {unlock.course_id} unlocks {unlock.sections} sections of {', '.join(unlock.courses)}\n")
+                render.records = len(eligibility.eligible) + len(rows)
+            finally:
+                if file_path:
+                    out.close()
+        if file_path:
+            print(f"Eligibility is saved at {file_path}.")
+        return eligibility
 
-        query_course_ids = [id.upper() for id in query_course_ids] if not all else [c.id for c in offered_course_tree]
+    def __record(self, offered_course_index: CourseIndex) -> None:
+        if self.__record_history:
+            self.history.record(course for _, group in offered_course_index.groups() for course in group)
+
+    def __save_queried_courses(self, offered_course_index: CourseIndex, pre_requisite_course_index: CourseIndex, query_course_ids: list[str],
+                               save_as: str, all: bool, txt_file_path: str, xls_file_path: str, split_by: str = "",
+                               split_files: bool = False, export_pipeline: ExportPipeline = None,
+                               matches: list[tuple[str, list[OfferedCourse]]] = None) -> list[str]:
+        """
+        Saves the queried courses, or the `matches` of a query when given, with their pre-requisites
+        """
+        from tqdm import tqdm
+
+        # labs are paired with their theory course by the index
+        if matches is not None:
+            query_courses = matches
+        elif all:
+            query_courses = offered_course_index.groups()
+        else:
+            query_courses = ((id, offered_course_index.get(id)) for id in map(str.upper, query_course_ids))
         queried_courses = []
         sections_count = []
         pre_requisite_courses = []
         pre_requisite_courses_count = []
-        pbar = tqdm(total=len(query_course_ids), desc="Finding match: ")
-        for course_id in query_course_ids:
-            courses = offered_course_tree.get(course_id)
-            pre_reqs = pre_requisite_course_tree.get(course_id)
-            pre_reqs.extend(pre_requisite_course_tree.get(f"{course_id}L"))
+        total = len(matches) if matches is not None else len(offered_course_index) if all else len(query_course_ids)
+        pbar = tqdm(total=total, desc="Finding match: ", disable=not self.__show_progress)
+        for course_id, courses in query_courses:
+            pre_reqs = pre_requisite_course_index.get(course_id)
             queried_courses.extend(courses)
             sections_count.append(len(courses))
             pre_requisite_courses.extend(pre_reqs)
@@ -147,79 +429,299 @@ class IRAS:
         pbar.close()
 
         if not queried_courses:
-            return print("No match found!")
+            print("No match found!")
+            return []
 
         pre_requisite_courses_count = list(filter(lambda c: c != 0, pre_requisite_courses_count))
 
-        match save_as:
-            case "both":
-                save_as_txt(queried_courses, sections_count, pre_requisite_courses, pre_requisite_courses_count)
-                save_as_xls(queried_courses, pre_requisite_courses)
-            case "txt":
-                save_as_txt(queried_courses, sections_count, pre_requisite_courses, pre_requisite_courses_count)
-            case "xls":
-                save_as_xls(queried_courses, pre_requisite_courses)
+        # the rows are built once and shared by every writer
+        rows = export_rows(queried_courses, sections_count, pre_requisite_courses, pre_requisite_courses_count)
+        return (export_pipeline or ExportPipeline()).export(rows, save_as, txt_file_path, xls_file_path, split_by, split_files)
 
-    def __get_auth_token(self, id: int, password: str) -> str:
-        try:
-            with open(CONST.AUTH_FILE_PATH, "rb") as auth_file:
-                auth_data: AuthData = pickle.load(auth_file)
-                if auth_data.student_id == id and auth_data.expires > datetime.now(auth_data.expires.tzinfo):
-                    return auth_data.auth_token
-        except FileNotFoundError:
-            pass
-
-        response = requests.post(
-            CONST.AUTH_TOKEN_API,
-            json={
-                "email": id,
-                "password": password
-            },
-            stream=True
+    def __session_data(self, endpoints: tuple[str, ...], refresh: bool = False, progress_message: str = "") -> dict[str, Any]:
+        """
+        Returns the parsed data of the endpoints from the session snapshot,
+        the missing ones are fetched, in parallel when there are several, and kept for the next query
+        """
+        if refresh:
+            self.refresh(*endpoints)
+        with self.__snapshot_lock:
+            data = {endpoint: self.__snapshot[endpoint] for endpoint in endpoints if endpoint in self.__snapshot}
+            ttls = {endpoint: 0 if endpoint in self.__stale else None for endpoint in endpoints}
+        missing = {
+            endpoint: lambda pbar=None, endpoint=endpoint: self.__fetch(endpoint, pbar, ttls[endpoint])
+            for endpoint in endpoints if endpoint not in data
+        }
+        if len(missing) == 1:
+            fetched = {endpoint: loader() for endpoint, loader in missing.items()}
+        else:
+            # the indexes are built while their payloads are still downloading
+            fetched = self.__fetch_concurrently(missing, progress_message) if missing else {}
+        with self.__snapshot_lock:
+            self.__snapshot.update(fetched)
+            self.__stale.difference_update(fetched)
+        return data | fetched
+
+    def __fetch(self, endpoint: str, pbar: tqdm = None, ttl: float = None) -> Any:
+        """
+        Loads an endpoint, callers asking for the same one while it is loading wait for that load instead of starting another
+        """
+        loaders = {
+            "registered_courses": self.__load_grades,
+            "offered_courses": self.__load_offered_courses,
+            "pre_requisites": self.__load_pre_requisites
+        }
+        student_id = self.__student_id
+
+        def load() -> Any:
+            # another caller may have stored the data after this one found it missing
+            with self.__snapshot_lock:
+                if ttl != 0 and endpoint in self.__snapshot:
+                    return self.__snapshot[endpoint]
+            return loaders[endpoint](pbar, ttl)
+        return self.__single_flight.do((student_id, endpoint), load)
+
+    def __load_grades(self, pbar: tqdm = None, ttl: float = None) -> GradeReport:
+        return self.__load(
+            api=CONST.ALL_REGISTERED_COURSE_API(self.__student_id, self.__base_url),
+            key="data",
+            factory=lambda c: RegisteredCourse.NEW_INSTANCE(c, parse_grade),
+            builder=GradeReport.NEW_INSTANCE,
+            endpoint="registered_courses",
+            pbar=pbar,
+            ttl=ttl
+        )
+
+    def __load_offered_courses(self, pbar: tqdm = None, ttl: float = None) -> CourseIndex:
+        digest = hashlib.sha256()
+        offered_course_index = self.__load(
+            api=CONST.ALL_OFFERED_COURSES_API(self.__student_id, self.__base_url),
+            key="eligibleOfferCourses",
+            factory=lambda c: OfferedCourse.NEW_INSTANCE(c, get_formatted_time),
+            builder=CourseIndex.NEW_INSTANCE,
+            endpoint="offered_courses",
+            pbar=pbar,
+            ttl=ttl,
+            digest=digest
         )
+        if self.__catalog_pool is None:
+            return offered_course_index
+        return self.__catalog_pool.share(digest.hexdigest(), offered_course_index)
+
+    def __load_pre_requisites(self, pbar: tqdm = None, ttl: float = None) -> CourseIndex:
+        return self.__load(
+            api=CONST.PRE_REQUISITES_API(self.__student_id, self.__base_url),
+            key="data",
+            factory=PreRequisiteCourse.NEW_INSTANCE,
+            builder=CourseIndex.NEW_INSTANCE,
+            endpoint="pre_requisites",
+            progress_message="Fetching pre-requisites: ",
+            pbar=pbar,
+            ttl=ttl
+        )
+
+    def __load(self, api: str, key: str, factory: Callable[[dict], Any], builder: Callable[[Iterable], _R], endpoint: str,
+               progress_message: str = "", pbar: tqdm = None, ttl: float = None, digest: "hashlib._Hash" = None) -> _R:
+        """
+        Streams the array under `key` through `factory` into `builder` while it downloads.
+        Each phase of the pipeline is timed on its own.
+        """
+        download = METRICS.new_record("download", endpoint=endpoint)
+        decode = METRICS.new_record("json_decode", endpoint=endpoint)
+        build = METRICS.new_record("model_build", endpoint=endpoint)
+        chunks = self.__iter_response(api, progress_message=progress_message, pbar=pbar, endpoint=endpoint, ttl=ttl, download=download)
+        if digest is not None:
+            chunks = hash_chunks(chunks, digest)
+
+        with METRICS.phase("index_build", endpoint=endpoint) as index:
+            result = builder(self.__build_models(iter_json_array(chunks, key, decode), factory, build))
+            index.records = build.records
+            # the interleaved download, decode and model phases are reported separately
+            index.seconds -= download.seconds + decode.seconds + build.seconds
+        METRICS.commit(decode)
+        METRICS.commit(build)
+        return result
+
+    @staticmethod
+    def __build_models(items: Iterable[dict], factory: Callable[[dict], Any], record: PhaseRecord) -> Generator[Any, None, None]:
+        for item in items:
+            start = perf_counter()
+            model = factory(item)
+            record.seconds += perf_counter() - start
+            record.records += 1
+            yield model
+
+    def __get_auth_token(self, id: int, password: str, use_store: bool = True, show_progress: bool = True) -> AuthData | None:
+        if use_store and (auth_data := self.__token_store.get(id)):
+            return auth_data
+
+        with METRICS.phase("connect", endpoint="auth"):
+            response = self.__session.post(
+                CONST.AUTH_TOKEN_API(self.__base_url),
+                json={
+                    "email": id,
+                    "password": password
+                },
+                stream=True,
+                timeout=self.__timeout
+            )
         json_auth_data = self.__fetch_json_data(response_obj=response,
                                       progress_message="Fetching auth token: ",
-                                      validate_response=False)
+                                      validate_response=False,
+                                      show_progress=show_progress)
         if not (json_auth_data := json_auth_data.get("data", 0)):
             print("Invalid credentials or connection error. Please try again...")
-            return ""
+            return None
         
         json_auth_data = json_auth_data[0]
         expiry_date = json_auth_data["expires"].rsplit(".")
         expiry_date = expiry_date[0] + "+" + expiry_date[1].rsplit("+")[1]
-        new_auth_data = AuthData(self.__student_id, json_auth_data["access_token"], datetime.strptime(expiry_date, "%Y-%m-%dT%H:%M:%S%z"))
-        with open(CONST.AUTH_FILE_PATH, "wb") as auth_file:
-            pickle.dump(new_auth_data, auth_file)
-        return new_auth_data.auth_token
+        new_auth_data = AuthData(id, json_auth_data["access_token"], datetime.strptime(expiry_date, "%Y-%m-%dT%H:%M:%S%z"))
+        self.__token_store.put(new_auth_data)
+        self.__token_store.put_password(id, password)
+        return new_auth_data
+
+    def __schedule_token_refresh(self, auth_data: AuthData, password: str, delay: float = None) -> None:
+        """
+        Renews the token in the background shortly before it expires
+        """
+        if delay is None:
+            remaining = (auth_data.expires - datetime.now(auth_data.expires.tzinfo)).total_seconds()
+            # a token living less than twice the margin would otherwise be renewed again as soon as it arrives
+            delay = remaining - min(CONST.TOKEN_REFRESH_MARGIN, remaining / 2)
+        self.__refresh_timer = Timer(max(delay, CONST.TOKEN_REFRESH_MIN_DELAY), self.__refresh_token, (auth_data, password))
+        self.__refresh_timer.daemon = True
+        self.__refresh_timer.start()
+
+    def __refresh_token(self, current: AuthData, password: str) -> None:
+        try:
+            # another process may have renewed it already
+            auth_data = self.__token_store.get(current.student_id)
+            if not auth_data or auth_data.auth_token == current.auth_token:
+                # a progress bar from the timer thread would land in the middle of an input prompt
+                auth_data = self.__get_auth_token(current.student_id, password, use_store=False, show_progress=False)
+        except Exception as e:
+            print(f"Failed to refresh the auth token! {e}")
+            auth_data = None
+        if current.student_id != self.__student_id:
+            return
+        if auth_data:
+            self.__auth_token = auth_data.auth_token
+            self.__schedule_token_refresh(auth_data, password)
+        elif current.expires > datetime.now(current.expires.tzinfo):
+            # tried again while the current token is still good
+            self.__schedule_token_refresh(current, password, CONST.TOKEN_REFRESH_RETRY_DELAY)
+
+    def __cancel_token_refresh(self) -> None:
+        if self.__refresh_timer:
+            self.__refresh_timer.cancel()
+            self.__refresh_timer = None
 
     def __validate_response_status(self, response: requests.Response) -> None:
         if response.status_code != 200:
-            raise requests.HTTPError(
+            from requests import HTTPError
+            raise HTTPError(
                 f"Falied to complete the request at {response.url}! Status code {response.status_code}.")
  
-    def __fetch_json_data(self, api: str = "", response_obj: requests.Response = None, progress_message: str = "", interval: float = 0.05, validate_response: bool = True) -> dict:
-        response = requests.get(
-            api,
-            headers={
-                "Authorization": f"Bearer {self.__auth_token}"
-            },
-            stream=True
-        ) if not response_obj else response_obj
-
-        data_size = int(response.headers.get("content-length", 0))
-        downloaded_data = b""
-        chunk_size = 1024 #KB
+    def __open_body(self, api: str, response_obj: requests.Response, validate_response: bool, endpoint: str, ttl: float = None, download: PhaseRecord = None) -> tuple[Iterable[bytes], int, CacheWriter | None, requests.Response | None]:
+        """
+        Returns the body chunks of `api` either from the response cache or from the server,
+        along with its size, a cache writer for fresh downloads and the response to release
+        """
+        entry = self.__cache.lookup(api, self.__student_id) if endpoint and self.__cache else None
+        download.labels["source"] = "cache"
+        if endpoint and self.__offline:
+            if not entry:
+                raise RuntimeError(f"No cached response found for {api}! Run once while online.")
+            return self.__cache.iter_body(entry), entry.size, None, None
+        if entry and self.__cache.is_fresh(entry, CONST.CACHE_TTL[endpoint] if ttl is None else ttl):
+            return self.__cache.iter_body(entry), entry.size, None, None
+
+        headers = {
+            "Authorization": f"Bearer {self.__auth_token}"
+        }
+        if entry:
+            headers.update(self.__cache.validators(entry))
+        if not response_obj:
+            with METRICS.phase("connect", endpoint=endpoint):
+                response = self.__session.get(
+                    api,
+                    headers=headers,
+                    stream=True,
+                    timeout=self.__timeout
+                )
+        else:
+            response = response_obj
+
+        if entry and response.status_code == 304:
+            response.close()
+            entry = self.__cache.touch(entry)
+            return self.__cache.iter_body(entry), entry.size, None, None
         if validate_response:
-            self.__validate_response_status(response)
-        pbar = tqdm(total=data_size, desc="Fetching data: " if not progress_message else progress_message, unit="B")
-      
-        for data in response.iter_content(chunk_size=chunk_size):
-            downloaded_data += data
-            pbar.update(chunk_size)
-            sleep(interval)
-        pbar.close()
+            try:
+                self.__validate_response_status(response)
+            except Exception:
+                response.close()
+                raise
+
+        writer = self.__cache.writer(api, self.__student_id, response.headers) if endpoint and self.__cache else None
+        download.labels["source"] = "network"
+        return response.iter_content(chunk_size=CONST.HTTP_CHUNK_SIZE), int(response.headers.get("content-length", 0)), writer, response
+
+    def __iter_response(self, api: str = "", response_obj: requests.Response = None, progress_message: str = "", validate_response: bool = True, pbar: tqdm = None, endpoint: str = "", ttl: float = None, download: PhaseRecord = None, show_progress: bool = True) -> Generator[bytes, None, None]:
+        from tqdm import tqdm
+
+        download = download or METRICS.new_record("download", endpoint=endpoint or "auth")
+        chunks, data_size, writer, response = self.__open_body(api, response_obj, validate_response, endpoint, ttl, download)
+
+        shared_pbar = pbar is not None
+        completed = False
+        try:
+            if shared_pbar:
+                with self.__pbar_lock:
+                    pbar.total += data_size
+                    pbar.refresh()
+            else:
+                pbar = tqdm(total=data_size, desc="Fetching data: " if not progress_message else progress_message, unit="B",
+                            disable=not (self.__show_progress and show_progress))
+
+            for data in METRICS.timed(chunks, download):
+                with self.__pbar_lock:
+                    pbar.update(len(data))
+                if writer:
+                    writer.write(data)
+                yield data
+            completed = True
+        finally:
+            if writer and completed:
+                writer.commit()
+            elif writer:
+                writer.abort()
+            if not shared_pbar and pbar is not None:
+                pbar.close()
+            if response is not None:
+                response.close()
+            METRICS.commit(download)
+
+    def __fetch_json_data(self, api: str = "", response_obj: requests.Response = None, progress_message: str = "", validate_response: bool = True,
+                          show_progress: bool = True) -> dict:
+        downloaded_data = bytearray()
+        for data in self.__iter_response(api, response_obj, progress_message, validate_response, show_progress=show_progress):
+            downloaded_data.extend(data)
+        with METRICS.phase("json_decode", endpoint="auth"):
+            return json.loads(downloaded_data)
+
+    def __fetch_concurrently(self, jobs: dict[str, Callable[[tqdm], _R]], progress_message: str = "") -> dict[str, _R]:
+        """
+        Runs the independent fetch jobs in parallel on the session's connection pool
+        while reporting their combined progress on a single bar
+        """
+        from tqdm import tqdm
 
-        return json.loads(downloaded_data.decode())
+        with tqdm(total=0, desc="Fetching data: " if not progress_message else progress_message, unit="B", disable=not self.__show_progress) as pbar, \
+                ThreadPoolExecutor(max_workers=len(jobs)) as executor:
+            futures = {name: executor.submit(job, pbar) for name, job in jobs.items()}
+            return {name: future.result() for name, future in futures.items()}
 
     def __verify_files(self): 
         if "files" not in listdir():
@@ -0,0 +1,114 @@
+import json
+from time import perf_counter
+from threading import Lock
+from datetime import datetime
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+from typing import Callable, Generator, Iterable, TypeVar
+
+_V = TypeVar("_V")
+
+PHASES = ("connect", "download", "json_decode", "model_build", "index_build", "render", "file_write")
+
+@dataclass(slots=True)
+class PhaseRecord:
+    name: str
+    labels: dict[str, str] = field(default_factory=dict)
+    seconds: float = 0.0
+    bytes: int = 0
+    records: int = 0
+
+    @property
+    def key(self) -> str:
+        return ":".join([self.name, *self.labels.values()])
+
+class Metrics:
+    """
+    Collects the duration, byte and record counts of every phase.
+    Only their totals per phase are kept unless `keep_records` is set, so a long running process does not grow with them.
+    Sinks are called with each record as soon as its phase ends.
+    """
+    def __init__(self, keep_records: bool = False) -> None:
+        self.keep_records = keep_records
+        self.records: list[PhaseRecord] = []
+        self.started = datetime.now()
+        self.__totals: dict[str, dict] = dict()
+        self.__sinks: list[Callable[[PhaseRecord], None]] = []
+        self.__lock = Lock()
+
+    def add_sink(self, sink: Callable[[PhaseRecord], None]) -> None:
+        self.__sinks.append(sink)
+
+    def remove_sink(self, sink: Callable[[PhaseRecord], None]) -> None:
+        self.__sinks.remove(sink)
+
+    def new_record(self, name: str, **labels: str) -> PhaseRecord:
+        return PhaseRecord(name, {k: str(v) for k, v in labels.items() if v})
+
+    def commit(self, record: PhaseRecord) -> None:
+        with self.__lock:
+            if self.keep_records:
+                self.records.append(record)
+            phase = self.__totals.setdefault(record.key, {"count": 0, "seconds": 0.0, "bytes": 0, "records": 0})
+            phase["count"] += 1
+            phase["seconds"] += record.seconds
+            phase["bytes"] += record.bytes
+            phase["records"] += record.records
+        for sink in self.__sinks:
+            sink(record)
+
+    @contextmanager
+    def phase(self, name: str, **labels: str) -> Generator[PhaseRecord, None, None]:
+        record = self.new_record(name, **labels)
+        start = perf_counter()
+        try:
+            yield record
+        finally:
+            record.seconds += perf_counter() - start
+            self.commit(record)
+
+    def timed(self, it: Iterable[_V], record: PhaseRecord) -> Generator[_V, None, None]:
+        """
+        Adds the time spent producing every item of `it` to the record, not the time spent consuming them
+        """
+        it = iter(it)
+        while True:
+            start = perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                record.seconds += perf_counter() - start
+                return
+            record.seconds += perf_counter() - start
+            if isinstance(item, (bytes, bytearray)):
+                record.bytes += len(item)
+            else:
+                record.records += 1
+            yield item
+
+    def summary(self) -> dict[str, dict]:
+        with self.__lock:
+            return {key: dict(phase) for key, phase in self.__totals.items()}
+
+    def report(self) -> dict:
+        with self.__lock:
+            records = list(self.records)
+        return {
+            "started": self.started.isoformat(timespec="seconds"),
+            "finished": datetime.now().isoformat(timespec="seconds"),
+            "summary": self.summary(),
+            "phases": [asdict(record) for record in records]
+        }
+
+    def save(self, file_path: str) -> None:
+        with open(file_path, "w") as report_file:
+            json.dump(self.report(), report_file, indent=2)
+
+    def reset(self) -> None:
+        with self.__lock:
+            self.records = []
+            self.__totals = dict()
+            self.started = datetime.now()
+
+# shared by every IRAS instance and exporter of the process
+METRICS = Metrics()
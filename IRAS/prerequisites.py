@@ -0,0 +1,134 @@
+from __future__ import annotations
+from collections import Counter
+from typing import Iterable, NamedTuple
+
+from IRAS.Types import PreRequisiteCourse, CourseIndex, theory_id
+
+Blocked = NamedTuple("Blocked", [
+    ("course_id", str),
+    ("missing", list[str]), # direct pre-requisites that are not completed
+    ("chain", list[str]) # every course still to be completed, in the order they can be taken
+])
+
+Unlock = NamedTuple("Unlock", [
+    ("course_id", str),
+    ("courses", list[str]), # offered courses that become eligible once it is completed
+    ("sections", int)
+])
+
+Eligibility = NamedTuple("Eligibility", [
+    ("eligible", list[str]),
+    ("blocked", list[Blocked]),
+    ("best_unlock", Unlock | None)
+])
+
+def _bits(mask: int) -> list[int]:
+    bits = []
+    while mask:
+        low = mask & -mask
+        bits.append(low.bit_length() - 1)
+        mask ^= low
+    return bits
+
+class PreRequisiteGraph:
+    """
+    Pre-requisite graph of theory course ids, labs share the node of their theory course.
+    Every course gets a bit in topological order and the transitive closure is kept as one bitset per course,
+    so the eligibility of a whole catalog is a couple of integer operations per course
+    and the bits of a missing chain come out in the order the courses can be taken.
+    """
+    def __init__(self, pre_requisite_courses: Iterable[PreRequisiteCourse], completed: Iterable[str] = ()) -> None:
+        edges: dict[str, set[str]] = dict()
+        completed_ids = {theory_id(id.upper()) for id in completed}
+        for course in pre_requisite_courses:
+            course_id, pre_id = theory_id(course.course_id), theory_id(course.pre_requisite_course_id)
+            edges.setdefault(course_id, set())
+            edges.setdefault(pre_id, set())
+            if pre_id != course_id:
+                edges[course_id].add(pre_id)
+            if course.status == "Completed":
+                completed_ids.add(pre_id)
+
+        self.ids, self.__acyclic = self.__topological_order(edges)
+        self.bits: dict[str, int] = {id: bit for bit, id in enumerate(self.ids)}
+        self.direct: list[int] = [sum(1 << self.bits[pre_id] for pre_id in edges[id]) for id in self.ids]
+        self.completed: int = sum(1 << self.bits[id] for id in completed_ids if id in self.bits)
+        self.closure: list[int] = self.__propagate(self.direct)
+        # the closure through the courses that are not completed yet, the chain still to be taken
+        self.pending: list[int] = self.__propagate([mask & ~self.completed for mask in self.direct])
+
+    @staticmethod
+    def __topological_order(edges: dict[str, set[str]]) -> tuple[list[str], int]:
+        """
+        Kahn's algorithm, courses on or behind a cycle are appended in sorted order after the rest.
+        Returns the order and the number of courses before them.
+        """
+        dependents: dict[str, list[str]] = {id: [] for id in edges}
+        remaining = {id: len(pre_ids) for id, pre_ids in edges.items()}
+        for id, pre_ids in edges.items():
+            for pre_id in pre_ids:
+                dependents[pre_id].append(id)
+        order = sorted(id for id, count in remaining.items() if not count)
+        for id in order:
+            for dependent in dependents[id]:
+                remaining[dependent] -= 1
+                if not remaining[dependent]:
+                    order.append(dependent)
+        return order + sorted(id for id, count in remaining.items() if count), len(order)
+
+    def __propagate(self, direct: list[int]) -> list[int]:
+        closure = list(direct)
+        # pre-requisites come first so one pass settles every course that is not behind a cycle
+        for bit in range(len(closure)):
+            for pre_bit in _bits(direct[bit]):
+                closure[bit] |= closure[pre_bit]
+        changed = self.__acyclic < len(closure)
+        while changed:
+            changed = False
+            for bit in range(self.__acyclic, len(closure)):
+                mask = closure[bit]
+                for pre_bit in _bits(mask):
+                    mask |= closure[pre_bit]
+                if mask != closure[bit]:
+                    closure[bit], changed = mask, True
+        return closure
+
+    def __ids(self, mask: int) -> list[str]:
+        return [self.ids[bit] for bit in _bits(mask)]
+
+    def pre_requisites(self, course_id: str) -> list[str]:
+        """
+        Returns every direct and indirect pre-requisite of the course in the order they can be taken
+        """
+        bit = self.bits.get(theory_id(course_id.upper()))
+        return [] if bit is None else self.__ids(self.closure[bit])
+
+    def missing(self, course_id: str) -> list[str]:
+        bit = self.bits.get(theory_id(course_id.upper()))
+        return [] if bit is None else self.__ids(self.pending[bit])
+
+    def evaluate(self, offered_course_index: CourseIndex) -> Eligibility:
+        """
+        Splits the offered courses into the eligible and the blocked ones in a single pass
+        and finds the course whose completion would make the most offered sections eligible
+        """
+        eligible: list[str] = []
+        blocked: list[Blocked] = []
+        unlocks: dict[int, list[str]] = dict()
+        sections: Counter[int] = Counter()
+        not_completed = ~self.completed
+        for course_id, courses in offered_course_index.groups():
+            if (bit := self.bits.get(course_id)) is None or not (missing := self.direct[bit] & not_completed):
+                eligible.append(course_id)
+                continue
+            blocked.append(Blocked(course_id, self.__ids(missing), self.__ids(self.pending[bit] & ~(1 << bit))))
+            # a single missing pre-requisite is the only way one course can unblock another
+            if not missing & (missing - 1):
+                unlocks.setdefault(missing, []).append(course_id)
+                sections[missing] += len(courses)
+
+        best_unlock = None
+        if sections:
+            mask, count = min(sections.items(), key=lambda item: (-item[1], self.ids[item[0].bit_length() - 1]))
+            best_unlock = Unlock(self.ids[mask.bit_length() - 1], unlocks[mask], count)
+        return Eligibility(eligible, blocked, best_unlock)
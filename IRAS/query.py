@@ -0,0 +1,206 @@
+"""
+Filters over the offered courses, every clause of a query is separated by ; e.g
+
+    CSE3xx; vacancy > 0; faculty Name One, Name Two; days ST; after 11:00AM
+
+    CSE101 MAT2xx   course codes, xx or * matches any number, labs come along with their theory course
+    dept CSE, MAT   departments, a bare department code e.g CSE works too
+    faculty NAME    sections of any of the comma separated faculties, a part of the name is enough
+    days ST         sections meeting on any of the days
+    after 11:00AM   sections starting at or after the time
+    before 2:00PM   sections starting before the time
+    vacancy > 0     vacancy compared with >, >=, =, <= or <
+
+Clauses must all hold, the values within a clause are alternatives.
+"""
+from __future__ import annotations
+import re
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from typing import Generator, Iterable
+
+from IRAS.Types import OfferedCourse, CourseIndex, theory_id
+from IRAS.routine import DAYS, MINUTES_PER_DAY, parse_time_slot, parse_clock
+from IRAS.utils import split_key
+
+# sections are indexed by the half hour they start in
+BUCKET_MINUTES = 30
+
+_VACANCY = re.compile(r"vacancy\s*(>=|<=|>|<|=)?\s*(\d+)", re.IGNORECASE)
+_COURSE = re.compile(r"([A-Z]+)\d*[X*]*L?")
+
+@dataclass(slots=True)
+class CourseQuery:
+    courses: list[str] = field(default_factory=list) # course codes or patterns e.g CSE3xx
+    departments: list[str] = field(default_factory=list)
+    faculty: list[str] = field(default_factory=list)
+    days: str = ""
+    after: int | None = None # minutes since midnight
+    before: int | None = None
+    min_vacancy: int | None = None
+    max_vacancy: int | None = None
+
+def parse_query(text: str) -> CourseQuery:
+    query = CourseQuery()
+    for clause in filter(None, map(str.strip, text.split(";"))):
+        name, _, value = clause.partition(" ")
+        match name.lower():
+            case "dept" | "department":
+                query.departments.extend(filter(None, map(str.strip, value.upper().replace(",", " ").split())))
+            case "faculty":
+                query.faculty.extend(filter(None, map(str.strip, value.split(","))))
+            case "days" | "on":
+                if not (days := value.strip().upper()) or any(day not in DAYS for day in days):
+                    raise ValueError(f"Invalid days {value.strip()}, use {DAYS}!")
+                query.days += days
+            case "after":
+                query.after = parse_clock(value)
+            case "before":
+                query.before = parse_clock(value)
+            case _ if (match := _VACANCY.fullmatch(clause)):
+                operator, number = match.group(1) or "=", int(match.group(2))
+                if operator in (">", ">=", "="):
+                    query.min_vacancy = max(query.min_vacancy or 0, number + (operator == ">"))
+                if operator in ("<", "<=", "="):
+                    bound = number - (operator == "<")
+                    query.max_vacancy = bound if query.max_vacancy is None else min(query.max_vacancy, bound)
+            case _:
+                for code in clause.upper().replace(",", " ").split():
+                    if not (match := _COURSE.fullmatch(code)):
+                        raise ValueError(f"Invalid clause {clause}!")
+                    (query.departments if match.group(1) == code else query.courses).append(code)
+    return query
+
+def _union(bitsets: Iterable[int]) -> int:
+    rows = 0
+    for bits in bitsets:
+        rows |= bits
+    return rows
+
+def _bitset(rows: list[int]) -> int:
+    """
+    Returns the bitset of the ascending row ids
+    """
+    if not rows:
+        return 0
+    bits = bytearray(rows[-1] // 8 + 1)
+    for row in rows:
+        bits[row >> 3] |= 1 << (row & 7)
+    return int.from_bytes(bits, "little")
+
+def _suffix_unions(bitsets: list[int]) -> list[int]:
+    """
+    Returns the union of every bitset from each position to the end, with an empty one after the last
+    """
+    unions = [0] * (len(bitsets) + 1)
+    for i in range(len(bitsets) - 1, -1, -1):
+        unions[i] = unions[i + 1] | bitsets[i]
+    return unions
+
+def row_ids(rows: int) -> Generator[int, None, None]:
+    """
+    Yields the set bits of a bitset in ascending order
+    """
+    bits = bin(rows)[:1:-1] # lowest bit first
+    row = bits.find("1")
+    while row != -1:
+        yield row
+        row = bits.find("1", row + 1)
+
+class CourseQueryIndex:
+    """
+    Secondary indexes of the sections of a catalog, each mapping a key to the bitset of the rows having it.
+    A query intersects the bitsets of its clauses and only the matching rows are ever looked at.
+    The rows follow the order of the catalog, so the matches come out grouped by course.
+    """
+    def __init__(self, offered_course_index: CourseIndex) -> None:
+        self.offered_course_index = offered_course_index
+        self.rows: list[OfferedCourse] = [course for _, group in offered_course_index.groups() for course in group]
+        self.starts: list[int] = []
+
+        departments: dict[str, list[int]] = dict()
+        faculties: dict[str, list[int]] = dict()
+        days: list[list[int]] = [[] for _ in DAYS]
+        buckets: list[list[int]] = [[] for _ in range(MINUTES_PER_DAY // BUCKET_MINUTES)]
+        vacancies: dict[int, list[int]] = dict()
+        for row, course in enumerate(self.rows):
+            slot = parse_time_slot(course.time_slot)
+            self.starts.append(slot.start if slot.mask else -1)
+            departments.setdefault(split_key(course.course_id, "department"), []).append(row)
+            faculties.setdefault(course.faculty.lower(), []).append(row)
+            for day in range(len(DAYS)):
+                if slot.days >> day & 1:
+                    days[day].append(row)
+            if slot.mask:
+                buckets[slot.start // BUCKET_MINUTES].append(row)
+            vacancies.setdefault(course.vacancy, []).append(row)
+
+        self.all = (1 << len(self.rows)) - 1
+        # the sections of a course are consecutive rows, so a course only keeps where they start and end
+        self.courses: dict[str, range] = dict()
+        start = 0
+        for id, group in offered_course_index.groups():
+            self.courses[id] = range(start, start := start + len(group))
+        self.departments = {department: _bitset(rows) for department, rows in departments.items()}
+        self.faculties = {faculty: _bitset(rows) for faculty, rows in faculties.items()}
+        self.days = [_bitset(rows) for rows in days]
+        self.buckets = [_bitset(rows) for rows in buckets]
+        # a range of start times or vacancies is a single lookup in the unions from every key onwards
+        self.__starting_from = _suffix_unions(self.buckets)
+        self.vacancies = sorted(vacancies)
+        self.__vacancy_from = _suffix_unions([_bitset(vacancies[vacancy]) for vacancy in self.vacancies])
+
+    def __started_at_or_after(self, minutes: int) -> int:
+        bucket = min(minutes // BUCKET_MINUTES, len(self.buckets) - 1)
+        rows = self.__starting_from[bucket + 1]
+        # only the bucket the time falls in has to be checked row by row
+        return rows | _bitset([row for row in row_ids(self.buckets[bucket]) if self.starts[row] >= minutes])
+
+    def __course(self, id: str) -> int:
+        if (rows := self.courses.get(id)) is None:
+            return 0
+        return ((1 << len(rows)) - 1) << rows.start
+
+    def __courses(self, codes: list[str]) -> int:
+        rows = 0
+        for code in codes:
+            if any(char in "X*" for char in code[_COURSE.match(code).end(1):]):
+                rows |= _union(self.__course(id) for id in self.offered_course_index.prefix(code))
+            else:
+                rows |= self.__course(theory_id(code))
+        return rows
+
+    def match(self, query: CourseQuery) -> int:
+        """
+        Returns the bitset of the rows matching every clause of the query
+        """
+        rows = self.all
+        if query.courses or query.departments:
+            rows &= self.__courses(query.courses) | \
+                _union(self.departments.get(department, 0) for department in query.departments)
+        if query.faculty:
+            names = [name.strip().lower() for name in query.faculty]
+            rows &= _union(bits for faculty, bits in self.faculties.items() if any(name in faculty for name in names))
+        if query.days:
+            rows &= _union(self.days[DAYS.index(day)] for day in query.days)
+        if query.after is not None:
+            rows &= self.__started_at_or_after(query.after)
+        if query.before is not None:
+            rows &= self.__starting_from[0] & ~self.__started_at_or_after(query.before)
+        if query.min_vacancy is not None:
+            rows &= self.__vacancy_from[bisect_left(self.vacancies, query.min_vacancy)]
+        if query.max_vacancy is not None:
+            rows &= ~self.__vacancy_from[bisect_right(self.vacancies, query.max_vacancy)]
+        return rows
+
+    def select(self, query: CourseQuery | str) -> list[tuple[str, list[OfferedCourse]]]:
+        """
+        Returns the matching sections grouped by their theory course id in catalog order
+        """
+        if isinstance(query, str):
+            query = parse_query(query)
+        groups: dict[str, list[OfferedCourse]] = dict()
+        for row in row_ids(self.match(query)):
+            course = self.rows[row]
+            groups.setdefault(theory_id(course.course_id), []).append(course)
+        return list(groups.items())
@@ -0,0 +1,232 @@
+from __future__ import annotations
+import re
+import heapq
+from functools import lru_cache
+from itertools import count
+from typing import Callable, Generator, Iterable, NamedTuple
+
+from IRAS.Types import OfferedCourse, CourseIndex, is_lab, theory_id
+
+# IUB day codes, Sunday first
+DAYS = "SMTWRFA"
+MINUTES_PER_DAY = 24 * 60
+# every bit of a mask covers this many minutes, class times are multiples of it
+SLOT_MINUTES = 5
+SLOTS_PER_DAY = MINUTES_PER_DAY // SLOT_MINUTES
+DAY_MASK = (1 << SLOTS_PER_DAY) - 1
+
+# a campus day weighs as much as this many idle minutes and a non preferred faculty as much as this many
+DAY_PENALTY = 120
+FACULTY_PENALTY = 60
+
+_TIME = re.compile(r"(\d{1,2}):?(\d{2})\s*([AP]M)?", re.IGNORECASE)
+
+TimeSlot = NamedTuple("TimeSlot", [
+    ("days", int), # one bit per day of `DAYS`
+    ("start", int), # minutes since midnight
+    ("end", int),
+    ("mask", int) # one bit per `SLOT_MINUTES` of the week the slot is busy
+])
+
+Option = NamedTuple("Option", [
+    ("sections", tuple[OfferedCourse, ...]), # a theory section along with its paired lab section
+    ("mask", int),
+    ("days", int),
+    ("start", int),
+    ("end", int),
+    ("non_preferred", int)
+])
+
+Routine = NamedTuple("Routine", [
+    ("sections", list[OfferedCourse]),
+    ("days", int),
+    ("idle_minutes", int),
+    ("non_preferred", int),
+    ("penalty", int)
+])
+
+def _minutes(hour: str, minute: str, notation: str | None) -> int:
+    hour = int(hour)
+    if notation:
+        hour = hour % 12 + (12 if notation.upper() == "PM" else 0)
+    return hour * 60 + int(minute)
+
+@lru_cache(maxsize=1024)
+def parse_time_slot(time_slot: str) -> TimeSlot:
+    """
+    Parses either the raw 'ST 0830-1000' or the formatted 'ST 8:30AM-10:00AM' time slot.
+    A slot that can not be parsed e.g 'TBA' occupies no time.
+    """
+    day_codes, _, times = time_slot.strip().partition(" ")
+    bounds = _TIME.findall(times)
+    if len(bounds) != 2 or not day_codes or any(day not in DAYS for day in day_codes.upper()):
+        return TimeSlot(0, 0, 0, 0)
+    start, end = _minutes(*bounds[0]), _minutes(*bounds[1])
+    if end <= start:
+        return TimeSlot(0, 0, 0, 0)
+
+    days, mask = 0, 0
+    first, last = start // SLOT_MINUTES, -(-end // SLOT_MINUTES)
+    interval = ((1 << (last - first)) - 1) << first
+    for day in day_codes.upper():
+        days |= 1 << DAYS.index(day)
+        mask |= interval << DAYS.index(day) * SLOTS_PER_DAY
+    return TimeSlot(days, start, end, mask)
+
+def parse_clock(clock: str) -> int:
+    """
+    Returns the minutes since midnight of '0830', '8:30', '8:30AM' or '2:30 pm'
+    """
+    if not (match := _TIME.fullmatch(clock.strip())):
+        raise ValueError(f"Invalid time {clock}!")
+    return _minutes(*match.groups())
+
+def idle_minutes(mask: int) -> int:
+    """
+    Returns the free minutes between the first and the last class of every day
+    """
+    idle = 0
+    for day in range(len(DAYS)):
+        if busy := mask >> day * SLOTS_PER_DAY & DAY_MASK:
+            first = (busy & -busy).bit_length() - 1
+            idle += busy.bit_length() - first - busy.bit_count()
+    return idle * SLOT_MINUTES
+
+class RoutineBuilder:
+    """
+    Finds the conflict free combinations of one section, paired with a lab section when the course has a lab,
+    of every requested course.
+    Sections are filtered by the constraints up front, the course with the fewest fitting sections is placed first
+    and a branch is dropped as soon as a remaining course has no section left that fits.
+    """
+    def __init__(self, offered_course_index: CourseIndex, course_ids: Iterable[str], min_vacancy: int = 0,
+                 not_before: int = None, not_after: int = None, days_off: str = "",
+                 preferred_faculty: Iterable[str] = ()) -> None:
+        self.course_ids = list(dict.fromkeys(theory_id(id.upper()) for id in course_ids))
+        self.min_vacancy = min_vacancy
+        self.not_before = not_before
+        self.not_after = not_after
+        self.days_off = sum(1 << DAYS.index(day) for day in days_off.upper() if day in DAYS)
+        self.preferred_faculty = {faculty.strip().lower() for faculty in preferred_faculty if faculty.strip()}
+
+        self.options: dict[str, list[Option]] = {id: self.__options(offered_course_index.get(id)) for id in self.course_ids}
+
+    @property
+    def unavailable(self) -> list[str]:
+        """
+        Returns the requested courses that have no section satisfying the constraints
+        """
+        return [id for id in self.course_ids if not self.options[id]]
+
+    def __allowed(self, course: OfferedCourse) -> bool:
+        slot = parse_time_slot(course.time_slot)
+        return course.vacancy >= self.min_vacancy and not slot.days & self.days_off and \
+            (self.not_before is None or not slot.mask or slot.start >= self.not_before) and \
+            (self.not_after is None or not slot.mask or slot.end <= self.not_after)
+
+    def __option(self, sections: tuple[OfferedCourse, ...]) -> Option | None:
+        mask, days, start, end = 0, 0, MINUTES_PER_DAY, 0
+        for section in sections:
+            slot = parse_time_slot(section.time_slot)
+            if mask & slot.mask:
+                return None
+            mask |= slot.mask
+            days |= slot.days
+            if slot.mask:
+                start, end = min(start, slot.start), max(end, slot.end)
+        non_preferred = sum(1 for section in sections if section.faculty.lower() not in self.preferred_faculty) if self.preferred_faculty else 0
+        return Option(sections, mask, days, start, end, non_preferred)
+
+    def __options(self, courses: list[OfferedCourse]) -> list[Option]:
+        theories = [course for course in courses if not is_lab(course.course_id)]
+        labs = [course for course in courses if is_lab(course.course_id)]
+        if not labs or not theories:
+            pairs = ((course,) for course in courses if self.__allowed(course))
+        else:
+            theories = [theory for theory in theories if self.__allowed(theory)]
+            allowed_labs = [lab for lab in labs if self.__allowed(lab)]
+            # a lab section belongs to the theory section of the same number, any lab goes for a theory section without one
+            lab_sections = {lab.section for lab in labs}
+            pairs = (
+                (theory, lab) for theory in theories for lab in allowed_labs
+                if lab.section == theory.section or theory.section not in lab_sections
+            )
+        options = [option for pair in pairs if (option := self.__option(pair))]
+        options.sort(key=lambda o: (o.non_preferred, o.start))
+        return options
+
+    def __search(self, domains: list[list[Option]], mask: int, days: int, non_preferred: int, chosen: list[Option],
+                 prune: Callable[[int, int, list[list[Option]]], bool] = None, rank: bool = False) -> Generator[list[Option], None, None]:
+        """
+        Forward checking search, the course with the fewest sections left is placed next and
+        the sections of every remaining course that clash with it are dropped before going deeper
+        """
+        if prune is not None and prune(days, non_preferred, domains):
+            return
+        if not domains:
+            yield list(chosen)
+            return
+        i = min(range(len(domains)), key=lambda i: len(domains[i]))
+        rest = domains[:i] + domains[i + 1:]
+        # options that add no new campus day are tried first so a good bound is found early
+        options = sorted(domains[i], key=lambda o: ((o.days | days).bit_count(), o.non_preferred)) if rank else domains[i]
+        for option in options:
+            busy = mask | option.mask
+            narrowed = []
+            for domain in rest:
+                if not (fitting := [o for o in domain if not o.mask & busy]):
+                    break
+                narrowed.append(fitting)
+            else:
+                chosen.append(option)
+                yield from self.__search(narrowed, busy, days | option.days, non_preferred + option.non_preferred, chosen, prune, rank)
+                chosen.pop()
+
+    def __routine(self, chosen: list[Option]) -> Routine:
+        mask, days, non_preferred = 0, 0, 0
+        for option in chosen:
+            mask |= option.mask
+            days |= option.days
+            non_preferred += option.non_preferred
+        idle = idle_minutes(mask)
+        by_course = {theory_id(option.sections[0].course_id): option.sections for option in chosen}
+        sections = [section for id in self.course_ids if id in by_course for section in by_course[id]]
+        return Routine(sections, days, idle, non_preferred, days.bit_count() * DAY_PENALTY + idle + non_preferred * FACULTY_PENALTY)
+
+    def __iter__(self) -> Generator[Routine, None, None]:
+        """
+        Yields every conflict free routine in search order
+        """
+        if self.unavailable or not self.course_ids:
+            return
+        for chosen in self.__search([self.options[id] for id in self.course_ids], 0, 0, 0, []):
+            yield self.__routine(chosen)
+
+    def best(self, limit: int = 5) -> list[Routine]:
+        """
+        Returns the `limit` routines with the fewest campus days, idle minutes and non preferred faculties.
+        Branches that can not beat the worst kept routine are cut early.
+        """
+        if self.unavailable or not self.course_ids or limit <= 0:
+            return []
+        kept: list[tuple[int, int, Routine]] = [] # max heap of (-penalty, -tie breaker, routine)
+        tie_breaker = count()
+
+        def prune(days: int, non_preferred: int, domains: list[list[Option]]) -> bool:
+            # campus days and faculties only add up while idle minutes may shrink, so the bound leaves them out
+            if len(kept) < limit:
+                return False
+            non_preferred += sum(min(o.non_preferred for o in domain) for domain in domains)
+            return days.bit_count() * DAY_PENALTY + non_preferred * FACULTY_PENALTY >= -kept[0][0]
+
+        for chosen in self.__search([self.options[id] for id in self.course_ids], 0, 0, 0, [], prune, rank=True):
+            routine = self.__routine(chosen)
+            entry = (-routine.penalty, -next(tie_breaker), routine)
+            if len(kept) < limit:
+                heapq.heappush(kept, entry)
+            elif routine.penalty < -kept[0][0]:
+                heapq.heapreplace(kept, entry)
+        return [routine for _, _, routine in sorted(kept, reverse=True)]
+
+def format_days(days: int) -> str:
+    return "".join(day for i, day in enumerate(DAYS) if days >> i & 1)
@@ -0,0 +1,220 @@
+"""
+Binary columnar snapshots of a catalog and its pre-requisites.
+
+    magic | header length (u32) | JSON header | padding | columns and string table
+
+Every column is a fixed width array of 32 bit integers, text fields hold ids into a single
+string table whose ids follow the sorted order of the strings. The rows are sorted by course id
+and section, so a snapshot is searched in place through memory mapped views without building
+an object per row.
+"""
+from __future__ import annotations
+import os
+import sys
+import json
+import mmap
+import struct
+from sys import intern
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import BinaryIO, Iterable
+
+from IRAS.Types import OfferedCourse, PreRequisiteCourse, StringTable, Columns, OfferedCourseColumns, PreRequisiteColumns, theory_id
+
+MAGIC = b"IRASCOL1"
+VERSION = 1
+ALIGNMENT = 8
+TABLES: dict[str, type[Columns]] = {
+    "offered_courses": OfferedCourseColumns,
+    "pre_requisites": PreRequisiteColumns
+}
+
+def _padding(position: int) -> bytes:
+    return b"\0" * (-position % ALIGNMENT)
+
+def _sorted_strings(strings: StringTable) -> tuple[list[str], array]:
+    """
+    Returns the strings in sorted order along with the new id of every old id
+    """
+    order = sorted(range(len(strings)), key=strings.__getitem__)
+    new_ids = array("I", bytes(4 * len(order)))
+    for new_id, old_id in enumerate(order):
+        new_ids[old_id] = new_id
+    return [strings[id] for id in order], new_ids
+
+def save_snapshot(file_path: str, offered_courses: Iterable[OfferedCourse], pre_requisite_courses: Iterable[PreRequisiteCourse] = ()) -> None:
+    strings = StringTable()
+    sort_key = lambda c: (c.course_id, getattr(c, "section", 0))
+    tables: dict[str, Columns] = {
+        "offered_courses": OfferedCourseColumns.NEW_INSTANCE(sorted(offered_courses, key=sort_key), strings),
+        "pre_requisites": PreRequisiteColumns.NEW_INSTANCE(sorted(pre_requisite_courses, key=sort_key), strings)
+    }
+    sorted_strings, new_ids = _sorted_strings(strings)
+
+    # the blocks are laid out first, their offsets are relative to the end of the header
+    blocks: list[bytes] = []
+    position = 0
+    def add_block(data: bytes) -> int:
+        nonlocal position
+        offset = position
+        blocks.append(data + _padding(len(data)))
+        position += len(blocks[-1])
+        return offset
+
+    header = {"version": VERSION, "byteorder": sys.byteorder, "created": datetime.now().isoformat(timespec="seconds"), "tables": {}}
+    for name, table in tables.items():
+        columns = dict()
+        for field, column in table.columns.items():
+            if field in table.STRING_FIELDS:
+                column = array("I", (new_ids[id] for id in column))
+            columns[field] = {"type": column.typecode, "offset": add_block(column.tobytes())}
+        header["tables"][name] = {"rows": len(table), "columns": columns}
+
+    encoded = [string.encode() for string in sorted_strings]
+    offsets = array("I", [0])
+    for data in encoded:
+        offsets.append(offsets[-1] + len(data))
+    header["strings"] = {"count": len(encoded), "offsets": add_block(offsets.tobytes()), "data": add_block(b"".join(encoded))}
+
+    tmp_path = f"{file_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as snapshot_file:
+        _write(snapshot_file, json.dumps(header).encode(), blocks)
+    os.replace(tmp_path, file_path)
+
+def _write(snapshot_file: BinaryIO, header: bytes, blocks: list[bytes]) -> None:
+    snapshot_file.write(MAGIC)
+    snapshot_file.write(struct.pack("<I", len(header)))
+    snapshot_file.write(header)
+    snapshot_file.write(_padding(len(MAGIC) + 4 + len(header)))
+    for block in blocks:
+        snapshot_file.write(block)
+
+class MappedStrings:
+    """
+    String table read straight from the mapped file, a string is only decoded when it is first used
+    """
+    def __init__(self, offsets: memoryview, data: memoryview) -> None:
+        self.__offsets = offsets
+        self.__data = data
+        self.__decoded: dict[int, str] = dict()
+
+    def __getitem__(self, id: int) -> str:
+        if (string := self.__decoded.get(id)) is None:
+            string = self.__decoded[id] = intern(str(self.__data[self.__offsets[id]:self.__offsets[id + 1]], "utf-8"))
+        return string
+
+    def __len__(self) -> int:
+        return len(self.__offsets) - 1
+
+class CatalogSnapshot:
+    """
+    A memory mapped snapshot, opening one only reads its header.
+    `offered_courses` and `pre_requisites` are column tables whose views are valid until `close`.
+    """
+    def __init__(self, file_path: str) -> None:
+        self.file_path = file_path
+        with open(file_path, "rb") as snapshot_file:
+            self.__map = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.__views: list[memoryview] = [buffer := memoryview(self.__map)]
+        try:
+            if buffer[:len(MAGIC)] != MAGIC:
+                raise ValueError(f"{file_path} is not a catalog snapshot!")
+            header_length, = struct.unpack_from("<I", buffer, len(MAGIC))
+            header_end = len(MAGIC) + 4 + header_length
+            self.header = json.loads(bytes(buffer[len(MAGIC) + 4:header_end]))
+            if self.header["version"] != VERSION:
+                raise ValueError(f"Unsupported snapshot version {self.header['version']}!")
+            self.__base = header_end + len(_padding(header_end))
+
+            count = self.header["strings"]["count"]
+            self.strings = MappedStrings(
+                self.__view(self.header["strings"]["offsets"], "I", count + 1),
+                self.__view(self.header["strings"]["data"], "B", None)
+            )
+            self.offered_courses: OfferedCourseColumns = self.__table("offered_courses")
+            self.pre_requisites: PreRequisiteColumns = self.__table("pre_requisites")
+        except Exception:
+            self.close()
+            raise
+
+    def __view(self, offset: int, typecode: str, length: int | None) -> memoryview:
+        start = self.__base + offset
+        if typecode == "B":
+            view = self.__views[0][start:]
+            self.__views.append(view)
+            return view
+        raw = self.__views[0][start:start + length * 4]
+        self.__views.append(raw)
+        if self.header["byteorder"] != sys.byteorder:
+            column = array(typecode, raw)
+            column.byteswap()
+            return memoryview(column)
+        self.__views.append(view := raw.cast(typecode))
+        return view
+
+    def __table(self, name: str) -> Columns:
+        table = self.header["tables"][name]
+        columns = {field: self.__view(column["offset"], column["type"], table["rows"]) for field, column in table["columns"].items()}
+        return TABLES[name](self.strings, columns)
+
+    def __string_id(self, string: str) -> int:
+        """
+        Returns the id of the string or -1 when the snapshot does not have it
+        """
+        id = bisect_left(self.strings, string)
+        return id if id < len(self.strings) and self.strings[id] == string else -1
+
+    def __rows(self, table: Columns, course_id: str) -> range:
+        if (id := self.__string_id(course_id)) == -1:
+            return range(0)
+        column = table.columns["course_id"]
+        return range(bisect_left(column, id), bisect_right(column, id))
+
+    def get(self, course_id: str) -> list[OfferedCourse]:
+        """
+        Returns the sections of a course along with its lab sections, the same as `CourseIndex.get`
+        """
+        course_id = course_id.upper()
+        ids = (course_id,) if course_id != theory_id(course_id) else (course_id, f"{course_id}L")
+        return [self.offered_courses[i] for id in ids for i in self.__rows(self.offered_courses, id)]
+
+    def pre_requisites_of(self, course_id: str) -> list[PreRequisiteCourse]:
+        course_id = course_id.upper()
+        ids = (course_id,) if course_id != theory_id(course_id) else (course_id, f"{course_id}L")
+        return [self.pre_requisites[i] for id in ids for i in self.__rows(self.pre_requisites, id)]
+
+    def prefix(self, prefix: str) -> list[str]:
+        """
+        Returns the sorted theory course ids starting with `prefix`, trailing wildcards are ignored
+        """
+        prefix = prefix.upper().rstrip("X*")
+        column = self.offered_courses.columns["course_id"]
+        lo = bisect_left(column, bisect_left(self.strings, prefix))
+        hi = bisect_left(column, bisect_left(self.strings, prefix + "\uffff"))
+        ids: dict[str, None] = dict()
+        i = lo
+        while i < hi:
+            id = column[i]
+            ids[theory_id(self.strings[id])] = None
+            i = bisect_right(column, id, i, hi)
+        return sorted(ids)
+
+    def __len__(self) -> int:
+        return len(self.offered_courses)
+
+    def close(self) -> None:
+        # every exported view must be released before the map can be closed
+        for view in reversed(self.__views):
+            view.release()
+        self.__views = []
+        self.__map.close()
+
+    def __enter__(self) -> CatalogSnapshot:
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+def load_snapshot(file_path: str) -> CatalogSnapshot:
+    return CatalogSnapshot(file_path)
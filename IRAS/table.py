@@ -0,0 +1,37 @@
+from typing import Iterable, TextIO
+
+def justify(text: str, width: int) -> str:
+    """
+    Centers the text the same way PrettyTable does, the extra space of an
+    uneven padding goes right of odd length texts and left of even length ones
+    """
+    excess = width - len(text)
+    if not excess % 2:
+        return " " * (excess // 2) + text + " " * (excess // 2)
+    if len(text) % 2:
+        return " " * (excess // 2) + text + " " * (excess // 2 + 1)
+    return " " * (excess // 2 + 1) + text + " " * (excess // 2)
+
+def column_widths(field_names: list[str], rows: Iterable[list], widths: list[int] = None) -> list[int]:
+    """
+    Returns the width of every column in a single pass over the rows,
+    `widths` can carry the maxima of previously seen rows
+    """
+    widths = list(widths) if widths else [len(field) for field in field_names]
+    for row in rows:
+        for i, cell in enumerate(row):
+            if (width := len(str(cell))) > widths[i]:
+                widths[i] = width
+    return widths
+
+def write_table(out: TextIO, field_names: list[str], rows: Iterable[list], widths: list[int]) -> None:
+    """
+    Writes the rows one line at a time in PrettyTable's default layout
+    """
+    hrule = "+" + "+".join("-" * (width + 2) for width in widths) + "+"
+    out.write(hrule)
+    out.write("\n| " + " | ".join(justify(field, width) for field, width in zip(field_names, widths)) + " |\n")
+    out.write(hrule)
+    for row in rows:
+        out.write("\n| " + " | ".join(justify(str(cell), width) for cell, width in zip(row, widths)) + " |")
+    out.write("\n" + hrule)
@@ -0,0 +1,98 @@
+import hmac
+import sqlite3
+import secrets
+import hashlib
+import threading
+from datetime import datetime
+
+import IRAS.constants as CONST
+from IRAS.Types import AuthData
+
+def _password_hash(password: str, salt: bytes) -> bytes:
+    return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, CONST.PASSWORD_HASH_ITERATIONS)
+
+class TokenStore:
+    """
+    Keeps the auth tokens of many students in an indexed SQLite file.
+    Each thread gets its own connection and the database runs in WAL mode,
+    so several threads and processes can read and write it at the same time.
+    """
+    def __init__(self, db_path: str = CONST.TOKEN_STORE_PATH) -> None:
+        self.db_path = db_path
+        self.__local = threading.local()
+        with self.__connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS tokens (
+                    student_id TEXT PRIMARY KEY,
+                    auth_token TEXT NOT NULL,
+                    expires TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            # salted hashes of the passwords the server accepted, to check a password without asking it again
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS passwords (
+                    student_id TEXT PRIMARY KEY,
+                    salt BLOB NOT NULL,
+                    hash BLOB NOT NULL
+                )
+            """)
+
+    def get(self, student_id: int | str) -> AuthData | None:
+        """
+        Returns the stored token of the student unless it has expired
+        """
+        row = self.__connection().execute(
+            "SELECT auth_token, expires FROM tokens WHERE student_id = ?", (str(student_id),)
+        ).fetchone()
+        if not row:
+            return None
+        auth_data = AuthData(student_id, row[0], datetime.fromisoformat(row[1]))
+        return auth_data if auth_data.expires > datetime.now(auth_data.expires.tzinfo) else None
+
+    def put(self, auth_data: AuthData) -> None:
+        with self.__connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO tokens (student_id, auth_token, expires, expires_at) VALUES (?, ?, ?, ?)",
+                (str(auth_data.student_id), auth_data.auth_token, auth_data.expires.isoformat(), auth_data.expires.timestamp())
+            )
+
+    def remove(self, student_id: int | str) -> None:
+        with self.__connection() as conn:
+            conn.execute("DELETE FROM tokens WHERE student_id = ?", (str(student_id),))
+            conn.execute("DELETE FROM passwords WHERE student_id = ?", (str(student_id),))
+
+    def put_password(self, student_id: int | str, password: str) -> None:
+        """
+        Remembers a password the server accepted for the student
+        """
+        salt = secrets.token_bytes(16)
+        with self.__connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO passwords (student_id, salt, hash) VALUES (?, ?, ?)",
+                (str(student_id), salt, _password_hash(password, salt))
+            )
+
+    def check_password(self, student_id: int | str, password: str) -> bool:
+        """
+        Whether the password is the last one the server accepted for the student
+        """
+        row = self.__connection().execute(
+            "SELECT salt, hash FROM passwords WHERE student_id = ?", (str(student_id),)
+        ).fetchone()
+        return bool(row) and hmac.compare_digest(row[1], _password_hash(password, row[0]))
+
+    def purge_expired(self) -> int:
+        with self.__connection() as conn:
+            return conn.execute("DELETE FROM tokens WHERE expires_at <= ?", (datetime.now().timestamp(),)).rowcount
+
+    def close(self) -> None:
+        if conn := getattr(self.__local, "conn", None):
+            conn.close()
+            self.__local.conn = None
+
+    def __connection(self) -> sqlite3.Connection:
+        if not (conn := getattr(self.__local, "conn", None)):
+            conn = self.__local.conn = sqlite3.connect(self.db_path, timeout=CONST.TOKEN_STORE_TIMEOUT)
+            conn.execute("PRAGMA journal_mode=WAL")
+        return conn
@@ -1,10 +1,141 @@
-import xlsxwriter
-from os import getcwd
-from prettytable import PrettyTable
+from __future__ import annotations
+import json
+import codecs
+from os import getcwd, path
+from time import perf_counter
+from functools import lru_cache
+from typing import TYPE_CHECKING, Iterable, Generator
 
 import IRAS.constants as CONST
-from IRAS.Types import OfferedCourse, PreRequisiteCourse
+from IRAS.Types import OfferedCourse, PreRequisiteCourse, theory_id
+from IRAS.table import column_widths, write_table
+from IRAS.metrics import METRICS, PhaseRecord
 
+if TYPE_CHECKING:
+    import requests
+    import xlsxwriter
+
+def new_http_session(pool_size: int = CONST.HTTP_POOL_SIZE, max_retries: int = CONST.HTTP_MAX_RETRIES, backoff_factor: float = CONST.HTTP_BACKOFF_FACTOR) -> requests.Session:
+    """
+    Returns a keep-alive session whose connection pool is reused by every request.
+    Failed connections, resets and 5xx responses are retried with exponential backoff.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(
+        total=max_retries,
+        connect=max_retries,
+        read=max_retries,
+        status=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=CONST.HTTP_RETRY_STATUS_CODES,
+        allowed_methods=frozenset({"GET", "POST"}),
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def iter_json_array(chunks: Iterable[bytes], key: str, record: PhaseRecord = None) -> Generator[dict, None, None]:
+    """
+    Incrementally decodes the items of the first array found under `key`
+    while the chunks are still arriving, so the whole body is never held in memory.
+    The rest of the body is drained afterwards so the connection can be reused.
+    The decoding time, without the time spent waiting for chunks, is added to `record`.
+    Raises RuntimeError when the body has no array under `key`, e.g an error object or null in its place.
+    """
+    chunks = iter(chunks)
+    try:
+        yield from _iter_json_array_items(chunks, key, record)
+    except BaseException:
+        # a generator of chunks learns that the body was not read to the end e.g to not cache it
+        if hasattr(chunks, "close"):
+            chunks.close()
+        raise
+    for _ in chunks:
+        pass
+
+def _iter_json_array_items(chunks: Iterable[bytes], key: str, record: PhaseRecord = None) -> Generator[dict, None, None]:
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    needle = f'"{key}"'
+    buffer, pos, exhausted = "", 0, False
+
+    def read_more() -> bool:
+        nonlocal buffer, pos, exhausted
+        if exhausted:
+            return False
+        buffer = buffer[pos:]
+        pos = 0
+        for chunk in chunks:
+            if chunk:
+                buffer += text_decoder.decode(chunk)
+                return True
+        buffer += text_decoder.decode(b"", final=True)
+        exhausted = True
+        return False
+
+    def skip_whitespace() -> bool:
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos].isspace():
+                pos += 1
+            if pos < len(buffer):
+                return True
+            if not read_more():
+                return False
+
+    # locate `"key": [`
+    while True:
+        if (idx := buffer.find(needle, pos)) == -1:
+            pos = max(pos, len(buffer) - len(needle))
+            if not read_more():
+                raise RuntimeError(f"No {key} found in the response!")
+            continue
+        pos = idx + len(needle)
+        if idx and buffer[idx - 1] == "\\":
+            continue
+        if not skip_whitespace():
+            raise RuntimeError(f"No {key} found in the response!")
+        if buffer[pos] != ":":
+            continue
+        pos += 1
+        if not skip_whitespace() or buffer[pos] != "[":
+            raise RuntimeError(f"Expected an array of {key} in the response!")
+        pos += 1
+        break
+
+    # decode one item at a time
+    while skip_whitespace():
+        match buffer[pos]:
+            case "]":
+                return
+            case ",":
+                pos += 1
+                continue
+        start = perf_counter()
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if not read_more():
+                raise
+            continue
+        finally:
+            if record is not None:
+                record.seconds += perf_counter() - start
+        # a number ending with the buffer may go on in the next chunk
+        if end == len(buffer) and read_more():
+            continue
+        pos = end
+        if record is not None:
+            record.records += 1
+        yield item
+
+@lru_cache(maxsize=1024)
 def get_formatted_time(time_str: str) -> str:
     day, time = time_str.split(" ")
     time_st, time_en = time.split("-")
@@ -26,60 +157,108 @@ def get_formatted_time(time_str: str) -> str:
 
     return f"{day} {st_hour}:{time_st[2:]}{st_notation}-{en_hour}:{time_en[2:]}{en_notation}"
 
-def save_as_txt(queried_courses: list[OfferedCourse], sections_count: list[int], pre_requisite_courses: list[PreRequisiteCourse], pre_requisite_courses_count: list[int]) -> None:
-    offered_course_table = PrettyTable(
-        field_names=CONST.OFFERED_COURSE_FIELDS
-    )
-
+def _separated_rows(rows: Iterable[list], counts: list[int], columns: int) -> Generator[list, None, None]:
+    """
+    Yields the rows with a row of '+' between every group of `counts` rows
+    """
     i, count = 0, 0
-    for course in queried_courses:
-        if i < len(sections_count) and count == sections_count[i]:
+    for row in rows:
+        if i < len(counts) and count == counts[i]:
             i += 1
             count = 0
-            offered_course_table.add_row(["+"] * len(CONST.OFFERED_COURSE_FIELDS))
+            yield ["+"] * columns
         count += 1
-        offered_course_table.add_row(course.as_list())
-
-    if pre_requisite_courses:
-        pre_requisite_course_table = PrettyTable(
-            field_names=CONST.PRE_REQUISITE_FIELDS
-        )
-        i, count = 0, 0
-        for pre_course in pre_requisite_courses:
-            if i < len(pre_requisite_courses_count) and count == pre_requisite_courses_count[i]:
-                i += 1
-                count = 0
-                pre_requisite_course_table.add_row(["+"] * len(CONST.PRE_REQUISITE_FIELDS))
-            count += 1
-            pre_requisite_course_table.add_row(pre_course.as_list())
-
-    txt_file_path = CONST.OFFERED_COURSE_TEXT_FILE_PATH
-    with open(txt_file_path, "w") as txt_file:
-        txt_file.writelines(str(offered_course_table))
-        if pre_requisite_courses:
+        yield row
+
+def save_as_txt(queried_courses: list[OfferedCourse], sections_count: list[int], pre_requisite_courses: list[PreRequisiteCourse], pre_requisite_courses_count: list[int], txt_file_path: str = CONST.OFFERED_COURSE_TEXT_FILE_PATH) -> None:
+    write_txt([course.as_list() for course in queried_courses], sections_count,
+              [pre_course.as_list() for pre_course in pre_requisite_courses], pre_requisite_courses_count, txt_file_path)
+    print(f"Text file is saved at {path.join(getcwd(), txt_file_path)}.")
+
+def write_txt(offered_rows: list[list], sections_count: list[int], pre_requisite_rows: list[list], pre_requisite_courses_count: list[int], txt_file_path: str) -> None:
+    """
+    Writes rows that were already converted with `as_list`, see `save_as_txt`
+    """
+    separated_offered_rows = lambda: _separated_rows(offered_rows, sections_count, len(CONST.OFFERED_COURSE_FIELDS))
+    separated_pre_requisite_rows = lambda: _separated_rows(pre_requisite_rows, pre_requisite_courses_count, len(CONST.PRE_REQUISITE_FIELDS))
+
+    # widths are measured in one pass, then the rows are streamed straight into the file
+    with METRICS.phase("render", exporter="txt") as render:
+        offered_widths = column_widths(CONST.OFFERED_COURSE_FIELDS, separated_offered_rows())
+        pre_requisite_widths = column_widths(CONST.PRE_REQUISITE_FIELDS, separated_pre_requisite_rows())
+        render.records = len(offered_rows) + len(pre_requisite_rows)
+    with METRICS.phase("file_write", exporter="txt") as file_write, open(txt_file_path, "w") as txt_file:
+        write_table(txt_file, CONST.OFFERED_COURSE_FIELDS, separated_offered_rows(), offered_widths)
+        if pre_requisite_rows:
             txt_file.write("\n\n")
             txt_file.write("Pre-requisites-")
             txt_file.write("\n\n")
-            txt_file.write(str(pre_requisite_course_table))
-    print(f"Text file is saved at {getcwd()}/{txt_file_path}.")
-
-def save_as_xls(queried_courses: list[OfferedCourse], pre_requisite_courses: list[PreRequisiteCourse]) -> None:
-    xls_file_path = CONST.OFFERED_COURSE_EXCEL_FILE_PATH
-    wb = xlsxwriter.Workbook(xls_file_path)
-    ws = wb.add_worksheet("Offered courses")
-    ws.write_row(0, 0, CONST.OFFERED_COURSE_FIELDS)
-
-    for r in range(1, len(queried_courses)):
-        ws.write_row(r, 0, queried_courses[r-1].as_list())
-
-    if pre_requisite_courses:
-        ws = wb.add_worksheet("Pre-requisites")
-        ws.write_row(0, 0, CONST.PRE_REQUISITE_FIELDS)
-        for r in range(1, len(pre_requisite_courses)):
-            ws.write_row(r, 0, pre_requisite_courses[r-1].as_list())
-    wb.close()
-
-    print(f"Excel file is saved at {getcwd()}/{xls_file_path}.")
+            write_table(txt_file, CONST.PRE_REQUISITE_FIELDS, separated_pre_requisite_rows(), pre_requisite_widths)
+        file_write.records = render.records
+        file_write.bytes = txt_file.tell()
+
+def split_key(course_id: str, split_by: str) -> str:
+    """
+    Returns the course or the department a course id belongs to when splitting by 'course' or 'department'
+    """
+    match split_by:
+        case "course":
+            return theory_id(course_id)
+        case "department":
+            letters = len(course_id) - len(course_id.lstrip("ABCDEFGHIJKLMNOPQRSTUVWXYZ"))
+            return course_id[:letters] or course_id
+        case _:
+            return "Offered courses"
+
+def _add_sheet(wb: xlsxwriter.Workbook, name: str, field_names: list[str], header_format) -> list:
+    ws = wb.add_worksheet(name)
+    ws.write_row(0, 0, field_names, header_format)
+    ws.freeze_panes(1, 0)
+    return [ws, 1]
+
+def save_as_xls(queried_courses: Iterable[OfferedCourse], pre_requisite_courses: Iterable[PreRequisiteCourse], xls_file_path: str = CONST.OFFERED_COURSE_EXCEL_FILE_PATH, split_by: str = "") -> None:
+    """
+    Streams the rows into the workbook one at a time using xlsxwriter's constant memory mode,
+    so the memory use does not grow with the number of sections.
+    `split_by` can be 'course' or 'department' to write a worksheet per course or per department,
+    the courses must then arrive grouped by it e.g in the order of a CourseIndex.
+    """
+    write_xls((course.as_list() for course in queried_courses), (pre_course.as_list() for pre_course in pre_requisite_courses), xls_file_path, split_by)
+    print(f"Excel file is saved at {path.join(getcwd(), xls_file_path)}.")
+
+def write_xls(offered_rows: Iterable[list], pre_requisite_rows: Iterable[list], xls_file_path: str, split_by: str = "") -> None:
+    """
+    Writes rows that were already converted with `as_list`, see `save_as_xls`
+    """
+    import xlsxwriter
+
+    wb = xlsxwriter.Workbook(xls_file_path, {"constant_memory": True})
+    header_format = wb.add_format({"bold": True})
+    sheets: dict[str, list] = dict() # sheet name -> [worksheet, next row]
+
+    with METRICS.phase("render", exporter="xls") as render:
+        for row in offered_rows:
+            if (sheet := sheets.get(name := split_key(row[0], split_by))) is None:
+                sheet = sheets[name] = _add_sheet(wb, name, CONST.OFFERED_COURSE_FIELDS, header_format)
+            sheet[0].write_row(sheet[1], 0, row)
+            sheet[1] += 1
+        if not sheets:
+            sheets["Offered courses"] = _add_sheet(wb, "Offered courses", CONST.OFFERED_COURSE_FIELDS, header_format)
+
+        pre_requisite_sheet = None
+        for row in pre_requisite_rows:
+            if pre_requisite_sheet is None:
+                pre_requisite_sheet = sheets["Pre-requisites"] = _add_sheet(wb, "Pre-requisites", CONST.PRE_REQUISITE_FIELDS, header_format)
+            pre_requisite_sheet[0].write_row(pre_requisite_sheet[1], 0, row)
+            pre_requisite_sheet[1] += 1
+
+        for name, (ws, rows) in sheets.items():
+            ws.autofilter(0, 0, rows - 1, len(CONST.PRE_REQUISITE_FIELDS if name == "Pre-requisites" else CONST.OFFERED_COURSE_FIELDS) - 1)
+        render.records = sum(rows - 1 for _, rows in sheets.values())
+    with METRICS.phase("file_write", exporter="xls") as file_write:
+        wb.close()
+        file_write.records = render.records
+        file_write.bytes = path.getsize(xls_file_path)
 
 def parse_grade(grade_code: str) -> float:
     match grade_code:
@@ -0,0 +1,46 @@
+from typing import Iterable, NamedTuple
+
+from IRAS.Types import OfferedCourse
+
+WATCHED_FIELDS = ("vacancy", "enrolled", "capacity", "faculty", "time_slot")
+
+SectionKey = tuple[str, int]
+
+SectionChange = NamedTuple("SectionChange", [
+    ("course_id", str),
+    ("section", int),
+    ("kind", str), # one of 'added', 'removed' or 'changed'
+    ("changes", dict[str, tuple])
+])
+
+def snapshot(courses: Iterable[OfferedCourse]) -> dict[SectionKey, OfferedCourse]:
+    return {(course.course_id, course.section): course for course in courses}
+
+def diff_snapshots(previous: dict[SectionKey, OfferedCourse], current: dict[SectionKey, OfferedCourse]) -> list[SectionChange]:
+    """
+    Returns the sections that were added, removed or had any of the watched fields changed
+    """
+    changes: list[SectionChange] = []
+    for key, course in current.items():
+        if (old := previous.get(key)) is None:
+            changes.append(SectionChange(*key, "added", {field: (None, getattr(course, field)) for field in WATCHED_FIELDS}))
+        elif old is not course and (changed := {
+            field: (getattr(old, field), getattr(course, field))
+            for field in WATCHED_FIELDS if getattr(old, field) != getattr(course, field)
+        }):
+            changes.append(SectionChange(*key, "changed", changed))
+    for key, old in previous.items():
+        if key not in current:
+            changes.append(SectionChange(*key, "removed", {field: (getattr(old, field), None) for field in WATCHED_FIELDS}))
+    changes.sort(key=lambda c: (c.course_id, c.section))
+    return changes
+
+def format_change(change: SectionChange) -> str:
+    match change.kind:
+        case "added":
+            details = ", ".join(f"{field.upper()}: {new}" for field, (_, new) in change.changes.items())
+        case "removed":
+            details = "section is no longer offered"
+        case _:
+            details = ", ".join(f"{field.upper()}: {old} -> {new}" for field, (old, new) in change.changes.items())
+    return f"[{change.kind.upper()}] {change.course_id} SECTION {change.section}: {details}"
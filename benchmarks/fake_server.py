@@ -0,0 +1,246 @@
+"""
+Local stand-in of the IRAS server serving synthetic or recorded payloads, for running IRAS offline and at scale.
+
+    python -m benchmarks.fake_server --offered 10000 --latency 0.05 --bandwidth 2000000 --error-rate 0.01
+    python -m benchmarks.fake_server --record recordings --upstream https://iras.iub.edu.bd:8079/
+    python -m benchmarks.fake_server --replay recordings
+
+    python main.py --base-url http://127.0.0.1:8765/ --id 123 --password any offered --all
+
+Any non-empty password is accepted. Failed requests answer 503, which the client retries.
+"""
+import os
+import re
+import json
+import random
+import hashlib
+import secrets
+import argparse
+import threading
+from time import sleep
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.request import Request, urlopen
+from urllib.error import HTTPError
+
+from benchmarks import synthetic
+
+CHUNK_SIZE = 16 * 1024
+# IRAS answers in Bangladesh time
+IRAS_TIMEZONE = timezone(timedelta(hours=6))
+KINDS = ("offered_courses", "pre_requisites", "registered_courses")
+ROUTES = (
+    ("POST", re.compile(r"/v2/account/token"), "token"),
+    ("GET", re.compile(r"/api/v1/registration/(\w+)/all-offer-courses"), "offered_courses"),
+    ("GET", re.compile(r"/api/v1/registration/student-registered-courses/(\w+)/all"), "registered_courses"),
+    ("GET", re.compile(r"/api/v1/registration/(\w+)/pre-requisite-courses"), "pre_requisites")
+)
+
+@dataclass(slots=True)
+class FakeConfig:
+    offered: int = 1_000 # sections of the catalog
+    pre_requisites: int = 250
+    registered: int = 40 # courses of every student
+    latency: float = 0.0 # seconds before every response
+    bandwidth: int = 0 # bytes per second of every response, unlimited when 0
+    error_rate: float = 0.0 # share of requests failing with 503
+    token_ttl: int = 60 * 60 # seconds
+    seed: int = 0
+    replay_dir: str = "" # serve the payloads recorded in this directory
+    record_dir: str = "" # forward to `upstream` and record the payloads in this directory
+    upstream: str = ""
+
+@lru_cache(maxsize=256)
+def _synthetic_payload(kind: str, count: int, seed: int) -> bytes:
+    match kind:
+        case "offered_courses":
+            return synthetic.offered_courses_payload(count, seed)
+        case "pre_requisites":
+            return synthetic.pre_requisites_payload(count, seed)
+        case _:
+            return synthetic.registered_courses_payload(count, seed)
+
+class FakeIRASServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8765, config: FakeConfig = None) -> None:
+        super().__init__((host, port), _Handler)
+        self.config = config or FakeConfig()
+        self.stats: Counter[str] = Counter()
+        self.lock = threading.Lock()
+        self.__random = random.Random(self.config.seed)
+        self.__thread: threading.Thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self) -> str:
+        """
+        Serves in a background thread and returns the base url to give `IRAS`
+        """
+        self.__thread = threading.Thread(target=self.serve_forever, name="fake-iras", daemon=True)
+        self.__thread.start()
+        return self.base_url
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def count(self, **counts: int) -> None:
+        with self.lock:
+            self.stats.update(counts)
+
+    def fails(self) -> bool:
+        with self.lock:
+            return self.__random.random() < self.config.error_rate
+
+    def payload(self, kind: str, student_id: str) -> bytes:
+        if self.config.replay_dir:
+            return _recorded_payload(self.config.replay_dir, kind)
+        count = {"offered_courses": self.config.offered, "pre_requisites": self.config.pre_requisites}.get(kind, self.config.registered)
+        # the catalog is the same for everyone while every student has grades of their own
+        seed = self.config.seed + (int(student_id) % 1000 if kind == "registered_courses" and student_id.isdigit() else 0)
+        return _synthetic_payload(kind, count, seed)
+
+@lru_cache(maxsize=8)
+def _recorded_payload(directory: str, kind: str) -> bytes:
+    with open(os.path.join(directory, f"{kind}.json"), "rb") as payload_file:
+        return payload_file.read()
+
+def _etag(body: bytes) -> str:
+    return f'"{hashlib.md5(body).hexdigest()}"'
+
+class _Handler(BaseHTTPRequestHandler):
+    server: FakeIRASServer
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        self.__handle("GET")
+
+    def do_POST(self) -> None:
+        self.__handle("POST")
+
+    def __handle(self, method: str) -> None:
+        path = re.sub("/+", "/", self.path.split("?")[0])
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self.server.count(requests=1)
+        for route_method, pattern, kind in ROUTES:
+            if route_method == method and (match := pattern.fullmatch(path)):
+                break
+        else:
+            return self.__send(404, b'{"message":"Not found"}')
+
+        if self.server.config.latency:
+            sleep(self.server.config.latency)
+        if self.server.fails():
+            self.server.count(errors=1)
+            return self.__send(503, b'{"message":"Service unavailable"}')
+        if self.server.config.record_dir:
+            return self.__forward(method, kind, body)
+        if kind == "token":
+            return self.__token(body)
+
+        # tokens are not tracked so the ones a client stored survive a restart of the server
+        if not self.headers.get("Authorization", "").startswith("Bearer fake-"):
+            return self.__send(401, b'{"message":"Unauthorized"}')
+        payload = self.server.payload(kind, match.group(1))
+        if self.headers.get("If-None-Match") == (etag := _etag(payload)):
+            self.server.count(not_modified=1)
+            return self.__send(304, b"")
+        self.server.count(**{kind: 1})
+        self.__send(200, payload, {"ETag": etag})
+
+    def __token(self, body: bytes) -> None:
+        credentials = json.loads(body or b"{}")
+        if not credentials.get("password"):
+            return self.__send(200, b'{"data":[]}')
+        token = f"fake-{credentials.get('email')}-{secrets.token_hex(8)}"
+        expires = datetime.now(IRAS_TIMEZONE) + timedelta(seconds=self.server.config.token_ttl)
+        self.server.count(token=1)
+        self.__send(200, json.dumps({"data": [{"access_token": token, "expires": f"{expires:%Y-%m-%dT%H:%M:%S}.000+06:00"}]}).encode())
+
+    def __forward(self, method: str, kind: str, body: bytes) -> None:
+        """
+        Passes the request on to the real server, the payload of every kind is recorded for a later replay
+        """
+        headers = {name: value for name, value in self.headers.items() if name in ("Authorization", "Content-Type", "Accept")}
+        request = Request(f"{self.server.config.upstream.rstrip('/')}/{self.path.lstrip('/')}", data=body if method == "POST" else None,
+                          headers=headers, method=method)
+        try:
+            with urlopen(request) as response:
+                status, payload = response.status, response.read()
+        except HTTPError as e:
+            status, payload = e.code, e.read()
+        if status == 200 and kind in KINDS:
+            os.makedirs(self.server.config.record_dir, exist_ok=True)
+            with open(os.path.join(self.server.config.record_dir, f"{kind}.json"), "wb") as payload_file:
+                payload_file.write(payload)
+        self.server.count(**{kind: 1})
+        self.__send(status, payload, {"ETag": _etag(payload)} if status == 200 and kind in KINDS else {})
+
+    def __send(self, status: int, body: bytes, headers: dict[str, str] = {}) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        if not (bandwidth := self.server.config.bandwidth):
+            self.wfile.write(body)
+        else:
+            for start in range(0, len(body), CHUNK_SIZE):
+                self.wfile.write(chunk := body[start:start + CHUNK_SIZE])
+                sleep(len(chunk) / bandwidth)
+        self.server.count(bytes_sent=len(body))
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+def add_config_arguments(parser: argparse.ArgumentParser) -> None:
+    defaults = FakeConfig()
+    parser.add_argument("--offered", type=int, default=defaults.offered, help="sections of the synthetic catalog")
+    parser.add_argument("--pre-requisites", type=int, default=defaults.pre_requisites)
+    parser.add_argument("--registered", type=int, default=defaults.registered, help="registered courses of every student")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before every response")
+    parser.add_argument("--bandwidth", type=int, default=0, help="bytes per second of every response, unlimited when 0")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests failing with 503")
+    parser.add_argument("--seed", type=int, default=0)
+
+def config_from_arguments(args: argparse.Namespace) -> FakeConfig:
+    return FakeConfig(
+        offered=args.offered,
+        pre_requisites=args.pre_requisites,
+        registered=args.registered,
+        latency=args.latency,
+        bandwidth=args.bandwidth,
+        error_rate=args.error_rate,
+        seed=args.seed,
+        replay_dir=getattr(args, "replay", "") or "",
+        record_dir=getattr(args, "record", "") or "",
+        upstream=getattr(args, "upstream", "") or ""
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="fake IRAS server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_config_arguments(parser)
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--replay", metavar="DIR", help="serve the payloads recorded in DIR instead of synthetic ones")
+    mode.add_argument("--record", metavar="DIR", help="forward every request to --upstream and record the payloads in DIR")
+    parser.add_argument("--upstream", default="https://iras.iub.edu.bd:8079/", help="server of --record")
+    args = parser.parse_args()
+
+    server = FakeIRASServer(args.host, args.port, config_from_arguments(args))
+    print(f"Serving on {server.base_url}, press Ctrl+C to stop.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\nStopped serving. {dict(server.stats)}")
+    finally:
+        server.server_close()
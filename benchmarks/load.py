@@ -0,0 +1,163 @@
+"""
+End-to-end load tests of `IRAS` against the fake server, or any server given with --base-url.
+
+    python -m benchmarks.load --offered 10000 --latency 0.02 --students 50 --concurrency 8
+    python -m benchmarks.load --only many --bandwidth 1000000 --error-rate 0.02
+    python -m benchmarks.load --base-url http://127.0.0.1:8765/
+
+    single-user      a new client logs in and loads the grades, catalog and pre-requisites, one after another
+    repeated-query   one warm client answers catalog queries from memory
+    many-students    students log in and load their data concurrently, sharing identical catalogs
+"""
+import os
+import json
+import argparse
+import platform
+import tempfile
+import tracemalloc
+from time import perf_counter
+from datetime import datetime
+from typing import Callable
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fake_server import FakeIRASServer, add_config_arguments, config_from_arguments
+from IRAS.iras import IRAS
+from IRAS.cache import CatalogPool
+from IRAS.metrics import METRICS
+
+RESULTS_DIR_PATH = os.path.join(os.path.dirname(__file__), "results")
+QUERIES = (
+    "CSE3xx; vacancy > 0",
+    "dept MAT, PHY; days ST; after 11:00AM",
+    "EEE2xx; before 10:00AM",
+    "vacancy >= 10; on R",
+    "BUS; faculty Rahman"
+)
+
+Workload = Callable[[], list[float]] # returns the latency of every operation
+
+def _client(base_url: str, catalog_pool: CatalogPool = None) -> IRAS:
+    # the response cache would hide the server after the first run
+    return IRAS(use_cache=False, show_progress=False, record_history=False, catalog_pool=catalog_pool, base_url=base_url)
+
+def _load_student(base_url: str, student_id: str, catalog_pool: CatalogPool = None) -> float:
+    start = perf_counter()
+    iras = _client(base_url, catalog_pool)
+    try:
+        if not iras.authenticate_user(student_id, "password"):
+            raise RuntimeError(f"Login of {student_id} failed!")
+        iras.get_grades()
+        iras.get_offered_courses()
+        iras.get_pre_requisites()
+    finally:
+        iras.close()
+    return perf_counter() - start
+
+def single_user(base_url: str, iterations: int) -> list[float]:
+    return [_load_student(base_url, "1000") for _ in range(iterations)]
+
+def repeated_query(base_url: str, iterations: int) -> list[float]:
+    iras = _client(base_url)
+    try:
+        iras.authenticate_user("1000", "password")
+        iras.get_offered_courses()
+        latencies = []
+        for i in range(iterations):
+            start = perf_counter()
+            iras.find_OfferedCourses(QUERIES[i % len(QUERIES)])
+            latencies.append(perf_counter() - start)
+        return latencies
+    finally:
+        iras.close()
+
+def many_students(base_url: str, students: int, concurrency: int) -> list[float]:
+    catalog_pool = CatalogPool()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        return list(executor.map(lambda i: _load_student(base_url, str(2000 + i), catalog_pool), range(students)))
+
+def _percentile(latencies: list[float], percent: float) -> float:
+    """
+    Nearest rank percentile of sorted latencies
+    """
+    return latencies[min(len(latencies) - 1, max(0, round(percent / 100 * len(latencies)) - 1))]
+
+def _measure(workload: Workload, server: FakeIRASServer | None, memory: bool) -> dict:
+    requests_before = server.stats["requests"] if server else 0
+    start = perf_counter()
+    latencies = sorted(workload())
+    seconds = perf_counter() - start
+    requests = server.stats["requests"] - requests_before if server else None
+
+    peak = None
+    if memory:
+        tracemalloc.start()
+        workload()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {
+        "operations": len(latencies),
+        "seconds": seconds,
+        "operations_per_second": len(latencies) / seconds if seconds else None,
+        "requests": requests,
+        "requests_per_second": requests / seconds if requests is not None and seconds else None,
+        "latency_ms": {f"p{p}": _percentile(latencies, p) * 1000 for p in (50, 90, 99)} | {"max": latencies[-1] * 1000},
+        "peak_memory_bytes": peak
+    }
+
+def run(base_url: str, server: FakeIRASServer | None, iterations: int, students: int, concurrency: int,
+        memory: bool = True, only: list[str] = None) -> dict:
+    workloads: list[tuple[str, Workload]] = [
+        ("single-user", lambda: single_user(base_url, iterations)),
+        ("repeated-query", lambda: repeated_query(base_url, iterations * 10)),
+        ("many-students", lambda: many_students(base_url, students, concurrency))
+    ]
+    results = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "server": {"base_url": base_url} | ({
+            field: getattr(server.config, field) for field in ("offered", "pre_requisites", "registered", "latency", "bandwidth", "error_rate")
+        } if server else {}),
+        "results": []
+    }
+    for name, workload in workloads:
+        if only and not any(o.lower() in name.lower() for o in only):
+            continue
+        # the phase records of thousands of requests would only grow the memory being measured
+        METRICS.reset()
+        results["results"].append(result := {"name": name, **_measure(workload, server, memory)})
+        latency = result["latency_ms"]
+        print(f"{name:<16} {result['operations']:>6} ops {result['operations_per_second']:>10,.1f} ops/s "
+              f"{result['requests_per_second'] or 0:>10,.1f} req/s   p50 {latency['p50']:>8.2f} ms  p90 {latency['p90']:>8.2f} ms  "
+              f"p99 {latency['p99']:>8.2f} ms  max {latency['max']:>8.2f} ms"
+              + (f" {result['peak_memory_bytes'] / 2 ** 20:>8.2f} MiB" if result["peak_memory_bytes"] is not None else ""))
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="IRAS end-to-end load tests")
+    parser.add_argument("--base-url", help="server to test, a fake server is started when omitted")
+    add_config_arguments(parser)
+    parser.add_argument("--iterations", type=int, default=20, help="logins of single-user, ten times as many queries of repeated-query")
+    parser.add_argument("--students", type=int, default=50, help="students of many-students")
+    parser.add_argument("--concurrency", type=int, default=8, help="students loaded at a time")
+    parser.add_argument("--no-memory", action="store_true", help="skip the extra run of every workload measuring its peak memory")
+    parser.add_argument("--only", nargs="+", help="run only the workloads whose name contains any of these")
+    parser.add_argument("--output", help="results file, defaults to benchmarks/results/load-<timestamp>.json")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output or os.path.join(RESULTS_DIR_PATH, f"load-{datetime.now():%Y%m%d-%H%M%S}.json"))
+    server = None if args.base_url else FakeIRASServer(port=0, config=config_from_arguments(args))
+    base_url = args.base_url or server.start()
+    # the clients keep their tokens and files under the working directory
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.chdir(work_dir)
+        try:
+            results = run(base_url, server, args.iterations, args.students, args.concurrency, not args.no_memory, args.only)
+        finally:
+            if server:
+                server.stop()
+
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as results_file:
+        json.dump(results, results_file, indent=2)
+    print(f"Results are saved at {output}.")
@@ -0,0 +1,249 @@
+"""
+Micro-benchmarks of the hot paths over synthetic catalogs.
+
+    python -m benchmarks.run --sizes 1000 10000 100000
+    python -m benchmarks.run --compare benchmarks/results/<previous>.json
+"""
+import os
+import io
+import sys
+import json
+import argparse
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+from time import perf_counter
+from datetime import datetime
+from contextlib import redirect_stdout
+from typing import Callable
+
+from benchmarks import synthetic
+from IRAS.Types import OfferedCourse, PreRequisiteCourse, RegisteredCourse, CourseIndex
+from IRAS.utils import get_formatted_time, parse_grade, iter_json_array, save_as_txt, save_as_xls
+from IRAS.grades import GradeReport
+from IRAS.snapshot import save_snapshot, load_snapshot
+from IRAS.export import ExportPipeline, export_rows
+
+RESULTS_DIR_PATH = os.path.join(os.path.dirname(__file__), "results")
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+ROOT_DIR_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# statements timed in a fresh interpreter, the dependencies should only load with the feature that needs them
+IMPORTS = (
+    ("import IRAS.constants", "import IRAS.constants"),
+    ("from IRAS import IRAS", "from IRAS import IRAS"),
+    ("import IRAS.cli", "import IRAS.cli"),
+)
+HEAVY_MODULES = ("requests", "urllib3", "tqdm", "xlsxwriter")
+
+Benchmark = tuple[str, Callable[[], int]]
+
+def _measure(fn: Callable[[], int], repeat: int) -> dict:
+    best = float("inf")
+    for _ in range(repeat):
+        start = perf_counter()
+        records = fn()
+        best = min(best, perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "records": records,
+        "seconds": best,
+        "records_per_second": records / best if best else None,
+        "peak_memory_bytes": peak
+    }
+
+def _queried(index: CourseIndex) -> tuple[list[OfferedCourse], list[int]]:
+    courses, counts = [], []
+    for _, group in index.groups():
+        courses.extend(group)
+        counts.append(len(group))
+    return courses, counts
+
+def benchmarks(size: int, out_dir: str) -> list[Benchmark]:
+    raw_offers = synthetic.offered_courses(size)
+    raw_shuffled = synthetic.offered_courses(size, sorted_ids=False)
+    raw_pre_requisites = synthetic.pre_requisites(max(1, size // 4))
+    raw_registered = synthetic.registered_courses(min(size, 10_000))
+    payload = synthetic.offered_courses_payload(size)
+    chunks = [payload[i:i + 16 * 1024] for i in range(0, len(payload), 16 * 1024)]
+
+    courses = [OfferedCourse.NEW_INSTANCE(c, get_formatted_time) for c in raw_offers]
+    pre_requisite_courses = [PreRequisiteCourse.NEW_INSTANCE(c) for c in raw_pre_requisites]
+    registered = [RegisteredCourse.NEW_INSTANCE(c, parse_grade) for c in raw_registered]
+    index = CourseIndex.NEW_INSTANCE(courses)
+    ids = list(index)
+    queried, counts = _queried(index)
+    time_slots = [c["timeSlot"] for c in raw_offers]
+
+    def build_sorted() -> int:
+        CourseIndex.NEW_INSTANCE(courses)
+        return len(courses)
+
+    def insert_sorted() -> int:
+        # worst case of the old unbalanced tree, the server sends sorted ids
+        sorted_index = CourseIndex()
+        sorted_index.insert_all(courses)
+        return len(courses)
+
+    def lookup() -> int:
+        for id in ids:
+            index.get(id)
+        return len(ids)
+
+    def prefix_lookup() -> int:
+        for department in synthetic.DEPARTMENTS:
+            for level in "1234":
+                index.prefix(f"{department}{level}xx")
+        return len(synthetic.DEPARTMENTS) * 4
+
+    def new_offered_courses() -> int:
+        get_formatted_time.cache_clear()
+        for c in raw_shuffled:
+            OfferedCourse.NEW_INSTANCE(c, get_formatted_time)
+        return len(raw_shuffled)
+
+    def format_time_uncached() -> int:
+        for slot in time_slots:
+            get_formatted_time.__wrapped__(slot)
+        return len(time_slots)
+
+    def stream_parse() -> int:
+        return sum(1 for _ in iter_json_array(chunks, "eligibleOfferCourses"))
+
+    def grade_report() -> int:
+        GradeReport.NEW_INSTANCE(registered)
+        return len(registered)
+
+    def export_txt() -> int:
+        with redirect_stdout(io.StringIO()):
+            save_as_txt(queried, counts, pre_requisite_courses, [len(pre_requisite_courses)], os.path.join(out_dir, "bench.txt"))
+        return len(queried)
+
+    def export_xls() -> int:
+        with redirect_stdout(io.StringIO()):
+            save_as_xls(queried, pre_requisite_courses, os.path.join(out_dir, "bench.xlsx"))
+        return len(queried)
+
+    rows = export_rows(queried, counts, pre_requisite_courses, [len(pre_requisite_courses)])
+    def export_pipeline(processes: bool | None, split_files: bool, sequential: bool = False) -> Callable[[], int]:
+        pipeline = ExportPipeline(workers=1 if sequential else ExportPipeline().workers, processes=processes)
+        jobs = pipeline.jobs(rows, "both", os.path.join(out_dir, "pipeline.txt"), os.path.join(out_dir, "pipeline.xlsx"),
+                             "department" if split_files else "", split_files)
+        def export() -> int:
+            pipeline.run(jobs)
+            return len(queried)
+        return export
+
+    snapshot_path = os.path.join(out_dir, "bench.iras")
+    def export_snapshot() -> int:
+        save_snapshot(snapshot_path, courses, pre_requisite_courses)
+        return len(courses)
+
+    def snapshot_lookup() -> int:
+        with load_snapshot(snapshot_path) as snapshot:
+            for id in ids:
+                snapshot.get(id)
+        return len(ids)
+
+    return [
+        ("CourseIndex.NEW_INSTANCE", build_sorted),
+        ("CourseIndex.insert (sorted input)", insert_sorted),
+        ("CourseIndex.get", lookup),
+        ("CourseIndex.prefix", prefix_lookup),
+        ("OfferedCourse.NEW_INSTANCE", new_offered_courses),
+        ("get_formatted_time (uncached)", format_time_uncached),
+        ("iter_json_array", stream_parse),
+        ("GradeReport.NEW_INSTANCE", grade_report),
+        ("save_as_txt", export_txt),
+        ("save_as_xls", export_xls),
+        *(
+            (f"ExportPipeline {'split' if split_files else 'both'} ({name})", export_pipeline(processes, split_files, name == "sequential"))
+            for split_files in (False, True)
+            for name, processes in (("sequential", None), ("threads", False), ("processes", True), ("default", None))
+        ),
+        ("save_snapshot", export_snapshot),
+        ("load_snapshot + get", snapshot_lookup),
+    ]
+
+def _import_time(statement: str, repeat: int) -> dict:
+    """
+    Returns the best time of `statement` in a fresh interpreter along with the heavy modules it loaded
+    """
+    script = (
+        "import sys, json, time\n"
+        "start = time.perf_counter()\n"
+        f"{statement}\n"
+        "seconds = time.perf_counter() - start\n"
+        f"print(json.dumps([seconds, [m for m in {HEAVY_MODULES!r} if m in sys.modules]]))"
+    )
+    best, loaded = float("inf"), []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", script], cwd=ROOT_DIR_PATH, capture_output=True, text=True, check=True).stdout
+        seconds, loaded = json.loads(output)
+        best = min(best, seconds)
+    return {"records": 1, "seconds": best, "records_per_second": None, "peak_memory_bytes": None, "loaded": loaded}
+
+def run_imports(repeat: int, only: list[str] = None) -> list[dict]:
+    results = []
+    for name, statement in IMPORTS:
+        if only and not any(o.lower() in name.lower() for o in only):
+            continue
+        results.append(result := {"name": name, "size": 0, **_import_time(statement, repeat)})
+        print(f"{name:<36} {'':>8} {result['seconds'] * 1000:>10.2f} ms   loads: {', '.join(result['loaded']) or '-'}")
+    return results
+
+def run(sizes: list[int], repeat: int, only: list[str] = None) -> dict:
+    results = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": run_imports(repeat, only)
+    }
+    with tempfile.TemporaryDirectory() as out_dir:
+        for size in sizes:
+            for name, fn in benchmarks(size, out_dir):
+                if only and not any(o.lower() in name.lower() for o in only):
+                    continue
+                result = {"name": name, "size": size, **_measure(fn, repeat)}
+                results["results"].append(result)
+                print(f"{name:<36} {size:>8} {result['seconds'] * 1000:>10.2f} ms {result['records_per_second'] or 0:>14,.0f} rec/s {result['peak_memory_bytes'] / 2 ** 20:>8.2f} MiB")
+    return results
+
+def compare(previous: dict, current: dict, threshold: float) -> list[str]:
+    """
+    Returns the benchmarks that got slower than `threshold` times their previous time
+    """
+    before = {(r["name"], r["size"]): r for r in previous["results"]}
+    regressions = []
+    for result in current["results"]:
+        if (old := before.get((result["name"], result["size"]))) and result["seconds"] > old["seconds"] * threshold:
+            regressions.append(f"{result['name']} @ {result['size']}: {old['seconds'] * 1000:.2f} ms -> {result['seconds'] * 1000:.2f} ms")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="IRAS micro-benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="number of synthetic sections")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per benchmark, the best one is reported")
+    parser.add_argument("--only", nargs="+", help="run only the benchmarks whose name contains any of these")
+    parser.add_argument("--output", help="results file, defaults to benchmarks/results/<timestamp>.json")
+    parser.add_argument("--compare", metavar="FILE", help="previous results file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=1.25, help="slowdown factor reported as a regression")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.repeat, args.only)
+    output = args.output or os.path.join(RESULTS_DIR_PATH, f"{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as results_file:
+        json.dump(results, results_file, indent=2)
+    print(f"Results are saved at {output}.")
+
+    if args.compare:
+        with open(args.compare, "r") as previous_file:
+            regressions = compare(json.load(previous_file), results, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        raise SystemExit(1 if regressions else 0)
@@ -0,0 +1,100 @@
+"""
+Deterministic generator of synthetic but realistic IRAS API payloads
+"""
+import json
+import random
+
+DEPARTMENTS = ("CSE", "EEE", "MAT", "PHY", "ENG", "BUS", "ECO", "ACN", "FIN", "MKT", "CEN", "ANT", "SOC", "ENV", "BIO", "CHE")
+DAYS = ("ST", "MW", "RA", "S", "T", "M", "W", "R", "A")
+STARTS = ("0800", "0930", "1100", "1230", "1400", "1530", "1710")
+DURATIONS = (80, 90, 110, 170)
+SEMESTERS = ("1", "2", "3")
+GRADES = ("A", "A-", "B+", "B", "B-", "C+", "C", "C-", "D+", "D", "F", "W", "I")
+FIRST_NAMES = ("Abdul", "Farhana", "Tanvir", "Nusrat", "Rafiq", "Sadia", "Kamal", "Shirin", "Imran", "Tahmina", "Mahmud", "Ayesha")
+LAST_NAMES = ("Rahman", "Hossain", "Ahmed", "Islam", "Chowdhury", "Karim", "Akter", "Haque", "Siddique", "Kabir")
+
+def _time_slot(rng: random.Random) -> str:
+    start = rng.choice(STARTS)
+    minutes = int(start[:2]) * 60 + int(start[2:]) + rng.choice(DURATIONS)
+    return f"{rng.choice(DAYS)} {start}-{minutes // 60:02d}{minutes % 60:02d}"
+
+def _faculty(rng: random.Random, pool: list[str]) -> str:
+    return f" {rng.choice(pool)} "
+
+def offered_courses(count: int, seed: int = 0, sorted_ids: bool = True) -> list[dict]:
+    """
+    Returns `count` sections spread over courses of 1-6 sections each, roughly a third of them with labs.
+    The server sends them sorted by course id, pass `sorted_ids=False` to shuffle them.
+    """
+    rng = random.Random(seed)
+    faculty_pool = [f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}" for _ in range(max(8, count // 25))]
+    sections = []
+    course_no = 0
+    while len(sections) < count:
+        department = DEPARTMENTS[course_no % len(DEPARTMENTS)]
+        course_id = f"{department}{101 + course_no // len(DEPARTMENTS) % 900}"
+        if course_no >= len(DEPARTMENTS) * 900:
+            course_id += chr(ord("A") + course_no // (len(DEPARTMENTS) * 900) - 1)
+        has_lab = rng.random() < 0.3
+        for section in range(1, rng.randint(1, 6) + 1):
+            for id in (course_id, f"{course_id}L") if has_lab else (course_id,):
+                capacity = rng.choice((25, 30, 35, 40, 45))
+                enrolled = rng.randint(0, capacity)
+                sections.append({
+                    "courseId": id,
+                    "courseName": f"{department} Course {id[3:]}",
+                    "section": section,
+                    "timeSlot": _time_slot(rng),
+                    "roomId": f"{rng.choice('BCD')}{rng.randint(1000, 9999)}",
+                    "capacity": capacity,
+                    "enrolled": enrolled,
+                    "vacancy": capacity - enrolled,
+                    "facualtyName": _faculty(rng, faculty_pool)
+                })
+        course_no += 1
+    sections = sections[:count]
+    if sorted_ids:
+        sections.sort(key=lambda s: (s["courseId"], s["section"]))
+    else:
+        rng.shuffle(sections)
+    return sections
+
+def pre_requisites(count: int, seed: int = 0) -> list[dict]:
+    rng = random.Random(seed + 1)
+    rows = []
+    for i in range(count):
+        department = DEPARTMENTS[i % len(DEPARTMENTS)]
+        level = 2 + i // len(DEPARTMENTS) % 3
+        course_id = f"{department}{level}{rng.randint(0, 99):02d}"
+        pre_id = f"{department}{level - 1}{rng.randint(0, 99):02d}"
+        rows.append({
+            "courseId": course_id + ("L" if rng.random() < 0.1 else ""),
+            "preReqCourseId": pre_id,
+            "courseName": f"{department} Course {pre_id[3:]}",
+            "gradePoint": rng.choice((0, 0, 2.7, 3.3, 4.0))
+        })
+    return rows
+
+def registered_courses(count: int, seed: int = 0) -> list[dict]:
+    rng = random.Random(seed + 2)
+    rows = []
+    for i in range(count):
+        department = rng.choice(DEPARTMENTS)
+        course_id = f"{department}{rng.randint(101, 499)}" + ("L" if rng.random() < 0.2 else "")
+        rows.append({
+            "courseId": course_id,
+            "courseName": f"{department} Course {course_id[3:]}",
+            "regYear": str(2015 + i * 12 // max(count, 1)),
+            "regSemester": rng.choice(SEMESTERS),
+            "grade": rng.choice(GRADES)
+        })
+    return rows
+
+def offered_courses_payload(count: int, seed: int = 0) -> bytes:
+    return json.dumps({"success": True, "message": "", "data": {"eligibleOfferCourses": offered_courses(count, seed)}}).encode()
+
+def pre_requisites_payload(count: int, seed: int = 0) -> bytes:
+    return json.dumps({"success": True, "message": "", "data": pre_requisites(count, seed)}).encode()
+
+def registered_courses_payload(count: int, seed: int = 0) -> bytes:
+    return json.dumps({"success": True, "message": "", "data": registered_courses(count, seed)}).encode()
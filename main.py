@@ -1,5 +1,14 @@
 #!./venv/bin/python3
+import os
+import sys
+import argparse
+from getpass import getpass
+from datetime import datetime
+
 from IRAS import IRAS
+import IRAS.constants as CONST
+from IRAS.metrics import METRICS
+from IRAS.cli import COMMAND_PARSERS, split_commands, parse_commands, run_commands
 
 CREDENTIALS_PROMPT_TEXT = """
 ################################################
@@ -16,6 +25,9 @@ OPTION_PROMPT_TEXT = """
 # 1. Show Grades                               #
 # 2. Save Offered Course Details               #
 # 3. Re-login                                  #
+# 4. Watch Offered Course Vacancies            #
+# 5. Build Routine                             #
+# 6. Refresh Data                              #
 #                                              #
 # Enter anything else to quit                  #
 ################################################
@@ -39,12 +51,125 @@ FILE_FORMAT_PROMPT_TEXT = """
 ################################################
 File format: """
 
+WATCH_QUERY_PROMPT_TEXT = """
+################################################
+# Enter course codes to watch separated by     #
+# space e.g ENG101 ENG102 ...                  #
+# * Leave empty to watch all                   #
+# * Press Ctrl+C to stop watching              #
+################################################
+Codes: """
+
+ROUTINE_QUERY_PROMPT_TEXT = """
+################################################
+# Enter course codes of the routine separated  #
+# by space e.g ENG101 ENG102 ...               #
+# * LABS are auto paired                       #
+################################################
+Codes: """
+
+ROUTINE_OPTIONS_PROMPT_TEXT = """
+################################################
+# Enter optional constraints separated by ;    #
+# e.g after 9:30AM; before 5:00PM; off RA;     #
+#     faculty Name One, Name Two; full         #
+# * 'full' allows sections without vacancy     #
+# * Leave empty for no constraints             #
+################################################
+Constraints: """
+
 FILE_FORMATS = ("txt", "xls", "both")
 
+def parse_routine_constraints(text: str) -> dict:
+    constraints = {"min_vacancy": 1}
+    for constraint in filter(None, map(str.strip, text.split(";"))):
+        name, _, value = constraint.partition(" ")
+        match name.lower():
+            case "after":
+                constraints["not_before"] = value.strip()
+            case "before":
+                constraints["not_after"] = value.strip()
+            case "off":
+                constraints["days_off"] = value.strip()
+            case "faculty":
+                constraints["preferred_faculty"] = value.split(",")
+            case "full":
+                constraints["min_vacancy"] = 0
+            case _:
+                print(f"Unknown constraint {name} is ignored!")
+    return constraints
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Unofficial IRAS client, interactive unless commands are given",
+        epilog=f"commands: {', '.join(COMMAND_PARSERS)}, several can follow each other. Run '<command> -h' for its options.",
+        allow_abbrev=False
+    )
+    parser.add_argument("--offline", action="store_true", help="serve grades and offered courses from the local cache only")
+    parser.add_argument("--batch", metavar="FILE", help="process every student in FILE (one 'id password' per line) and exit")
+    parser.add_argument("--output-dir", default=CONST.BATCH_OUTPUT_DIR_PATH, help="directory of the per-student batch outputs")
+    parser.add_argument("--concurrency", type=int, default=CONST.BATCH_CONCURRENCY, help="maximum number of students processed at a time")
+    parser.add_argument("--profile", metavar="FILE", nargs="?", const="", help=f"write the timings of every phase as JSON to FILE, defaults to {CONST.METRICS_DIR_PATH}/<timestamp>.json")
+    parser.add_argument("--base-url", default=CONST.BASE_URL, help="address of the IRAS server e.g a local test server")
+    parser.add_argument("--daemon", action="store_true", help="serve the data to local clients over HTTP until interrupted, see IRAS/daemon.py")
+    parser.add_argument("--port", type=int, default=CONST.DAEMON_PORT, help="port of the daemon")
+    parser.add_argument("--no-progress", action="store_true", help="do not show progress bars")
+    parser.add_argument("--id", help="student id of the commands")
+    parser.add_argument("--password", help="password of the commands, read from IRAS_PASSWORD or asked when omitted")
+    global_argv, command_argv = split_commands(sys.argv[1:])
+    args = parser.parse_args(global_argv)
+    commands = parse_commands(command_argv)
+    # the phases are only kept one by one for the profile, otherwise just their totals
+    METRICS.keep_records = args.profile is not None
+
+    def save_profile() -> None:
+        if args.profile is None:
+            return
+        profile_path = args.profile or os.path.join(CONST.METRICS_DIR_PATH, f"{datetime.now():%Y%m%d-%H%M%S}.json")
+        os.makedirs(os.path.dirname(profile_path) or ".", exist_ok=True)
+        METRICS.save(profile_path)
+        print(f"Profile is saved at {profile_path}.")
+
+    if args.batch:
+        from IRAS.batch import run_batch
+        results = run_batch(args.batch, output_dir=args.output_dir, concurrency=args.concurrency, offline=args.offline,
+                            base_url=args.base_url)
+        print(f"{sum(r.ok for r in results)}/{len(results)} students processed. Summary is saved at {args.output_dir}/summary.txt.")
+        save_profile()
+        raise SystemExit(0 if all(r.ok for r in results) else 1)
+
+    if args.daemon:
+        from IRAS.daemon import IRASDaemon
+        daemon = IRASDaemon(port=args.port, offline=args.offline, base_url=args.base_url)
+        print(f"Serving on http://{':'.join(map(str, daemon.address))}, press Ctrl+C to stop.")
+        try:
+            daemon.serve_forever()
+        except KeyboardInterrupt:
+            print("\nStopped serving.")
+        finally:
+            save_profile()
+        raise SystemExit(0)
+
+    if commands:
+        if not args.id:
+            parser.error("--id is required to run commands")
+        iras = IRAS(offline=args.offline, show_progress=not args.no_progress, base_url=args.base_url)
+        try:
+            if not iras.authenticate_user(args.id, args.password or os.environ.get("IRAS_PASSWORD") or getpass("Password: ")):
+                print("Error: Invalid credentials or connection error")
+                raise SystemExit(1)
+            run_commands(iras, commands)
+        except (RuntimeError, ValueError) as e:
+            print(f"Error: {e}")
+            raise SystemExit(1)
+        finally:
+            iras.close()
+            save_profile()
+        raise SystemExit(0)
+
     re_login = False
     try:
-        iras = IRAS()
+        iras = IRAS(offline=args.offline, show_progress=not args.no_progress, base_url=args.base_url)
         while (cred_data := input(CREDENTIALS_PROMPT_TEXT).split(" ", 1)):
             if len(cred_data) == 1 and cred_data[0] == "q":
                 break
@@ -80,9 +205,27 @@ if __name__ == "__main__":
                         case 3:
                             re_login = True
                             break
+                        case 4:
+                            query_course_ids = list(filter(lambda id: 5 < len(id) < 8, input(WATCH_QUERY_PROMPT_TEXT).split(" ")))
+                            try:
+                                iras.watch_OfferedCourses(query_course_ids=query_course_ids)
+                            except KeyboardInterrupt:
+                                print("\nStopped watching.")
+                        case 5:
+                            query_course_ids = list(filter(lambda id: 5 < len(id) < 8, input(ROUTINE_QUERY_PROMPT_TEXT).split(" ")))
+                            try:
+                                iras.build_routines(query_course_ids, **parse_routine_constraints(input(ROUTINE_OPTIONS_PROMPT_TEXT)))
+                            except ValueError as e:
+                                print(f"Error: {e}")
+                        case 6:
+                            iras.refresh()
+                            print("Data will be fetched again on the next query.")
                         case _:
                             break
                 if not re_login:
                     break
+        iras.close()
     except RuntimeError as e:
-        print(f"Error: {e}")
\ No newline at end of file
+        print(f"Error: {e}")
+    finally:
+        save_profile()
\ No newline at end of file
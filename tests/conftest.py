@@ -0,0 +1,17 @@
+import pytest
+
+from benchmarks import synthetic
+from IRAS.Types import OfferedCourse, PreRequisiteCourse, CourseIndex
+from IRAS.utils import get_formatted_time
+
+@pytest.fixture(scope="session")
+def offered_courses() -> list[OfferedCourse]:
+    return [OfferedCourse.NEW_INSTANCE(c, get_formatted_time) for c in synthetic.offered_courses(2_000, seed=7)]
+
+@pytest.fixture(scope="session")
+def offered_course_index(offered_courses: list[OfferedCourse]) -> CourseIndex:
+    return CourseIndex.NEW_INSTANCE(offered_courses)
+
+@pytest.fixture(scope="session")
+def pre_requisite_courses() -> list[PreRequisiteCourse]:
+    return [PreRequisiteCourse.NEW_INSTANCE(c) for c in synthetic.pre_requisites(500, seed=7)]
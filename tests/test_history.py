@@ -0,0 +1,115 @@
+import random
+from dataclasses import replace
+
+import pytest
+
+from IRAS.Types import OfferedCourse
+from IRAS.history import HistoryStore
+
+START = 1_000_000.0
+STEP = 60.0
+
+def _catalog() -> list[OfferedCourse]:
+    return [OfferedCourse(f"CSE{100 + i}", f"Course {i}", section, "ST 8:00AM-9:20AM", 40, 30, 10, "Faculty")
+            for i in range(10) for section in (1, 2)]
+
+def _catalogs(polls: int, seed: int = 0) -> list[tuple[float, list[OfferedCourse]]]:
+    """
+    A poll every minute, changing the vacancy of a few sections and now and then dropping one
+    """
+    rng = random.Random(seed)
+    courses = _catalog()
+    catalogs = []
+    for poll in range(polls):
+        courses = [replace(course, vacancy=rng.randint(0, 3)) if rng.random() < 0.2 else course for course in courses]
+        offered = [course for course in courses if not (course.course_id == "CSE109" and poll % 7 == 3)]
+        catalogs.append((START + poll * STEP, offered))
+    return catalogs
+
+def _value_at(catalogs: list[tuple[float, list[OfferedCourse]]], at: float, course_id: str, section: int) -> int | None:
+    value = None
+    for time, courses in catalogs:
+        if time > at:
+            break
+        value = next((c.vacancy for c in courses if (c.course_id, c.section) == (course_id, section)), None)
+    return value
+
+def _expected_series(catalogs: list[tuple[float, list[OfferedCourse]]], course_id: str, section: int) -> list[tuple[float, int | None]]:
+    series, value = [], None
+    for time, _ in catalogs:
+        if (new := _value_at(catalogs, time, course_id, section)) != value or not series:
+            series.append((time, new))
+            value = new
+    return series
+
+@pytest.fixture
+def catalogs() -> list[tuple[float, list[OfferedCourse]]]:
+    return _catalogs(120)
+
+@pytest.fixture
+def history(tmp_path, catalogs: list[tuple[float, list[OfferedCourse]]]) -> HistoryStore:
+    # compaction is left to the tests
+    store = HistoryStore(str(tmp_path / "history.jsonl"), checkpoint_every=10, compact_after=float("inf"))
+    for time, courses in catalogs:
+        store.record(courses, at=time)
+    return store
+
+@pytest.mark.parametrize("course_id, section", (("CSE100", 1), ("CSE104", 2), ("CSE109", 1)))
+def test_series_replays_every_change(history: HistoryStore, catalogs: list, course_id: str, section: int) -> None:
+    assert history.series(course_id, section) == _expected_series(catalogs, course_id, section)
+
+def test_series_from_start(history: HistoryStore, catalogs: list) -> None:
+    for start in (START + 15.5 * STEP, START + 61 * STEP, START + 200 * STEP):
+        series = history.series("CSE103", 1, start=start, end=start + 30 * STEP)
+        assert series[0] == (start, _value_at(catalogs, start, "CSE103", 1))
+        assert all(start < time <= start + 30 * STEP for time, _ in series[1:])
+        for time, value in series[1:]:
+            assert value == _value_at(catalogs, time, "CSE103", 1)
+
+def test_unchanged_catalog_is_not_written(history: HistoryStore, catalogs: list) -> None:
+    with open(history.file_path, "rb") as history_file:
+        size = len(history_file.read())
+    assert history.record(catalogs[-1][1], at=START + 1_000 * STEP) == 0
+    with open(history.file_path, "rb") as history_file:
+        assert len(history_file.read()) == size
+
+def test_compact_keeps_newer_history(history: HistoryStore, catalogs: list) -> None:
+    before = START + 80 * STEP
+    series = {key: history.series(*key) for key in (("CSE100", 1), ("CSE105", 2), ("CSE109", 2))}
+    with open(history.file_path) as history_file:
+        lines = len(history_file.readlines())
+
+    history.compact(before=before, resolution=10 * STEP)
+
+    with open(history.file_path) as history_file:
+        assert len(history_file.readlines()) < lines
+    for key, full in series.items():
+        compacted = history.series(*key)
+        # the records from `before` on are kept as they are
+        assert history.series(*key, start=before) == [(before, _value_at(catalogs, before, *key))] + \
+            [(time, value) for time, value in full if time > before]
+        assert [entry for entry in compacted if entry[0] > before] == [entry for entry in full if entry[0] > before]
+        # the older ones are merged, every value left is the one the section had at that time
+        for time, value in compacted:
+            assert value == _value_at(catalogs, time, *key)
+        assert len(compacted) <= len(full)
+
+def test_compact_again_is_stable(history: HistoryStore) -> None:
+    history.compact(before=START + 80 * STEP, resolution=10 * STEP)
+    series = history.series("CSE102", 1)
+    history.compact(before=START + 80 * STEP, resolution=10 * STEP)
+    assert history.series("CSE102", 1) == series
+
+def test_stores_sharing_a_file(tmp_path) -> None:
+    file_path = str(tmp_path / "shared.jsonl")
+    first, second = (HistoryStore(file_path, checkpoint_every=3, compact_after=5 * STEP, compact_resolution=2 * STEP) for _ in range(2))
+    catalogs = _catalogs(40, seed=1)
+    for i, (time, courses) in enumerate(catalogs):
+        (first if i % 3 else second).record(courses, at=time)
+    # each store catches up with what the other wrote before adding to it
+    replayed = HistoryStore(file_path, compact_after=float("inf"))
+    for course in _catalog():
+        key = (course.course_id, course.section)
+        for time, value in replayed.series(*key):
+            assert value == _value_at(catalogs, time, *key)
+        assert replayed.series(*key, start=catalogs[-1][0])[0][1] == _value_at(catalogs, catalogs[-1][0], *key)
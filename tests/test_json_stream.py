@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+from benchmarks import synthetic
+from IRAS.utils import iter_json_array
+
+ITEMS = [
+    {"courseId": "CSE101", "courseName": "Bangla বাংলা", "section": 1},
+    {"courseId": "CSE101L", "note": "a \"data\": [1, 2] in a string ] }", "section": 2},
+    {"nested": {"data": [3, 4]}, "list": [[], {}, "]"], "emoji": "\U0001f600"},
+    [1, 2, 3],
+    "text with \\ and é",
+    42,
+    None,
+]
+
+def _chunks(body: bytes, size: int) -> list[bytes]:
+    return [body[i:i + size] for i in range(0, len(body), size)]
+
+@pytest.mark.parametrize("size", (1, 2, 3, 5, 7, 64, 4096))
+def test_items_split_across_chunks(size: int) -> None:
+    body = json.dumps({"message": "\"data\" is below", "data": ITEMS, "after": [9]}, ensure_ascii=False, indent=1).encode()
+    assert list(iter_json_array(_chunks(body, size), "data")) == ITEMS
+
+@pytest.mark.parametrize("size", (1, 4, 1000))
+def test_nested_key(size: int) -> None:
+    body = json.dumps({"success": True, "data": {"eligibleOfferCourses": ITEMS[:3]}}).encode()
+    assert list(iter_json_array(_chunks(body, size), "eligibleOfferCourses")) == ITEMS[:3]
+
+def test_synthetic_payload() -> None:
+    payload = synthetic.offered_courses_payload(500)
+    assert list(iter_json_array(_chunks(payload, 16 * 1024), "eligibleOfferCourses")) == synthetic.offered_courses(500)
+
+def test_empty_array() -> None:
+    assert list(iter_json_array([b'{"data"', b': [ ', b'] }'], "data")) == []
+
+def test_rest_of_the_body_is_drained() -> None:
+    chunks = iter(_chunks(json.dumps({"data": [1, 2], "tail": "x" * 100}).encode(), 8))
+    assert list(iter_json_array(chunks, "data")) == [1, 2]
+    assert next(chunks, None) is None
+
+@pytest.mark.parametrize("body", (b'{"data": null}', b'{"message": "Unauthorized"}', b'{"data": {"error": 1}}', b""))
+def test_missing_array_raises(body: bytes) -> None:
+    with pytest.raises(RuntimeError):
+        list(iter_json_array(_chunks(body, 3), "data"))
+
+def test_truncated_body_raises() -> None:
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_array(_chunks(b'{"data": [{"a": 1}, {"b":', 4), "data"))
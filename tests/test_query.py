@@ -0,0 +1,76 @@
+import pytest
+
+from IRAS.Types import OfferedCourse, CourseIndex, theory_id
+from IRAS.routine import DAYS, parse_time_slot
+from IRAS.utils import split_key
+from IRAS.query import CourseQuery, CourseQueryIndex, parse_query
+
+QUERIES = (
+    "CSE3xx; vacancy > 0",
+    "dept MAT, PHY; days ST; after 11:00AM",
+    "EEE2xx; before 10:00AM",
+    "vacancy >= 10; on R",
+    "BUS; faculty Rahman",
+    "MAT1xx, PHY2*; vacancy <= 5",
+    "CSE101L, ECO105",
+    "faculty rahman, akter; days MW",
+    "after 9:30AM; before 2:00PM; vacancy = 0",
+    "vacancy < 3; vacancy > 0",
+    "ANT; CSE",
+    "XYZ9xx",
+)
+
+def _matches(course: OfferedCourse, query: CourseQuery) -> bool:
+    slot = parse_time_slot(course.time_slot)
+    if query.courses or query.departments:
+        in_courses = any(
+            theory_id(course.course_id).startswith(code.rstrip("X*")) if code.rstrip("X*") != code else
+            theory_id(course.course_id) == theory_id(code)
+            for code in query.courses
+        )
+        if not in_courses and split_key(course.course_id, "department") not in query.departments:
+            return False
+    if query.faculty and not any(name.lower() in course.faculty.lower() for name in query.faculty):
+        return False
+    if query.days and not any(slot.days >> DAYS.index(day) & 1 for day in query.days):
+        return False
+    if query.after is not None and not (slot.mask and slot.start >= query.after):
+        return False
+    if query.before is not None and not (slot.mask and slot.start < query.before):
+        return False
+    if query.min_vacancy is not None and course.vacancy < query.min_vacancy:
+        return False
+    return query.max_vacancy is None or course.vacancy <= query.max_vacancy
+
+def _brute_force(offered_course_index: CourseIndex, query: CourseQuery) -> list[tuple[str, list[OfferedCourse]]]:
+    groups: dict[str, list[OfferedCourse]] = dict()
+    for _, courses in offered_course_index.groups():
+        for course in courses:
+            if _matches(course, query):
+                groups.setdefault(theory_id(course.course_id), []).append(course)
+    return list(groups.items())
+
+@pytest.fixture(scope="module")
+def query_index(offered_course_index: CourseIndex) -> CourseQueryIndex:
+    return CourseQueryIndex(offered_course_index)
+
+@pytest.mark.parametrize("text", QUERIES)
+def test_select_matches_brute_force(text: str, query_index: CourseQueryIndex, offered_course_index: CourseIndex) -> None:
+    assert query_index.select(text) == _brute_force(offered_course_index, parse_query(text))
+
+def test_empty_query_selects_everything(query_index: CourseQueryIndex, offered_courses: list[OfferedCourse]) -> None:
+    assert sum(len(courses) for _, courses in query_index.select("")) == len(offered_courses)
+
+def test_parse_query() -> None:
+    query = parse_query("CSE3xx, MAT101; dept PHY; faculty Name One, Two; days ST; after 11:00AM; vacancy > 2; vacancy <= 9")
+    assert query.courses == ["CSE3XX", "MAT101"]
+    assert query.departments == ["PHY"]
+    assert query.faculty == ["Name One", "Two"]
+    assert query.days == "ST"
+    assert query.after == 11 * 60
+    assert (query.min_vacancy, query.max_vacancy) == (3, 9)
+
+@pytest.mark.parametrize("text", ("days X", "CSE-101", "after noon"))
+def test_parse_query_rejects_invalid_clauses(text: str) -> None:
+    with pytest.raises(ValueError):
+        parse_query(text)
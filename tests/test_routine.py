@@ -0,0 +1,91 @@
+from itertools import product
+
+import pytest
+
+from IRAS.Types import OfferedCourse, CourseIndex
+from IRAS.routine import (DAY_PENALTY, FACULTY_PENALTY, SLOTS_PER_DAY, SLOT_MINUTES, RoutineBuilder, idle_minutes,
+                          parse_clock, parse_time_slot)
+
+def _section(course_id: str, section: int, time_slot: str, vacancy: int = 5, faculty: str = "Faculty") -> OfferedCourse:
+    return OfferedCourse(course_id, course_id, section, time_slot, 40, 40 - vacancy, vacancy, faculty)
+
+@pytest.fixture(scope="module")
+def catalog() -> CourseIndex:
+    return CourseIndex.NEW_INSTANCE([
+        _section("CSE101", 1, "ST 8:00AM-9:20AM", faculty="Alpha"),
+        _section("CSE101", 2, "MW 9:30AM-10:50AM", faculty="Beta"),
+        _section("CSE101", 3, "RA 11:00AM-12:20PM", vacancy=0),
+        _section("CSE101L", 1, "S 2:00PM-3:40PM"),
+        _section("CSE101L", 2, "M 2:00PM-3:40PM"),
+        _section("CSE101L", 3, "R 2:00PM-3:40PM"),
+        _section("MAT212", 1, "ST 9:30AM-10:50AM", faculty="Alpha"),
+        _section("MAT212", 2, "MW 8:00AM-9:20AM"),
+        _section("MAT212", 3, "ST 8:00AM-9:20AM", faculty="Gamma"),
+        _section("PHY101", 1, "MW 11:00AM-12:20PM"),
+        _section("PHY101", 2, "ST 2:00PM-3:20PM", faculty="Alpha"),
+        _section("PHY101", 3, "RA 9:30AM-10:50AM"),
+        _section("ENG102", 1, "ST 11:00AM-12:20PM"),
+        _section("ENG102", 2, "MW 2:00PM-3:20PM", faculty="Beta"),
+    ])
+
+def _brute_force(builder: RoutineBuilder) -> list[tuple[tuple[OfferedCourse, ...], int]]:
+    """
+    Every conflict free combination of the builder's options with its penalty
+    """
+    routines = []
+    for options in product(*(builder.options[id] for id in builder.course_ids)):
+        mask, days, non_preferred = 0, 0, 0
+        for option in options:
+            if mask & option.mask:
+                break
+            mask, days, non_preferred = mask | option.mask, days | option.days, non_preferred + option.non_preferred
+        else:
+            sections = tuple(section for option in options for section in option.sections)
+            routines.append((sections, days.bit_count() * DAY_PENALTY + idle_minutes(mask) + non_preferred * FACULTY_PENALTY))
+    return routines
+
+def test_parse_time_slot() -> None:
+    slot = parse_time_slot("ST 8:00AM-9:20AM")
+    assert (slot.days, slot.start, slot.end) == (0b101, 8 * 60, 9 * 60 + 20)
+    # 16 slots of 5 minutes on each of the two days
+    assert slot.mask.bit_count() == 2 * 80 // SLOT_MINUTES
+    assert slot.mask == parse_time_slot("S 8:00AM-9:20AM").mask | parse_time_slot("S 8:00AM-9:20AM").mask << 2 * SLOTS_PER_DAY
+    assert parse_clock("2:00PM") == 14 * 60
+
+def test_idle_minutes() -> None:
+    mask = parse_time_slot("S 8:00AM-9:00AM").mask | parse_time_slot("S 10:00AM-11:00AM").mask
+    assert idle_minutes(mask) == 60
+
+@pytest.mark.parametrize("constraints", (
+    dict(),
+    dict(min_vacancy=1),
+    dict(days_off="R"),
+    dict(not_before=9 * 60 + 30, not_after=16 * 60),
+    dict(preferred_faculty=["Alpha"]),
+))
+def test_routines_match_brute_force(catalog: CourseIndex, constraints: dict) -> None:
+    builder = RoutineBuilder(catalog, ["CSE101", "MAT212", "PHY101", "ENG102"], **constraints)
+    expected = _brute_force(builder)
+    assert expected
+    routines = list(builder)
+    key = lambda sections: [(section.course_id, section.section) for section in sections]
+    assert sorted(map(key, (r.sections for r in routines))) == sorted(key(sections) for sections, _ in expected)
+    for routine in routines:
+        busy = 0
+        for section in routine.sections:
+            assert not busy & (mask := parse_time_slot(section.time_slot).mask)
+            busy |= mask
+
+    for limit in (1, 3, len(expected) + 2):
+        best = builder.best(limit)
+        assert [routine.penalty for routine in best] == sorted(penalty for _, penalty in expected)[:limit]
+
+def test_labs_are_paired_with_their_section(catalog: CourseIndex) -> None:
+    builder = RoutineBuilder(catalog, ["CSE101"])
+    pairs = {tuple((section.course_id, section.section) for section in option.sections) for option in builder.options["CSE101"]}
+    assert pairs == {(("CSE101", 1), ("CSE101L", 1)), (("CSE101", 2), ("CSE101L", 2)), (("CSE101", 3), ("CSE101L", 3))}
+
+def test_unavailable_course_gives_no_routine(catalog: CourseIndex) -> None:
+    builder = RoutineBuilder(catalog, ["CSE101", "MAT212"], days_off="STMW")
+    assert builder.unavailable == ["MAT212"]
+    assert list(builder) == [] and builder.best() == []
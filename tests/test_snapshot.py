@@ -0,0 +1,55 @@
+import os
+
+import pytest
+
+from IRAS.Types import OfferedCourse, PreRequisiteCourse, CourseIndex
+from IRAS.snapshot import save_snapshot, load_snapshot
+
+@pytest.fixture(scope="module")
+def snapshot_path(tmp_path_factory: pytest.TempPathFactory, offered_courses: list[OfferedCourse],
+                  pre_requisite_courses: list[PreRequisiteCourse]) -> str:
+    file_path = str(tmp_path_factory.mktemp("snapshots") / "catalog.iras")
+    save_snapshot(file_path, offered_courses, pre_requisite_courses)
+    return file_path
+
+def _sections(courses: list[OfferedCourse]) -> list[OfferedCourse]:
+    return sorted(courses, key=lambda c: (c.course_id, c.section))
+
+def test_round_trip(snapshot_path: str, offered_course_index: CourseIndex, offered_courses: list[OfferedCourse]) -> None:
+    with load_snapshot(snapshot_path) as snapshot:
+        assert len(snapshot) == len(offered_courses)
+        for id in offered_course_index:
+            assert _sections(snapshot.get(id)) == _sections(offered_course_index.get(id))
+            for lab in offered_course_index.lab_of(id):
+                assert lab in snapshot.get(lab.course_id)
+        # the rows are stored sorted by course id and section
+        assert [snapshot.offered_courses[i] for i in range(len(snapshot))] == _sections(offered_courses)
+
+def test_pre_requisites(snapshot_path: str, pre_requisite_courses: list[PreRequisiteCourse]) -> None:
+    index = CourseIndex.NEW_INSTANCE(pre_requisite_courses)
+    key = lambda c: (c.course_id, c.pre_requisite_course_id, c.status)
+    with load_snapshot(snapshot_path) as snapshot:
+        for id in index:
+            assert sorted(snapshot.pre_requisites_of(id), key=key) == sorted(index.get(id), key=key)
+
+@pytest.mark.parametrize("prefix", ("CSE", "CSE1xx", "MAT2", "B", "ZZZ", ""))
+def test_prefix(snapshot_path: str, offered_course_index: CourseIndex, prefix: str) -> None:
+    with load_snapshot(snapshot_path) as snapshot:
+        assert snapshot.prefix(prefix) == offered_course_index.prefix(prefix)
+
+def test_missing_course(snapshot_path: str) -> None:
+    with load_snapshot(snapshot_path) as snapshot:
+        assert snapshot.get("XYZ999") == [] and snapshot.pre_requisites_of("XYZ999") == []
+
+def test_empty_catalog(tmp_path) -> None:
+    file_path = str(tmp_path / "empty.iras")
+    save_snapshot(file_path, [])
+    with load_snapshot(file_path) as snapshot:
+        assert len(snapshot) == 0 and snapshot.get("CSE101") == [] and snapshot.prefix("CSE") == []
+
+def test_rejects_other_files(tmp_path) -> None:
+    file_path = str(tmp_path / "other.iras")
+    with open(file_path, "wb") as other_file:
+        other_file.write(os.urandom(64))
+    with pytest.raises(ValueError):
+        load_snapshot(file_path)